@@ -0,0 +1,136 @@
+"""
+Two-tier cache of sessions and users for request authentication.
+
+Without it, every request with a session cookie reads the session row and
+then the user before the view runs. Here both are looked up in a small
+cache in process memory first, then in the shared cache
+(AUTH_CACHE['CACHE_ALIAS']), and only then in the database; see
+api.sessions.SessionStore and CachedModelBackend.
+
+Logging out deletes the session from both tiers, and saving or deleting a
+user (a password, is_staff or is_active change) drops the user from both,
+so the change applies at once in the process making it and on the next
+shared cache lookup elsewhere. Other processes may keep using their
+in-memory copy for up to AUTH_CACHE['LOCAL_TIMEOUT'] seconds. Changes
+that bypass signals (queryset.update()) are not seen until entries expire.
+"""
+import collections
+import copy
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_SIZE': 10000,
+    'LOCAL_TIMEOUT': 5,
+}
+
+USER_KEY = 'auth:user:{}'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'AUTH_CACHE', {})}
+
+
+def get_shared_cache():
+    return caches[get_config()['CACHE_ALIAS']]
+
+
+class LocalCache:
+    """
+    Values kept in process memory for LOCAL_TIMEOUT seconds, at most
+    LOCAL_SIZE of them, least recently used dropped first.
+    """
+
+    def __init__(self):
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        config = get_config()
+        if not config['LOCAL_TIMEOUT']:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + config['LOCAL_TIMEOUT'])
+            self._entries.move_to_end(key)
+            while len(self._entries) > config['LOCAL_SIZE']:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+users = LocalCache()
+sessions = LocalCache()
+
+
+def get_user(user_id):
+    """
+    The user with primary key `user_id`, or None. Callers get their own
+    copy, as they may change it.
+    """
+    if not get_config()['ENABLED']:
+        return get_user_model()._default_manager.filter(pk=user_id).first()
+    user = users.get(user_id)
+    if user is None:
+        key = USER_KEY.format(user_id)
+        shared = get_shared_cache()
+        user = shared.get(key)
+        if user is None:
+            user = get_user_model()._default_manager.filter(pk=user_id).first()
+            if user is None:
+                return None
+            shared.set(key, user, get_config()['TIMEOUT'])
+        users.set(user_id, user)
+    return copy.copy(user)
+
+
+def invalidate_user(user_id):
+    """
+    Drop the user from both tiers, again on commit in case a request
+    cached it in between.
+    """
+    def invalidate():
+        users.delete(user_id)
+        get_shared_cache().delete(USER_KEY.format(user_id))
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend looking the session's user up through the auth cache.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user_id = get_user_model()._meta.pk.to_python(user_id)
+        except ValidationError:
+            return None
+        user = get_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
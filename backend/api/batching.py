@@ -0,0 +1,44 @@
+"""
+Coalescing of per-row side effects during batch writes.
+
+Signal receivers that do a write per saved row (counter adjustments,
+version bumps, search indexing) hand their work to `defer`. Outside a
+batch it runs at once; inside `batch()` it is collected and each kind of
+work runs once, for all rows, when the batch ends.
+"""
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+@contextmanager
+def batch():
+    """
+    Collect deferred work until the block ends. Use inside the transaction
+    doing the writes, so the flushed work commits with them.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        # Already batching; the outer batch flushes
+        yield
+        return
+    _local.pending = {}
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    for flush, items in pending.items():
+        flush(items)
+
+
+def defer(flush, item):
+    """
+    Run `flush([item])` now, or add `item` to the list `flush` is called
+    with at the end of the current batch.
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        flush([item])
+    else:
+        pending.setdefault(flush, []).append(item)
@@ -0,0 +1,77 @@
+"""
+Helpers shared by the benchmark management commands.
+"""
+import random
+import time
+
+WORDS = (
+    'policy holiday schedule office security update meeting training budget '
+    'release server network laptop password backup payroll travel expense '
+    'parking canteen wellness benefits onboarding deadline project review '
+    'quarter report audit compliance maintenance outage migration database '
+    'printer badge visitor emergency drill fire evacuation insurance leave '
+    'announcement team hiring welcome farewell celebration survey feedback'
+).split()
+
+
+SYLLABLES = 'ka lo mi ne ru sa ti vo be da fe gi ho ju ma no pe qu ri su'.split()
+
+
+def make_vocabulary(rng, size=20000):
+    """
+    The common WORDS followed by `size` pronounceable filler words.
+    """
+    filler = {
+        ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        for _ in range(size)
+    }
+    return list(WORDS) + sorted(filler)
+
+
+def make_text(rng, words, vocabulary=WORDS):
+    """
+    `words` words drawn from `vocabulary` with a Zipf-like skew, so that
+    early entries are common and the long tail is rare, as in real text.
+    """
+    size = len(vocabulary)
+    return ' '.join(
+        vocabulary[min(size - 1, int(size ** rng.random()) - 1)] for _ in range(words)
+    )
+
+
+def make_rng(seed):
+    return random.Random(seed)
+
+
+def timed(func, repeat):
+    """
+    Run `func` `repeat` times, returning the wall time of each run in ms.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,70 @@
+"""
+Reference counting of attachment blobs (see api.storage).
+
+Attachments acquire their blob when saved and release it when deleted or
+when their file changes; the counts are updated inside the writer's
+transaction and the file is only deleted after the last release commits.
+
+A file is only deleted while its Blob row is locked with no references,
+and acquiring a blob locks the same row before checking that the file is
+there. Saving an attachment skips writing a blob that exists already, so
+if the last other reference was released in between and the file deleted,
+acquire() writes it again from the attachment's content.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import Blob
+from .storage import attachment_storage, is_blob
+
+
+def get_size(name):
+    try:
+        return attachment_storage().size(name)
+    except OSError:
+        # Only informational; the file may live on another host
+        return 0
+
+
+def acquire(name, size=None, content=None):
+    """
+    Add a reference to the blob `name`. With `content` (the file the blob
+    was saved from), a file deleted since is written again.
+    """
+    if not is_blob(name):
+        return
+    storage = attachment_storage()
+    with transaction.atomic():
+        # The UPDATE locks the row, so the file can't be deleted from here on
+        if not Blob.objects.filter(name=name).update(references=F('references') + 1):
+            if content is not None and not storage.exists(name):
+                storage.save(name, content)
+            try:
+                with transaction.atomic():
+                    Blob.objects.create(name=name, size=get_size(name) if size is None else size, references=1)
+            except IntegrityError:
+                # Created by a concurrent writer
+                Blob.objects.filter(name=name).update(references=F('references') + 1)
+        elif content is not None and not storage.exists(name):
+            storage.save(name, content)
+
+
+def release(name):
+    if not is_blob(name):
+        return
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(name=name).first()
+        if blob is None:
+            return
+        Blob.objects.filter(pk=blob.pk).update(references=F('references') - 1)
+        if blob.references > 1:
+            return
+    transaction.on_commit(lambda: delete_unreferenced(name))
+
+
+def delete_unreferenced(name):
+    with transaction.atomic():
+        # Not if an attachment with the same content acquired it in between
+        blob = Blob.objects.select_for_update().filter(name=name, references__lte=0).first()
+        if blob is not None:
+            attachment_storage().delete(name)
+            blob.delete()
@@ -0,0 +1,218 @@
+"""
+Batch create, update and delete for model viewsets.
+
+    POST   /api/<resource>/bulk/   [{...}, {...}]             create
+    PATCH  /api/<resource>/bulk/   [{"id": 1, ...}, ...]      partial update
+    DELETE /api/<resource>/bulk/   {"ids": [1, 2, ...]}       delete
+
+A batch is validated as a whole, including one query per foreign key to
+check that the referenced rows exist, and is written in one transaction
+with bulk_create/bulk_update, or not at all. The response lists a result
+per item, in request order.
+
+bulk_create and bulk_update don't send model signals, so pre_save and
+post_save are sent for each row here; search indexing, statistics, cache
+versions and the live feed stay in step as with single-item writes. The
+receivers' writes are coalesced (see api.batching), so they cost a few
+queries per batch rather than per row.
+"""
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models.signals import pre_save, post_save
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+from rest_framework.serializers import as_serializer_error
+from . import batching
+
+NOT_SAVED = {'detail': 'Not saved because other items in the batch failed.'}
+
+
+def get_max_batch_size():
+    return getattr(settings, 'BULK_MAX_BATCH_SIZE', 500)
+
+
+def is_id(value):
+    # bool is an int too
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def send_save_signals(model, instances, created, update_fields=None, signal=post_save):
+    using = router.db_for_write(model)
+    for instance in instances:
+        kwargs = {'update_fields': update_fields, 'raw': False, 'using': using}
+        if signal is post_save:
+            kwargs['created'] = created
+        signal.send(sender=model, instance=instance, **kwargs)
+
+
+class BulkMixin:
+    """
+    ViewSet mixin adding the /bulk/ action. Items are validated with the
+    viewset's serializer; file uploads aren't supported in batches.
+
+    `bulk_select_related` names the relations object permissions look at,
+    so that checking a batch doesn't cost a query per item.
+    """
+    bulk_select_related = ()
+
+    def get_bulk_instances(self, ids):
+        model = self.get_queryset().model
+        return model.objects.select_related(*self.bulk_select_related).in_bulk(ids)
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        handler = {
+            'POST': self.bulk_create,
+            'PATCH': self.bulk_update,
+            'DELETE': self.bulk_delete,
+        }[request.method]
+        items = request.data
+        if request.method == 'DELETE' and isinstance(items, dict):
+            items = items.get('ids')
+        if not isinstance(items, list):
+            raise ValidationError({'detail': 'Expected a list of items.'})
+        if not items:
+            raise ValidationError({'detail': 'The batch is empty.'})
+        if len(items) > get_max_batch_size():
+            raise ValidationError({'detail': f'At most {get_max_batch_size()} items per batch.'})
+        return handler(items)
+
+    def failed(self, errors, count):
+        """
+        400 response for a batch with item errors ({index: (status, errors)}).
+        """
+        results = []
+        for index in range(count):
+            item_status, item_errors = errors.get(index, (status.HTTP_424_FAILED_DEPENDENCY, NOT_SAVED))
+            results.append({'index': index, 'status': item_status, 'errors': item_errors})
+        return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+
+    def validate_items(self, items, validated, errors, instances=None):
+        """
+        Validate items ({index: data}) with a single serializer, so that its
+        fields are built once per batch rather than once per item.
+        """
+        serializer = self.get_serializer_class()(
+            context=self.get_serializer_context(), partial=instances is not None
+        )
+        for index, item in items.items():
+            serializer.instance = instances[index] if instances is not None else None
+            try:
+                validated[index] = serializer.run_validation(item)
+            except ValidationError as error:
+                errors[index] = (status.HTTP_400_BAD_REQUEST, as_serializer_error(error))
+
+    def check_references(self, model, validated, errors):
+        """
+        Check in one query per foreign key that referenced rows exist.
+        """
+        for field in model._meta.concrete_fields:
+            if not field.is_relation:
+                continue
+            ids = {data[field.attname] for data in validated.values() if data.get(field.attname) is not None}
+            if not ids:
+                continue
+            existing = set(
+                field.related_model._base_manager.filter(pk__in=ids).values_list('pk', flat=True)
+            )
+            for index, data in validated.items():
+                if data.get(field.attname, None) is not None and data[field.attname] not in existing:
+                    errors[index] = (status.HTTP_400_BAD_REQUEST, {field.attname: ['Does not exist.']})
+
+    def bulk_create(self, items):
+        model = self.get_queryset().model
+        validated, errors = {}, {}
+        self.validate_items(dict(enumerate(items)), validated, errors)
+        self.check_references(model, validated, errors)
+        if errors:
+            return self.failed(errors, len(items))
+
+        instances = [model(**validated[index]) for index in range(len(items))]
+        with transaction.atomic(), batching.batch():
+            send_save_signals(model, instances, created=True, signal=pre_save)
+            model.objects.bulk_create(instances)
+            send_save_signals(model, instances, created=True)
+
+        return Response({'results': [
+            {'index': index, 'status': status.HTTP_201_CREATED, 'id': instance.pk}
+            for index, instance in enumerate(instances)
+        ]}, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, items):
+        model = self.get_queryset().model
+        # Anything but an integer id is not found
+        ids = [item.get('id') if isinstance(item, dict) and is_id(item.get('id')) else None for item in items]
+        instances = self.get_bulk_instances([pk for pk in ids if pk is not None])
+
+        validated, errors, checked = {}, {}, {}
+        for index, (pk, item) in enumerate(zip(ids, items)):
+            instance = instances.get(pk)
+            if instance is None:
+                errors[index] = (status.HTTP_404_NOT_FOUND, {'id': ['Not found.']})
+                continue
+            if ids.index(pk) != index:
+                errors[index] = (status.HTTP_400_BAD_REQUEST, {'id': ['Appears more than once in the batch.']})
+                continue
+            try:
+                self.check_object_permissions(self.request, instance)
+            except PermissionDenied as error:
+                errors[index] = (status.HTTP_403_FORBIDDEN, {'detail': str(error.detail)})
+                continue
+            checked[index] = item
+        self.validate_items(checked, validated, errors, {index: instances[ids[index]] for index in checked})
+        self.check_references(model, validated, errors)
+        if errors:
+            return self.failed(errors, len(items))
+
+        fields = {model._meta.get_field(name).name for data in validated.values() for name in data}
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            # bulk_update skips pre_save(), so auto_now fields are set here
+            if getattr(field, 'auto_now', False):
+                fields.add(field.name)
+                for instance in instances.values():
+                    setattr(instance, field.attname, now)
+        changed = []
+        for index in range(len(items)):
+            instance = instances[ids[index]]
+            for name, value in validated[index].items():
+                setattr(instance, name, value)
+            changed.append(instance)
+
+        with transaction.atomic(), batching.batch():
+            send_save_signals(model, changed, created=False, update_fields=frozenset(fields), signal=pre_save)
+            model.objects.bulk_update(changed, sorted(fields))
+            send_save_signals(model, changed, created=False, update_fields=frozenset(fields))
+
+        return Response({'results': [
+            {'index': index, 'status': status.HTTP_200_OK, 'id': instance.pk}
+            for index, instance in enumerate(changed)
+        ]})
+
+    def bulk_delete(self, ids):
+        model = self.get_queryset().model
+        instances = self.get_bulk_instances([pk for pk in ids if is_id(pk)])
+        errors = {}
+        for index, pk in enumerate(ids):
+            instance = instances.get(pk) if is_id(pk) else None
+            if instance is None:
+                errors[index] = (status.HTTP_404_NOT_FOUND, {'id': ['Not found.']})
+                continue
+            try:
+                self.check_object_permissions(self.request, instance)
+            except PermissionDenied as error:
+                errors[index] = (status.HTTP_403_FORBIDDEN, {'detail': str(error.detail)})
+        if errors:
+            return self.failed(errors, len(ids))
+
+        with transaction.atomic(), batching.batch():
+            # Deletes cascade and send delete signals as with single deletes
+            model.objects.filter(pk__in=instances).delete()
+
+        return Response({'results': [
+            {'index': index, 'status': status.HTTP_204_NO_CONTENT, 'id': pk}
+            for index, pk in enumerate(ids)
+        ]})
@@ -0,0 +1,143 @@
+"""
+Conditional GET support (ETag / Last-Modified) for read endpoints.
+
+Validators are derived from the ModelVersion rows of the models a response
+is built from, fetched in one small query. When the client's validators
+still match, a 304 is returned without running the view's queries or
+serializing anything; otherwise the rendered response is looked up in the
+response cache (see api.response_cache) under the same validators.
+"""
+import hashlib
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, urlencode
+from . import batching, instrumentation, response_cache
+from .models import ModelVersion
+
+
+def bump_version(name):
+    """
+    Mark the data of model `name` (an app label, e.g. 'notices.Notice') as
+    changed. Runs in the caller's transaction.
+    """
+    batching.defer(bump_versions, name)
+
+
+def bump_versions(names):
+    for name in dict.fromkeys(names):
+        updated = ModelVersion.objects.filter(name=name).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            ModelVersion.objects.get_or_create(name=name, defaults={'version': 1})
+
+
+def get_versions(names):
+    """
+    {name: (version, updated_at)} of the given models, in one query.
+    """
+    return {
+        name: (version, updated_at)
+        for name, version, updated_at in ModelVersion.objects.filter(name__in=names).values_list(
+            'name', 'version', 'updated_at'
+        )
+    }
+
+
+def normalized_path(request):
+    """
+    The request's path and query string, with the parameters sorted by name.
+    """
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    return f'{request.path}?{query}' if query else request.path
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin adding ETag and Last-Modified validators to list and
+    retrieve, answering matching conditional requests with 304, and caching
+    the rendered JSON responses.
+
+    `conditional_models` lists every model the responses are built from,
+    including nested ones. Anything else a response depends on must be part
+    of get_etag_parts() (and its time of get_change_times()) or
+    get_cache_scope().
+    """
+    conditional_models = ()
+    cache_responses = True
+
+    def get_etag_parts(self, request, versions):
+        return [
+            normalized_path(request),
+            request.META.get('HTTP_ACCEPT', ''),
+            *(f'{name}={versions.get(name, (0, None))[0]}' for name in self.conditional_models),
+        ]
+
+    def get_change_times(self, request, versions):
+        """
+        When the response last changed, as far as known: the times of the
+        ETag parts that change with time. The latest one is Last-Modified.
+        """
+        return [updated_at for version, updated_at in versions.values()]
+
+    def get_validators(self, request):
+        versions = get_versions(self.conditional_models)
+        digest = hashlib.md5('|'.join(self.get_etag_parts(request, versions)).encode()).hexdigest()
+        # Weak: equivalent but not necessarily byte-identical (e.g. view counts)
+        etag = f'W/"{digest}"'
+        changes = [changed for changed in self.get_change_times(request, versions) if changed]
+        # HTTP dates have one second resolution; the ETag is exact
+        last_modified = int(max(changes).timestamp()) if changes else None
+        return etag, last_modified
+
+    def get_cache_scope(self, request):
+        """
+        The permission scope responses are shared within. Users with the
+        same scope and validators get the same cached response.
+        """
+        return 'staff' if request.user.is_staff else 'user'
+
+    def get_response_cache_key(self, request, etag):
+        # Only JSON: the browsable API embeds the user and a CSRF token
+        if not self.cache_responses or request.accepted_renderer.format != 'json':
+            return None
+        if not response_cache.get_config()['ENABLED']:
+            return None
+        # Bodies hold absolute URLs (pagination links, files)
+        origin = f'{request.scheme}://{request.get_host()}'
+        return f'response:{self.get_cache_scope(request)}:{origin}:{etag}'
+
+    def render_response(self, request, response):
+        # What finalize_response would do, to cache the content
+        response.accepted_renderer = request.accepted_renderer
+        response.accepted_media_type = request.accepted_media_type
+        response.renderer_context = self.get_renderer_context()
+        with instrumentation.phase('render'):
+            return response.render()
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            key = self.get_response_cache_key(request, etag)
+            view = f'{self.basename}-{self.action}'
+            response = response_cache.get(key, view) if key else None
+            if response is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                if key:
+                    response_cache.store(key, self.render_response(request, response))
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Let clients keep the response but revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,400 @@
+"""
+Synthetic data at production volume, for benchmarks and local testing.
+
+generate() fills users, categories, notices, articles, comments and
+attachment stubs (rows without files, and the Blob rows counting their
+references) with bulk_create, one transaction per chunk of rows. Each chunk draws from its own random generator seeded with
+the seed, the table and the chunk number, and its rows get primary keys
+following the largest one in the table, so the data depends only on the
+seed, the counts and the rows already there, not on how many worker
+processes insert it. Nothing else should write to the tables meanwhile.
+
+Tables are filled in phases, each after the ones it references: users and
+categories, then notices and articles, then comments, attachments, article
+tags and the search index. Chunks of a phase run in parallel with
+`workers` > 1. What the save signals would have done (tags, search index,
+statistics counters, model versions) is done once the rows are in.
+"""
+import collections
+import contextlib
+import datetime
+import functools
+import hashlib
+import multiprocessing
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from knowledge.models import Article, ArticleAttachment, Category, Comment
+from knowledge.tags import sync_article_tags
+from notices.models import Notice, NoticeAttachment
+from search.backends import get_backend
+from . import stats
+from .benchmarking import make_rng, make_text, make_vocabulary, chunked
+from .conditional import bump_versions
+from .models import Blob
+from .storage import blob_name
+
+# Rows per table at scale 1
+DEFAULT_COUNTS = {
+    'users': 1000,
+    'categories': 30,
+    'notices': 100000,
+    'articles': 20000,
+    'comments': 100000,
+    'notice_attachments': 20000,
+    'article_attachments': 10000,
+}
+
+# Tables filled in each phase, after the tables their rows point at
+PHASES = [
+    ['users', 'categories'],
+    ['notices', 'articles'],
+    ['comments', 'notice_attachments', 'article_attachments', 'article_tags', 'search_index'],
+]
+MODELS = {
+    'users': User,
+    'categories': Category,
+    'notices': Notice,
+    'articles': Article,
+    'comments': Comment,
+    'notice_attachments': NoticeAttachment,
+    'article_attachments': ArticleAttachment,
+}
+NOTICE_CATEGORIES = {'General': 40, 'IT': 25, 'HR': 20, 'Facilities': 15}
+PRIORITIES = {'low': 30, 'medium': 50, 'high': 20}
+EXTENSIONS = ['pdf', 'pdf', 'docx', 'xlsx', 'png', 'jpg', 'pptx', 'txt']
+# Share of attachments with the same content as another one of their chunk
+DUPLICATE_SHARE = 0.2
+# Days the creation dates are spread over, most of them recent
+HISTORY_DAYS = 730
+
+
+@contextlib.contextmanager
+def explicit_timestamps(*models):
+    """
+    Let bulk_create keep the creation and update dates set on the rows
+    instead of overwriting them with the current time.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+@functools.lru_cache(maxsize=None)
+def get_vocabulary(seed):
+    return make_vocabulary(make_rng(f'{seed}:vocabulary'))
+
+
+@functools.lru_cache(maxsize=None)
+def get_tag_names(seed):
+    rng = make_rng(f'{seed}:tags')
+    return sorted({make_text(rng, 1, get_vocabulary(seed)) for _ in range(1000)})
+
+
+def get_ids(table, task):
+    """
+    Primary keys of the rows of `table` inserted by this run, or of all its
+    rows if it inserts none.
+    """
+    after, count = task['after'][table], task['counts'].get(table, 0)
+    if count:
+        return range(after + 1, after + count + 1)
+    return get_existing_ids(table)
+
+
+@functools.lru_cache(maxsize=None)
+def get_existing_ids(table):
+    queryset = MODELS[table].objects.order_by('pk').values_list('pk', flat=True)
+    return array('q', queryset.iterator(chunk_size=10000))
+
+
+def get_pks(table, task):
+    first = task['after'][table] + task['start'] + 1
+    return range(first, first + task['count'])
+
+
+def skewed_choice(rng, items, skew=2):
+    """
+    An item of `items`, the first ones more often (Zipf-like), as some
+    authors, articles and categories are much more active than others.
+    """
+    return items[int(len(items) * rng.random() ** skew)]
+
+
+def past_date(rng, now):
+    return now - datetime.timedelta(seconds=HISTORY_DAYS * 86400 * rng.random() ** 2)
+
+
+def title_case(rng, words, vocabulary):
+    return make_text(rng, words, vocabulary).capitalize()
+
+
+def make_users(rng, task):
+    vocabulary = get_vocabulary(task['seed'])
+    now = timezone.now()
+    return [
+        User(
+            pk=pk,
+            username=f"{task['prefix']}{n}",
+            first_name=title_case(rng, 1, vocabulary)[:150],
+            last_name=title_case(rng, 1, vocabulary)[:150],
+            email=f"{task['prefix']}{n}@example.com",
+            # Unusable, without the cost of hashing one per user
+            password='!',
+            is_staff=rng.random() < 0.01,
+            date_joined=past_date(rng, now),
+        )
+        for n, pk in enumerate(get_pks('users', task), task['start'])
+    ]
+
+
+def make_categories(rng, task):
+    vocabulary = get_vocabulary(task['seed'])
+    return [
+        Category(
+            pk=pk,
+            name=title_case(rng, rng.randint(1, 2), vocabulary)[:100],
+            description=make_text(rng, rng.randint(5, 20), vocabulary),
+            created_at=past_date(rng, timezone.now()),
+        )
+        for pk in get_pks('categories', task)
+    ]
+
+
+def make_notices(rng, task):
+    vocabulary = get_vocabulary(task['seed'])
+    users = get_ids('users', task)
+    now = timezone.now()
+    rows = []
+    for pk in get_pks('notices', task):
+        created_at = past_date(rng, now)
+        # Most notices never expire; the others expire within two months
+        # of being posted, so older ones are expired
+        expires_at = created_at + datetime.timedelta(days=rng.randint(1, 60)) if rng.random() < 0.4 else None
+        rows.append(Notice(
+            pk=pk,
+            title=title_case(rng, rng.randint(4, 10), vocabulary)[:200],
+            content=make_text(rng, rng.randint(40, 200), vocabulary),
+            author_id=skewed_choice(rng, users),
+            category=rng.choices(list(NOTICE_CATEGORIES), list(NOTICE_CATEGORIES.values()))[0],
+            priority=rng.choices(list(PRIORITIES), list(PRIORITIES.values()))[0],
+            pinned=rng.random() < 0.02,
+            created_at=created_at,
+            updated_at=created_at + datetime.timedelta(hours=rng.random() * 48) if rng.random() < 0.2 else created_at,
+            expires_at=expires_at,
+        ))
+    return rows
+
+
+def make_articles(rng, task):
+    vocabulary = get_vocabulary(task['seed'])
+    tag_names = get_tag_names(task['seed'])
+    users = get_ids('users', task)
+    categories = get_ids('categories', task)
+    now = timezone.now()
+    rows = []
+    for pk in get_pks('articles', task):
+        created_at = past_date(rng, now)
+        tags = dict.fromkeys(skewed_choice(rng, tag_names, 3) for _ in range(rng.randint(0, 5)))
+        rows.append(Article(
+            pk=pk,
+            title=title_case(rng, rng.randint(4, 10), vocabulary)[:200],
+            content=make_text(rng, rng.randint(200, 1000), vocabulary),
+            author_id=skewed_choice(rng, users, 3),
+            category_id=skewed_choice(rng, categories),
+            tags=', '.join(tags)[:500],
+            is_published=rng.random() < 0.9,
+            view_count=int(rng.paretovariate(1.2) * 10),
+            created_at=created_at,
+            updated_at=created_at + datetime.timedelta(days=rng.random() * 30) if rng.random() < 0.3 else created_at,
+        ))
+    return rows
+
+
+def make_comments(rng, task):
+    vocabulary = get_vocabulary(task['seed'])
+    users = get_ids('users', task)
+    articles = get_ids('articles', task)
+    now = timezone.now()
+    return [
+        Comment(
+            pk=pk,
+            article_id=skewed_choice(rng, articles, 3),
+            author_id=skewed_choice(rng, users),
+            content=make_text(rng, rng.randint(5, 60), vocabulary),
+            created_at=past_date(rng, now),
+        )
+        for pk in get_pks('comments', task)
+    ]
+
+
+def make_attachments(model, table, parent, key):
+    def make(rng, task):
+        parents = get_ids(parent, task)
+        now = timezone.now()
+        rows = []
+        names = []
+        for pk in get_pks(table, task):
+            if names and rng.random() < DUPLICATE_SHARE:
+                name = rng.choice(names)
+            else:
+                # Stubs: there is no file behind the blob names. Usernames
+                # never repeat a prefix, so neither do the names
+                digest = hashlib.sha256(f"{task['prefix']}{table}:{pk}".encode()).hexdigest()
+                name = blob_name(digest, '.' + rng.choice(EXTENSIONS))
+                names.append(name)
+            rows.append(model(
+                pk=pk,
+                **{key: rng.choice(parents)},
+                file=name,
+                filename=f'{make_text(rng, 1)}-{pk}{os.path.splitext(name)[1]}',
+                upload_date=past_date(rng, now),
+            ))
+        return rows
+    return make
+
+
+def make_blobs(rng, attachments):
+    """
+    The Blob rows of the attachments, with the references the save signals
+    would have counted. Duplicates are only drawn within a chunk, so chunks
+    never share a blob.
+    """
+    references = collections.Counter(attachment.file.name for attachment in attachments)
+    return [
+        Blob(name=name, size=rng.randint(10 ** 4, 5 * 10 ** 6), references=count)
+        for name, count in references.items()
+    ]
+
+
+ATTACHMENT_TABLES = {'notice_attachments', 'article_attachments'}
+
+MAKERS = {
+    'users': make_users,
+    'categories': make_categories,
+    'notices': make_notices,
+    'articles': make_articles,
+    'comments': make_comments,
+    'notice_attachments': make_attachments(NoticeAttachment, 'notice_attachments', 'notices', 'notice_id'),
+    'article_attachments': make_attachments(ArticleAttachment, 'article_attachments', 'articles', 'article_id'),
+}
+
+
+def run_task(task):
+    """
+    Insert or process one chunk of rows. Runs in the worker processes.
+    """
+    table = task['table']
+    start = time.perf_counter()
+    with transaction.atomic():
+        if table == 'article_tags':
+            for batch in chunked(new_rows('articles', task), task['batch_size']):
+                sync_article_tags(batch)
+        elif table == 'search_index':
+            get_backend().index_many(new_rows(task['source'], task))
+        else:
+            rng = make_rng(f"{task['seed']}:{table}:{task['index']}")
+            model = MODELS[table]
+            rows = MAKERS[table](rng, task)
+            with explicit_timestamps(model):
+                model.objects.bulk_create(rows, batch_size=task['batch_size'])
+            if table in ATTACHMENT_TABLES:
+                Blob.objects.bulk_create(make_blobs(rng, rows), batch_size=task['batch_size'])
+    return table, task['count'], time.perf_counter() - start
+
+
+def new_rows(table, task):
+    """
+    The rows of the task's chunk among the rows this run inserted in
+    `table`.
+    """
+    pks = get_pks(table, task)
+    return MODELS[table].objects.filter(pk__gte=pks.start, pk__lt=pks.stop).order_by('pk').iterator()
+
+
+def plan_tasks(table, count, chunk_size, **common):
+    return [
+        {**common, 'table': table, 'index': index, 'start': start, 'count': min(chunk_size, count - start)}
+        for index, start in enumerate(range(0, count, chunk_size))
+    ]
+
+
+def generate(counts, seed=0, prefix='gen-', workers=1, chunk_size=10000, batch_size=1000, search_index=True,
+             progress=None):
+    """
+    Insert `counts` ({table: rows}, see DEFAULT_COUNTS) synthetic rows.
+    Usernames start with `prefix`. `progress(table, rows, seconds)` is
+    called as each table is done, with the time its chunks took (summed
+    over the workers). Returns the rows per table and the
+    primary key each table's new rows come after.
+    """
+    get_existing_ids.cache_clear()
+    after = {
+        table: model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        for table, model in MODELS.items()
+    }
+    counts = {table: counts.get(table, 0) for table in MODELS}
+    common = {'seed': seed, 'prefix': prefix, 'after': after, 'counts': counts, 'batch_size': batch_size}
+    inserted = {}
+
+    executor = None
+    if workers > 1:
+        # Worker processes open connections of their own
+        connections.close_all()
+        executor = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+        )
+    try:
+        for phase in PHASES:
+            tasks = []
+            for table in phase:
+                if table == 'article_tags':
+                    tasks += plan_tasks(table, counts['articles'], chunk_size, **common)
+                elif table == 'search_index':
+                    if search_index:
+                        for source in ['notices', 'articles']:
+                            tasks += plan_tasks(table, counts[source], chunk_size, source=source, **common)
+                else:
+                    tasks += plan_tasks(table, counts[table], chunk_size, **common)
+            run_phase(executor, tasks, inserted, progress)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # Next rows created normally come after the generated ones
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), list(MODELS.values())):
+            cursor.execute(sql)
+    # What the save signals do for each row
+    stats.rebuild()
+    bump_versions(['auth.User', 'knowledge.Category', 'notices.Notice', 'notices.NoticeAttachment',
+                   'knowledge.Article', 'knowledge.ArticleAttachment', 'knowledge.Comment'])
+    return {'inserted': {table: inserted.get(table, 0) for table in MODELS}, 'after': after}
+
+
+def run_phase(executor, tasks, inserted, progress):
+    done = {}
+    results = executor.map(run_task, tasks) if executor is not None else map(run_task, tasks)
+    for table, count, seconds in results:
+        rows, total = done.get(table, (0, 0.0))
+        done[table] = rows + count, total + seconds
+    for table, (count, seconds) in done.items():
+        if table in MODELS:
+            inserted[table] = count
+        if progress is not None:
+            progress(table, count, seconds)
@@ -0,0 +1,151 @@
+"""
+Permission-checked attachment downloads.
+
+Views check access and call `send_attachment`, which, depending on
+ATTACHMENT_SEND_MODE, either
+
+- 'stream': serves the file from Python with ETag/Last-Modified
+  revalidation and single-range requests. Whole files are handed to the
+  WSGI server's file wrapper (sendfile under gunicorn), ranges are read in
+  READ_SIZE blocks, so a file is never loaded into memory;
+- 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache, lighttpd): returns
+  only headers and lets the web server send the file, ranges included.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from .storage import is_blob
+
+READ_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class PassthroughRenderer(BaseRenderer):
+    """
+    Lets download views accept any Accept header. Files are sent as plain
+    Django responses, so only error details ever reach this, as JSON.
+    """
+    media_type = '*/*'
+    format = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data)
+
+
+def get_validators(name, stat):
+    """
+    Strong ETag and modification time of a stored file. Blob names are
+    content hashes, so they make a stable ETag by themselves.
+    """
+    if is_blob(name):
+        etag = os.path.splitext(os.path.basename(name))[0]
+    else:
+        etag = f'{stat.st_size:x}-{int(stat.st_mtime):x}'
+    return f'"{etag}"', int(stat.st_mtime)
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single `bytes=` range, end inclusive, or None when the
+    header should be ignored. Raises ValueError if it can't be satisfied.
+    Multiple ranges are ignored, so such requests get the whole file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def read_range(f, start, length):
+    try:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(READ_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def send_attachment(request, attachment):
+    storage = attachment.file.storage
+    name = attachment.file.name
+    try:
+        path = storage.path(name)
+        stat = os.stat(path)
+    except (FileNotFoundError, ValueError):
+        raise Http404('File not found')
+
+    etag, last_modified = get_validators(name, stat)
+    content_type = mimetypes.guess_type(attachment.filename)[0] or 'application/octet-stream'
+    mode = getattr(settings, 'ATTACHMENT_SEND_MODE', 'stream')
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if mode == 'x-accel-redirect':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = quote(settings.ATTACHMENT_ACCEL_PREFIX + name)
+        elif mode == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = path
+        else:
+            response = stream_file(request, path, stat.st_size, content_type, etag, last_modified)
+        response['Content-Disposition'] = content_disposition_header(True, attachment.filename)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, max_age=getattr(settings, 'ATTACHMENT_CACHE_MAX_AGE', 0))
+    return response
+
+
+def stream_file(request, path, size, content_type, etag, last_modified):
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    if header and if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(open(path, 'rb'), start, end - start + 1), status=206, content_type=content_type
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
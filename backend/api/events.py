@@ -0,0 +1,251 @@
+"""
+Live notice feed.
+
+Notice changes are published, after their transaction commits, to a broker
+(LIVE_FEED['BROKER']). The broker numbers events, keeps the most recent
+ones for resuming, and pushes each one to the connections subscribed to its
+category. /api/notices/events/ streams them as Server-Sent Events.
+
+The bundled LocalBroker lives in the worker process: events reach the
+connections of the worker that made the change. Run the ASGI app as a
+single worker, or plug in a broker backed by a shared service.
+"""
+import asyncio
+import collections
+import itertools
+import json
+import threading
+import time
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+
+DEFAULTS = {
+    'BROKER': 'api.events.LocalBroker',
+    # Events kept for clients resuming with Last-Event-ID
+    'BUFFER_SIZE': 1000,
+    # Events queued per connection before it falls back to the buffer
+    'QUEUE_SIZE': 100,
+    # Seconds between keep-alive comments on idle connections
+    'HEARTBEAT': 15,
+}
+
+
+# Reconnection delay suggested to clients, in milliseconds
+RETRY_MS = 3000
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'LIVE_FEED', {})}
+
+
+class Event:
+    __slots__ = ('id', 'sequence', 'type', 'categories', 'data', '_encoded')
+
+    def __init__(self, type, categories, data, epoch='0', sequence=0):
+        self.id = f'{epoch}-{sequence}'
+        self.sequence = sequence
+        self.type = type
+        self.categories = frozenset(categories)
+        self.data = data
+        self._encoded = None
+
+    def encode(self):
+        # Encoded once, however many connections it's sent to
+        if self._encoded is None:
+            data = json.dumps(self.data, cls=DjangoJSONEncoder)
+            self._encoded = f'id: {self.id}\nevent: {self.type}\ndata: {data}\n\n'.encode()
+        return self._encoded
+
+
+class Subscription:
+    """
+    One connection's view of the feed: a bounded queue filled by the broker
+    on the connection's event loop. When the queue overflows the broker sets
+    `lagging` and stops filling it; the reader then catches up from the
+    broker's buffer.
+    """
+
+    def __init__(self, categories, queue_size):
+        self.categories = frozenset(categories) if categories else None
+        self.queue = asyncio.Queue(queue_size)
+        self.loop = asyncio.get_running_loop()
+        self.lagging = False
+
+    def wants(self, event):
+        return self.categories is None or not self.categories.isdisjoint(event.categories)
+
+    def put(self, event):
+        if self.lagging:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagging = True
+
+
+class BaseBroker:
+    def publish(self, type, categories, data):
+        raise NotImplementedError
+
+    def last_id(self):
+        """
+        ID of the latest event, to resume from when nothing was sent yet.
+        """
+        raise NotImplementedError
+
+    def subscribe(self, categories):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def since(self, last_id, categories=None):
+        """
+        Buffered events after `last_id` in the given categories, or None when
+        the feed can't be resumed from there (the ID is unknown or too old).
+        """
+        raise NotImplementedError
+
+
+class LocalBroker(BaseBroker):
+    """
+    In-process broker. publish() may be called from any thread; delivery
+    happens on each subscriber's event loop. Subscriptions are indexed by
+    category so an event only touches the connections that want it.
+    """
+
+    def __init__(self, buffer_size=None, queue_size=None):
+        config = get_config()
+        self.queue_size = queue_size or config['QUEUE_SIZE']
+        self.buffer = collections.deque(maxlen=buffer_size or config['BUFFER_SIZE'])
+        # IDs restart with the process, so they carry the start time
+        self.epoch = str(int(time.time() * 1000))
+        self.sequence = itertools.count(1)
+        self.lock = threading.Lock()
+        # Event loop -> category (None for all categories) -> subscriptions
+        self.subscriptions = collections.defaultdict(lambda: collections.defaultdict(set))
+
+    def publish(self, type, categories, data):
+        with self.lock:
+            event = Event(type, categories, data, self.epoch, next(self.sequence))
+            self.buffer.append(event)
+            loops = list(self.subscriptions.items())
+        for loop, index in loops:
+            try:
+                loop.call_soon_threadsafe(self.deliver, index, event)
+            except RuntimeError:
+                # The loop was closed without its connections unsubscribing
+                with self.lock:
+                    self.subscriptions.pop(loop, None)
+        return event
+
+    def last_id(self):
+        with self.lock:
+            return self.buffer[-1].id if self.buffer else f'{self.epoch}-0'
+
+    def deliver(self, index, event):
+        targets = set(index.get(None, ()))
+        for category in event.categories:
+            targets.update(index.get(category, ()))
+        for subscription in targets:
+            subscription.put(event)
+
+    def subscribe(self, categories=None):
+        subscription = Subscription(categories, self.queue_size)
+        with self.lock:
+            index = self.subscriptions[subscription.loop]
+            for category in subscription.categories or [None]:
+                index[category].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            index = self.subscriptions.get(subscription.loop)
+            if index is None:
+                return
+            for category in subscription.categories or [None]:
+                index[category].discard(subscription)
+                if not index[category]:
+                    del index[category]
+            if not index:
+                del self.subscriptions[subscription.loop]
+
+    def since(self, last_id, categories=None):
+        epoch, _, sequence = last_id.partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        with self.lock:
+            events = list(self.buffer)
+        if events and sequence < events[0].sequence - 1:
+            # Events after last_id have already left the buffer
+            return None
+        categories = frozenset(categories) if categories else None
+        return [
+            event for event in events
+            if event.sequence > sequence
+            and (categories is None or not categories.isdisjoint(event.categories))
+        ]
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(get_config()['BROKER'])()
+    return _broker
+
+
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == 'LIVE_FEED':
+        _broker = None
+
+
+setting_changed.connect(reset_broker)
+
+
+async def stream(broker, categories=None, last_id=None, heartbeat=None):
+    """
+    Server-Sent Events for one connection: events after `last_id` from the
+    buffer, then live ones, with keep-alive comments while idle. A `reset`
+    event tells the client that events were missed and it should reload.
+    """
+    heartbeat = heartbeat or get_config()['HEARTBEAT']
+    subscription = broker.subscribe(categories)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'.encode()
+        position = last_id or broker.last_id()
+        while True:
+            backlog = broker.since(position, categories)
+            if backlog is None:
+                position = broker.last_id()
+                yield f'id: {position}\nevent: reset\ndata: {{}}\n\n'.encode()
+                backlog = []
+            for event in backlog:
+                yield event.encode()
+            if backlog:
+                position = backlog[-1].id
+            sequence = int(position.rpartition('-')[2])
+
+            while not subscription.lagging:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield b': keep-alive\n\n'
+                    continue
+                # Skip events already sent from the buffer
+                if event.sequence > sequence:
+                    yield event.encode()
+                    position, sequence = event.id, event.sequence
+
+            # Events were dropped: empty the queue and catch up from the buffer
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.lagging = False
+    finally:
+        broker.unsubscribe(subscription)
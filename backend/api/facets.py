@@ -0,0 +1,147 @@
+"""
+Facet counts for the notice and article filter sidebars.
+
+Each model's facets come from one grouped aggregate over its two facet
+fields, with the request's other filters applied in SQL. A search counts
+every match, not only the SEARCH_MAX_RESULTS most relevant ones. A facet's
+counts ignore its own filter, so the sidebar shows what choosing another
+value would give; `count` applies every filter. Results are cached under the
+versions of the models involved (see api.conditional), so any write
+invalidates them and a warm request runs a single small query.
+"""
+import collections
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from knowledge.filters import filter_articles
+from knowledge.models import Article, Category
+from notices.filters import filter_notices
+from notices.models import Notice
+from .conditional import get_versions
+
+def get_timeout():
+    return getattr(settings, 'FACETS_CACHE_TIMEOUT', 60)
+
+
+def without(params, *names):
+    params = params.copy()
+    for name in names:
+        params.pop(name, None)
+    return params
+
+
+def sorted_counts(counter):
+    return [
+        {'value': value, 'count': count}
+        for value, count in sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))
+    ]
+
+
+def notice_facets(params):
+    rows = (
+        filter_notices(Notice.objects.all(), without(params, 'category', 'priority'), ranked=False)
+        .order_by()
+        .values('category', 'priority')
+        .annotate(count=Count('pk'))
+    )
+    category = params.get('category')
+    priority = params.get('priority')
+
+    total = 0
+    categories = collections.Counter()
+    # Every priority is listed, in their order
+    priorities = dict.fromkeys((value for value, label in Notice.PRIORITY_CHOICES), 0)
+    for row in rows:
+        in_category = not category or row['category'] == category
+        in_priority = not priority or row['priority'] == priority
+        if in_priority:
+            categories[row['category']] += row['count']
+        if in_category:
+            priorities[row['priority']] = priorities.get(row['priority'], 0) + row['count']
+        if in_category and in_priority:
+            total += row['count']
+
+    return {
+        'count': total,
+        'category': sorted_counts(categories),
+        'priority': [{'value': value, 'count': count} for value, count in priorities.items()],
+    }
+
+
+def article_facets(params):
+    rows = (
+        filter_articles(Article.objects.all(), without(params, 'category_id', 'published'), ranked=False)
+        .order_by()
+        .values('category_id', 'is_published')
+        .annotate(count=Count('pk'))
+    )
+    category_id = params.get('category_id')
+    published = params.get('published')
+    if published is not None:
+        published = published.lower() == 'true'
+
+    total = 0
+    categories = collections.Counter()
+    states = {True: 0, False: 0}
+    for row in rows:
+        in_category = not category_id or str(row['category_id']) == category_id
+        in_state = published is None or row['is_published'] == published
+        if in_state:
+            categories[row['category_id']] += row['count']
+        if in_category:
+            states[row['is_published']] += row['count']
+        if in_category and in_state:
+            total += row['count']
+
+    # Names in a second, small query: joining them into the aggregate costs
+    # a lookup per article
+    names = dict(Category.objects.filter(pk__in=categories).values_list('id', 'name'))
+    return {
+        'count': total,
+        'category': sorted(
+            ({'id': pk, 'name': names.get(pk), 'count': count} for pk, count in categories.items()),
+            key=lambda entry: (-entry['count'], entry['name'] or ''),
+        ),
+        'published': [{'value': value, 'count': count} for value, count in states.items()],
+    }
+
+
+FacetSet = collections.namedtuple('FacetSet', 'key function params models')
+
+# type -> key in the response, function computing the facets, query
+# parameters they depend on and models they are built from
+FACET_SETS = {
+    'notice': FacetSet(
+        'notices', notice_facets, ('search', 'category', 'priority', 'active_only'), ['notices.Notice'],
+    ),
+    'article': FacetSet(
+        'articles', article_facets, ('search', 'category_id', 'tag', 'tag_match', 'published'),
+        ['knowledge.Article', 'knowledge.Category'],
+    ),
+}
+
+
+def cache_key(types, params, versions):
+    parts = [f'{name}={version}' for name, (version, updated_at) in sorted(versions.items())]
+    for type_ in types:
+        parts.append(type_)
+        parts.extend(
+            f'{name}={",".join(sorted(params.getlist(name)))}' for name in FACET_SETS[type_].params if name in params
+        )
+    return 'facets:' + hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def get_facets(params, types=None):
+    """
+    Facet counts for the filters in `params` (a QueryDict), for the `types`
+    given ('notice' and/or 'article'; both by default).
+    """
+    types = [type_ for type_ in FACET_SETS if not types or type_ in types]
+    versions = get_versions([name for type_ in types for name in FACET_SETS[type_].models])
+    key = cache_key(types, params, versions)
+    facets = cache.get(key)
+    if facets is None:
+        facets = {FACET_SETS[type_].key: FACET_SETS[type_].function(params) for type_ in types}
+        cache.set(key, facets, get_timeout())
+    return facets
@@ -0,0 +1,285 @@
+"""
+Fast path for the hot list endpoints.
+
+With settings.FAST_LISTS on, FastListMixin builds JSON list responses from
+values() rows instead of model instances run through serializer fields:
+the serializer's fields are compiled once into a ListPlan (the columns to
+select and how to turn each row into the item), nested objects are read
+through joins in the same query, nested lists with one query per relation,
+and the result is rendered with orjson when it is installed.
+
+The output is byte-for-byte the one of the regular path. Serializers with
+fields the compiler doesn't know (or a custom to_representation) are
+served by the regular path.
+"""
+import collections
+import operator
+import threading
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PKOnlyObject, PrimaryKeyRelatedField
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from . import instrumentation
+from .fieldsets import SparseFields
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fields whose to_representation() returns database values unchanged
+IDENTITY_FIELDS = {
+    serializers.CharField, serializers.EmailField, serializers.SlugField, serializers.URLField,
+    serializers.IntegerField, serializers.BooleanField, serializers.ChoiceField,
+}
+
+# Fields whose values orjson formats differently from the json module
+FLOAT_FIELDS = (serializers.FloatField, serializers.DecimalField)
+
+PLAN_CACHE_SIZE = 256
+
+
+class Unsupported(Exception):
+    pass
+
+
+class ListPlan:
+    """
+    The values() columns of a serializer's fields and the steps turning a
+    row into its representation. Columns of nested objects are prefixed
+    with their relation (`author__username`).
+    """
+
+    def __init__(self, serializer, model, prefix=''):
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            raise Unsupported(f'{type(serializer).__name__} has a custom to_representation')
+        self.serializer_class = type(serializer)
+        self.pk_only_methods = getattr(serializer, 'pk_only_methods', ())
+        self.model = model
+        self.pk_column = prefix + model._meta.pk.attname
+        self.columns = [self.pk_column]
+        self.steps = []
+        self.orjson_safe = True
+        for name, field in serializer.fields.items():
+            if not field.write_only:
+                self.add(name, field, prefix)
+
+    def add(self, name, field, prefix):
+        if isinstance(field, serializers.SerializerMethodField):
+            # Methods that only read obj.pk get a PKOnlyObject
+            if name not in self.pk_only_methods:
+                raise Unsupported(f'Method field {name}')
+            self.steps.append((name, 'method', field.method_name))
+            return
+        if field.source == '*' or '.' in field.source:
+            raise Unsupported(f'Source of {name}')
+
+        if isinstance(field, (serializers.ListSerializer, ManyRelatedField)):
+            relation = self.model._meta.get_field(field.source)
+            if not relation.one_to_many:
+                raise Unsupported(f'Relation {name}')
+            if isinstance(field, serializers.ListSerializer):
+                child = ListPlan(field.child, relation.related_model)
+                self.orjson_safe &= child.orjson_safe
+            elif type(field.child_relation) is PrimaryKeyRelatedField and field.child_relation.pk_field is None:
+                child = None
+            else:
+                raise Unsupported(f'Relation {name}')
+            self.steps.append((name, 'many', (relation, child)))
+            return
+
+        column = prefix + field.source
+        self.columns.append(column)
+        if isinstance(field, serializers.BaseSerializer):
+            related = self.model._meta.get_field(field.source)
+            if not (related.many_to_one or related.one_to_one) or related.auto_created:
+                raise Unsupported(f'Relation {name}')
+            nested = ListPlan(field, related.related_model, prefix=f'{column}__')
+            self.columns.extend(nested.columns)
+            self.orjson_safe &= nested.orjson_safe
+            self.steps.append((name, 'nested', (column, nested)))
+        elif isinstance(field, PrimaryKeyRelatedField):
+            if field.pk_field is not None:
+                raise Unsupported(f'Relation {name}')
+            self.steps.append((name, 'value', (column, None)))
+        elif isinstance(field, serializers.FileField):
+            storage = self.model._meta.get_field(field.source).storage
+            use_url = getattr(field, 'use_url', serializers.api_settings.UPLOADED_FILES_USE_URL)
+            self.steps.append((name, 'file', (column, storage, use_url)))
+        else:
+            self.orjson_safe &= not isinstance(field, FLOAT_FIELDS)
+            convert = None if type(field) in IDENTITY_FIELDS else field.to_representation
+            self.steps.append((name, 'value', (column, convert)))
+
+    def bind(self, rows, context):
+        """
+        [(name, getter)] turning `rows` into items. Runs the queries of the
+        nested lists.
+        """
+        getters = []
+        serializer = None
+        for name, kind, args in self.steps:
+            if kind == 'value':
+                column, convert = args
+                getters.append((name, value_getter(column, convert)))
+            elif kind == 'nested':
+                column, nested = args
+                getters.append((name, nested_getter(column, nested.bind(rows, context))))
+            elif kind == 'many':
+                relation, child = args
+                getters.append((name, self.many_getter(rows, relation, child, context)))
+            elif kind == 'file':
+                getters.append((name, file_getter(*args, context.get('request'))))
+            elif kind == 'method':
+                if serializer is None:
+                    serializer = self.serializer_class(context=context)
+                getters.append((name, method_getter(self.pk_column, getattr(serializer, args))))
+        return getters
+
+    def many_getter(self, rows, relation, child, context):
+        ids = {row[self.pk_column] for row in rows}
+        # The same query a prefetch_related() of the relation runs
+        related = relation.related_model._default_manager.filter(**{f'{relation.field.name}__in': ids})
+        key = relation.field.attname
+        groups = collections.defaultdict(list)
+        if child is None:
+            pk = relation.related_model._meta.pk.attname
+            for parent, value in related.values_list(key, pk):
+                groups[parent].append(value)
+        else:
+            child_rows = list(related.values(key, *child.columns))
+            for row, item in zip(child_rows, child.map(child_rows, context)):
+                groups[row[key]].append(item)
+        pk_column = self.pk_column
+        return lambda row: groups.get(row[pk_column], [])
+
+    def map(self, rows, context):
+        getters = self.bind(rows, context)
+        return [{name: get(row) for name, get in getters} for row in rows]
+
+
+def value_getter(column, convert):
+    if convert is None:
+        return operator.itemgetter(column)
+
+    def get(row):
+        value = row[column]
+        return None if value is None else convert(value)
+    return get
+
+
+def nested_getter(column, getters):
+    def get(row):
+        if row[column] is None:
+            return None
+        return {name: get(row) for name, get in getters}
+    return get
+
+
+def file_getter(column, storage, use_url, request):
+    def get(row):
+        name = row[column]
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return get
+
+
+def method_getter(pk_column, method):
+    return lambda row: method(PKOnlyObject(row[pk_column]))
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer producing the same bytes with orjson, for data made of
+    plain JSON types without floats.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # As JSONRenderer: these are valid JSON but not valid JavaScript
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class PlanCache:
+    """
+    Compiled plans per serializer class and fieldset, least recently used
+    dropped first (fieldsets come from the query string).
+    """
+
+    def __init__(self, size=PLAN_CACHE_SIZE):
+        self.size = size
+        self._plans = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compile_plan):
+        with self._lock:
+            if key in self._plans:
+                self._plans.move_to_end(key)
+                return self._plans[key]
+        try:
+            plan = compile_plan()
+        except Unsupported:
+            plan = None
+        with self._lock:
+            self._plans[key] = plan
+            if len(self._plans) > self.size:
+                self._plans.popitem(last=False)
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+
+plans = PlanCache()
+
+
+class FastListMixin:
+    """
+    ViewSet mixin serving JSON list responses through the fast path when
+    settings.FAST_LISTS is on.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, 'FAST_LISTS', False) or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_serializer()
+        sparse = SparseFields.from_request(request)
+        key = (
+            type(serializer),
+            None if sparse.fields is None else frozenset(sparse.fields),
+            frozenset(sparse.expand),
+        )
+        queryset = self.filter_queryset(self.get_queryset())
+        plan = plans.get(key, lambda: ListPlan(serializer, queryset.model))
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        # Pagination reads the ordering columns of the rows
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        columns = dict.fromkeys(plan.columns)
+        columns.update(
+            (name.lstrip('-'), None) for name in ordering
+            if isinstance(name, str) and name.lstrip('-') != 'pk'
+        )
+        rows = queryset.prefetch_related(None).values(*columns)
+        page = self.paginate_queryset(rows)
+        with instrumentation.phase('serialize'):
+            data = plan.map(rows if page is None else page, serializer.context)
+
+        if plan.orjson_safe and orjson is not None:
+            request.accepted_renderer = FastJSONRenderer()
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
@@ -0,0 +1,145 @@
+"""
+Sparse fieldsets (`?fields=`) and opt-in expansion (`?expand=`) for read
+responses.
+
+`fields` lists the fields to return (comma-separated or repeated). With it,
+nested relations are returned as primary keys unless they are also listed
+in `expand`. Without `fields` responses are unchanged.
+
+SparseFieldsMixin applies them to a response's top-level serializer.
+SparseQuerysetMixin lets viewsets skip the joins and prefetches of
+relations that aren't returned, and select only the columns that are.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
+from rest_framework import permissions, serializers
+
+
+class SparseFields:
+    """
+    The `fields` and `expand` parameters of a request. `fields` is None when
+    every field is wanted.
+    """
+
+    def __init__(self, fields=None, expand=()):
+        self.fields = fields
+        self.expand = set(expand)
+
+    @classmethod
+    def from_request(cls, request):
+        # Writes take and return every field
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return cls()
+        params = request.query_params
+        if 'fields' not in params:
+            return cls()
+        return cls(parse_names(params.getlist('fields')), parse_names(params.getlist('expand')))
+
+    def wants(self, name):
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        """
+        Whether relation `name` is returned nested (not as primary keys).
+        """
+        return self.fields is None or (name in self.fields and name in self.expand)
+
+
+def parse_names(values):
+    return {name.strip() for value in values for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin dropping the fields a read request didn't ask for, and
+    replacing nested relations it didn't expand with their primary keys.
+    Only the top-level serializer of a response is affected.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields
+
+        sparse = SparseFields.from_request(self.context.get('request'))
+        if sparse.fields is None:
+            return fields
+        for name, field in list(fields.items()):
+            if field.write_only:
+                continue
+            if not sparse.wants(name):
+                del fields[name]
+            elif isinstance(field, serializers.BaseSerializer) and not sparse.expands(name):
+                fields[name] = primary_key_field(field)
+        return fields
+
+
+def primary_key_field(field):
+    kwargs = {'read_only': True}
+    if field.source is not None:
+        kwargs['source'] = field.source
+    if isinstance(field, serializers.ListSerializer):
+        kwargs['many'] = True
+    return serializers.PrimaryKeyRelatedField(**kwargs)
+
+
+class SparseQuerysetMixin:
+    """
+    ViewSet mixin giving get_queryset() access to the request's fieldset:
+    `self.sparse_fields.wants(name)` tells whether to annotate something,
+    select_requested() and prefetch_requested() join and prefetch only the
+    relations returned, and only_requested() restricts a queryset to the
+    columns of the requested fields.
+    """
+
+    @cached_property
+    def sparse_fields(self):
+        return SparseFields.from_request(self.request)
+
+    def select_requested(self, queryset, *names):
+        """
+        select_related() the forward relations among `names` returned nested.
+        """
+        names = [name for name in names if self.sparse_fields.expands(name)]
+        return queryset.select_related(*names) if names else queryset
+
+    def prefetch_requested(self, queryset, name, expanded=None):
+        """
+        Prefetch the reverse relation `name` if it is returned: with the
+        `expanded` queryset when nested, and only the keys otherwise.
+        """
+        if not self.sparse_fields.wants(name):
+            return queryset
+        if self.sparse_fields.expands(name):
+            return queryset.prefetch_related(name if expanded is None else Prefetch(name, queryset=expanded))
+        relation = queryset.model._meta.get_field(name)
+        keys = relation.related_model.objects.only(relation.related_model._meta.pk.name, relation.field.name)
+        return queryset.prefetch_related(Prefetch(name, queryset=keys))
+
+    def only_requested(self, queryset):
+        if self.sparse_fields.fields is None:
+            return queryset
+        serializer = self.get_serializer()
+        opts = queryset.model._meta
+        # The primary key and the ordering columns, which pagination reads
+        names = {opts.pk.name}
+        ordering = queryset.query.order_by or opts.ordering
+        names.update(
+            name.lstrip('-') for name in ordering
+            if isinstance(name, str) and name.lstrip('-') not in queryset.query.annotations
+        )
+        for field in serializer.fields.values():
+            if field.write_only or field.source == '*':
+                continue
+            try:
+                model_field = opts.get_field(field.source.split('.')[0])
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete and not model_field.many_to_many:
+                names.add(model_field.name)
+        names.discard('pk')
+        return queryset.only(*names)
@@ -0,0 +1,289 @@
+"""
+Per-request performance instrumentation of the API.
+
+PerformanceMiddleware records for each /api/ request its SQL query count
+and time, the time spent in the view, in serializers and in rendering, and
+the response size. They are sent back in a `Server-Timing` header, logged
+as one line by the `api.performance` logger, and added to per-route
+histograms that `/api/metrics/` exposes in the Prometheus text format.
+
+Phases overlap: the view includes its serializers and their queries, and
+rendering happens in the view when the response cache stores a response.
+Histograms are per process.
+
+With settings.PERFORMANCE_METRICS['ENABLED'] off the middleware removes
+itself, and phase() and the serializer mixin only look up a context
+variable.
+"""
+import collections
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+logger = logging.getLogger('api.performance')
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SERVER_TIMING': True,
+    'LOG': True,
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+}
+
+PATH_PREFIX = '/api/'
+
+# Metrics of the request being handled, None outside instrumented requests
+current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PERFORMANCE_METRICS', {})}
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.phases = collections.Counter()
+        self.view_started = None
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    def add(self, name, seconds):
+        self.phases[name] += seconds
+
+
+@contextlib.contextmanager
+def timed_phase(metrics, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - start)
+
+
+def phase(name):
+    """
+    Context manager adding the time of its block to phase `name` of the
+    current request.
+    """
+    metrics = current.get()
+    if metrics is None:
+        return contextlib.nullcontext()
+    return timed_phase(metrics, name)
+
+
+class TimedSerializerMixin:
+    """
+    Serializer mixin adding the time spent in the top-level serializer of a
+    response (nested ones are part of it) to the `serialize` phase.
+    """
+
+    def to_representation(self, instance):
+        metrics = current.get()
+        if metrics is None:
+            return super().to_representation(instance)
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return super().to_representation(instance)
+        with timed_phase(metrics, 'serialize'):
+            return super().to_representation(instance)
+
+
+class Histogram:
+    """
+    Prometheus histogram with a set of labels per series.
+    """
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [count per bucket..., sum, count]
+        self._series = {}
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+            series = [(labels, list(values)) for labels, values in series]
+        for labels, values in series:
+            prefix = ','.join(f'{key}="{escape(value)}"' for key, value in labels)
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{prefix},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix},le="+Inf"}} {values[-1]}')
+            lines.append(f'{self.name}_sum{{{prefix}}} {values[-2]}')
+            lines.append(f'{self.name}_count{{{prefix}}} {values[-1]}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Registry:
+    """
+    The histograms of this process, created on first use so BUCKETS can be
+    configured.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = None
+
+    @property
+    def histograms(self):
+        with self._lock:
+            if self._histograms is None:
+                buckets = get_config()['BUCKETS']
+                self._histograms = {
+                    'duration': Histogram(
+                        'api_request_duration_seconds', 'Time to handle API requests.', buckets
+                    ),
+                    'db': Histogram(
+                        'api_request_db_duration_seconds', 'Time spent in SQL queries per API request.', buckets
+                    ),
+                    'queries': Histogram(
+                        'api_request_queries', 'SQL queries per API request.', (1, 2, 5, 10, 20, 50, 100)
+                    ),
+                    'size': Histogram(
+                        'api_response_size_bytes', 'Size of API response bodies.',
+                        (1024, 10240, 102400, 1048576, 10485760),
+                    ),
+                }
+            return self._histograms
+
+    def observe(self, route, method, total, metrics, size):
+        labels = (('route', route), ('method', method))
+        histograms = self.histograms
+        histograms['duration'].observe(labels, total)
+        histograms['db'].observe(labels, metrics.db)
+        histograms['queries'].observe(labels, metrics.queries)
+        if size is not None:
+            histograms['size'].observe(labels, size)
+
+    def render(self):
+        if self._histograms is None:
+            return ''
+        return '\n'.join(line for histogram in self.histograms.values() for line in histogram.render()) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms = None
+
+
+registry = Registry()
+
+
+def get_route(request):
+    match = getattr(request, 'resolver_match', None)
+    # URL names keep the number of series bounded, unlike paths
+    return match.view_name if match is not None and match.view_name else 'unmatched'
+
+
+def server_timing(metrics, total):
+    entries = [
+        f'db;dur={metrics.db * 1000:.1f};desc="{metrics.queries} queries"',
+        *(f'{name};dur={seconds * 1000:.1f}' for name, seconds in metrics.phases.items()),
+        f'total;dur={total * 1000:.1f}',
+    ]
+    return ', '.join(entries)
+
+
+class PerformanceMiddleware:
+    """
+    Records the metrics of /api/ requests. Put it first in MIDDLEWARE so
+    the total covers the other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.config = get_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith(PATH_PREFIX):
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            with contextlib.ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.execute))
+                start = time.perf_counter()
+                response = self.get_response(request)
+                end = time.perf_counter()
+        finally:
+            current.reset(token)
+        total = end - start
+        if metrics.view_started is not None and 'view' not in metrics.phases:
+            # Not rendered after the view, e.g. a response cache hit
+            metrics.add('view', end - metrics.view_started)
+
+        size = None if response.streaming else len(response.content)
+        route = get_route(request)
+        registry.observe(route, request.method, total, metrics, size)
+        if self.config['SERVER_TIMING']:
+            response['Server-Timing'] = server_timing(metrics, total)
+        if self.config['LOG']:
+            fields = {
+                'method': request.method,
+                'route': route,
+                'status': response.status_code,
+                'duration_ms': round(total * 1000, 1),
+                'queries': metrics.queries,
+                'db_ms': round(metrics.db * 1000, 1),
+                **{f'{name}_ms': round(seconds * 1000, 1) for name, seconds in metrics.phases.items()},
+                'bytes': size,
+            }
+            logger.info(
+                ' '.join(f'{key}={value}' for key, value in fields.items() if value is not None),
+                extra={'performance': fields},
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current.get()
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called between the view returning and its response being rendered
+        metrics = current.get()
+        if metrics is None or metrics.view_started is None:
+            return response
+        rendering = time.perf_counter()
+        metrics.add('view', rendering - metrics.view_started)
+        response.add_post_render_callback(lambda rendered: metrics.add('render', time.perf_counter() - rendering))
+        return response
@@ -0,0 +1,419 @@
+import contextlib
+import datetime
+import json
+import subprocess
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django import get_version
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.benchmarking import make_rng, make_text, percentile, chunked
+from api.conditional import bump_versions
+from api import stats
+from knowledge.models import Article, Category, Comment, Tag
+from knowledge.tags import sync_article_tags
+from knowledge.view_counts import buffer
+from notices.models import Notice
+from search.signals import index_instances
+
+# Operations of each workload and their weights
+WORKLOADS = {
+    'filter': {'list_notices': 4, 'list_articles': 3, 'list_comments': 2, 'get_stats': 1},
+    'search': {'search_notices': 1, 'search_articles': 1},
+    'retrieve': {'get_notice': 2, 'get_article': 2, 'get_comment': 1},
+    'write': {'create_notice': 4, 'update_notice': 3, 'delete_notice': 1, 'create_comment': 2},
+}
+# A day of traffic: mostly reads, a few writes
+WORKLOADS['mixed'] = {
+    **{name: weight * 5 for name, weight in WORKLOADS['filter'].items()},
+    **{name: weight * 6 for name, weight in WORKLOADS['retrieve'].items()},
+    **{name: weight * 7 for name, weight in WORKLOADS['search'].items()},
+    **{name: weight for name, weight in WORKLOADS['write'].items()},
+}
+
+NOTICE_CATEGORIES = ['General', 'HR', 'IT', 'Facilities']
+PRIORITIES = ['low', 'medium', 'medium', 'high']
+USERNAME_PREFIX = 'benchmark-load-'
+# Ids per model the workloads pick from
+SAMPLE_SIZE = 5000
+
+
+class Worker:
+    """
+    Runs the requests of one concurrent client. Operations return the
+    method, path and data of a request.
+    """
+
+    def __init__(self, data, user, seed):
+        self.data = data
+        self.user = user
+        self.rng = make_rng(seed)
+        self.client = APIClient(raise_request_exception=False)
+        self.client.force_authenticate(user)
+        # Notices this worker created, the ones it may update and delete
+        self.created = []
+        self.timings = []
+        self.statuses = Counter()
+        self.queries = 0
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def run(self, workload, requests, warmup):
+        names = list(WORKLOADS[workload])
+        weights = list(WORKLOADS[workload].values())
+        for i in range(warmup + requests):
+            operation = getattr(self, self.rng.choices(names, weights)[0])
+            method, path, data = operation()
+            queries = self.queries
+            start = time.perf_counter()
+            with connection.execute_wrapper(self.count_query):
+                response = getattr(self.client, method)(path, data, format='json' if method != 'get' else None)
+            elapsed = (time.perf_counter() - start) * 1000
+            if i < warmup:
+                self.queries = queries
+                continue
+            self.timings.append(elapsed)
+            self.statuses[response.status_code] += 1
+            if method == 'post' and path == reverse('notice-list') and response.status_code == 201:
+                self.created.append(response.data['id'])
+
+    def pick(self, name):
+        return self.rng.choice(self.data[name])
+
+    def list_notices(self):
+        params = {'page_size': self.rng.choice([10, 20, 50])}
+        if self.rng.random() < 0.5:
+            params['category'] = self.pick('notice_categories')
+        if self.rng.random() < 0.3:
+            params['priority'] = self.rng.choice(PRIORITIES)
+        if self.rng.random() < 0.3:
+            params['active_only'] = 'true'
+        return 'get', reverse('notice-list'), params
+
+    def list_articles(self):
+        params = {'page_size': self.rng.choice([10, 20, 50])}
+        if self.rng.random() < 0.5:
+            params['category_id'] = self.pick('category_ids')
+        if self.data['tags'] and self.rng.random() < 0.3:
+            params['tag'] = self.pick('tags')
+        return 'get', reverse('article-list'), params
+
+    def list_comments(self):
+        return 'get', reverse('comment-list'), {'article_id': self.pick('article_ids')}
+
+    def get_stats(self):
+        return 'get', reverse('stats'), None
+
+    def search_notices(self):
+        return 'get', reverse('notice-list'), {'search': make_text(self.rng, self.rng.randint(1, 2))}
+
+    def search_articles(self):
+        return 'get', reverse('article-list'), {'search': make_text(self.rng, self.rng.randint(1, 2))}
+
+    def get_notice(self):
+        return 'get', reverse('notice-detail', args=[self.pick('notice_ids')]), None
+
+    def get_article(self):
+        return 'get', reverse('article-detail', args=[self.pick('article_ids')]), None
+
+    def get_comment(self):
+        return 'get', reverse('comment-detail', args=[self.pick('comment_ids')]), None
+
+    def create_notice(self):
+        return 'post', reverse('notice-list'), {
+            'title': make_text(self.rng, 6),
+            'content': make_text(self.rng, 80),
+            'category': self.pick('notice_categories'),
+            'priority': self.rng.choice(PRIORITIES),
+            'author_id': self.user.pk,
+        }
+
+    def update_notice(self):
+        if not self.created:
+            return self.create_notice()
+        pk = self.rng.choice(self.created)
+        return 'patch', reverse('notice-detail', args=[pk]), {'title': make_text(self.rng, 6)}
+
+    def delete_notice(self):
+        if not self.created:
+            return self.create_notice()
+        pk = self.created.pop(self.rng.randrange(len(self.created)))
+        return 'delete', reverse('notice-detail', args=[pk]), None
+
+    def create_comment(self):
+        return 'post', reverse('comment-list'), {
+            'article': self.pick('article_ids'),
+            'content': make_text(self.rng, 30),
+            'author_id': self.user.pk,
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        'Load benchmark of /api/notices/, /api/articles/, /api/comments/ and /api/stats/: runs filter, search, '
+        'retrieve, write and mixed workloads in-process and reports latency percentiles, requests per second '
+        'and queries per request. Synthetic data is inserted and removed afterwards (rolled back unless '
+        '--concurrency is above 1); --existing runs against the data already in the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workload', action='append', choices=list(WORKLOADS),
+            help='Workload to run (repeatable, default all)',
+        )
+        parser.add_argument('--requests', type=int, default=500, help='Measured requests per workload')
+        parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per worker first')
+        parser.add_argument('--concurrency', type=int, default=1, help='Concurrent workers (threads)')
+        parser.add_argument('--rows', type=int, default=5000, help='Synthetic notices (half as many articles)')
+        parser.add_argument('--existing', action='store_true', help='Use the data in the database')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+        parser.add_argument(
+            '--threshold', type=float, default=10,
+            help='Percent by which p95 latency, requests per second or queries per request may get worse '
+                 'than in --compare before the command fails',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        workloads = options['workload'] or list(WORKLOADS)
+        results = {
+            'meta': {
+                'commit': get_commit(),
+                'date': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'django': get_version(),
+                'fast_lists': getattr(settings, 'FAST_LISTS', False),
+                'options': {
+                    name: options[name]
+                    for name in ['requests', 'warmup', 'concurrency', 'rows', 'existing', 'seed']
+                },
+            },
+            'workloads': {},
+        }
+
+        # A cache of its own: responses cached here must not outlive the run
+        private_cache = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}}
+        with override_settings(CACHES=private_cache), self.benchmark_data(options) as data:
+            self.stdout.write(
+                f"{len(data['notice_ids'])} notices, {len(data['article_ids'])} articles sampled, "
+                f"{options['concurrency']} worker(s)"
+            )
+            self.stdout.write(
+                f"{'workload':<10}{'requests':>10}{'errors':>8}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'q/req':>8}"
+            )
+            for workload in workloads:
+                result = self.run_workload(workload, data, options)
+                results['workloads'][workload] = result
+                self.stdout.write(
+                    f"{workload:<10}{result['requests']:>10}{result['errors']:>8}{result['rps']:>9.1f}"
+                    f"{result['p50_ms']:>7.1f} ms{result['p95_ms']:>7.1f} ms{result['p99_ms']:>7.1f} ms"
+                    f"{result['queries_per_request']:>8.1f}"
+                )
+            # Pending views belong to the data being removed
+            buffer.flush()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if baseline is not None:
+            self.compare(baseline, results, options['threshold'])
+
+    @contextlib.contextmanager
+    def benchmark_data(self, options):
+        rng = make_rng(options['seed'])
+        if options['concurrency'] == 1:
+            with transaction.atomic():
+                yield self.seed(rng, options)
+                buffer.flush()
+                transaction.set_rollback(True)
+            return
+        # Concurrent workers have connections of their own, which only see
+        # committed rows
+        try:
+            yield self.seed(rng, options)
+        finally:
+            buffer.flush()
+            self.remove()
+
+    def seed(self, rng, options):
+        users = [
+            User.objects.create_user(f'{USERNAME_PREFIX}{i}', first_name=make_text(rng, 1))
+            for i in range(max(options['concurrency'], 20))
+        ]
+        if not options['existing']:
+            self.seed_rows(rng, users, options)
+        data = {
+            'users': users,
+            'notice_ids': list(Notice.objects.values_list('pk', flat=True)[:SAMPLE_SIZE]),
+            'notice_categories': list(
+                Notice.objects.order_by().values_list('category', flat=True).distinct()[:100]
+            ) or NOTICE_CATEGORIES,
+            'article_ids': list(Article.objects.values_list('pk', flat=True)[:SAMPLE_SIZE]),
+            'comment_ids': list(Comment.objects.values_list('pk', flat=True)[:SAMPLE_SIZE]),
+            'category_ids': list(Category.objects.values_list('pk', flat=True)),
+            'tags': list(Tag.objects.values_list('name', flat=True)[:200]),
+        }
+        for name in ['notice_ids', 'article_ids', 'comment_ids', 'category_ids']:
+            if not data[name]:
+                raise CommandError(f"No {name.replace('_ids', '')}s to benchmark with, load some or drop --existing")
+        return data
+
+    def seed_rows(self, rng, users, options):
+        count = options['rows']
+        start = time.perf_counter()
+        categories = [Category.objects.create(name=f'{USERNAME_PREFIX}{i}') for i in range(10)]
+        now = timezone.now()
+        notices = (
+            Notice(
+                title=make_text(rng, 6),
+                content=make_text(rng, 80),
+                author=rng.choice(users),
+                category=rng.choice(NOTICE_CATEGORIES),
+                priority=rng.choice(PRIORITIES),
+                pinned=rng.random() < 0.02,
+                expires_at=now + datetime.timedelta(days=rng.randint(-30, 90)) if rng.random() < 0.3 else None,
+            )
+            for _ in range(count)
+        )
+        for batch in chunked(notices, options['batch_size']):
+            Notice.objects.bulk_create(batch)
+        articles = (
+            Article(
+                title=make_text(rng, 6),
+                content=make_text(rng, 300),
+                author=rng.choice(users),
+                category=rng.choice(categories),
+                tags=', '.join(make_text(rng, 3).split()),
+                is_published=rng.random() < 0.9,
+            )
+            for _ in range(count // 2)
+        )
+        for batch in chunked(articles, options['batch_size']):
+            Article.objects.bulk_create(batch)
+        article_ids = list(Article.objects.filter(author__in=users).values_list('pk', flat=True))
+        comments = (
+            Comment(article_id=rng.choice(article_ids), author=rng.choice(users), content=make_text(rng, 30))
+            for _ in range(count)
+        )
+        for batch in chunked(comments, options['batch_size']):
+            Comment.objects.bulk_create(batch)
+
+        # What the save signals would have done
+        for batch in chunked(Article.objects.filter(author__in=users).iterator(), options['batch_size']):
+            sync_article_tags(batch)
+            index_instances(batch)
+        for batch in chunked(Notice.objects.filter(author__in=users).iterator(), options['batch_size']):
+            index_instances(batch)
+        stats.rebuild()
+        bump_versions(['notices.Notice', 'knowledge.Article', 'knowledge.Comment', 'knowledge.Category', 'auth.User'])
+        self.stdout.write(f'Seeded {count} notices in {time.perf_counter() - start:.1f} s')
+
+    def remove(self):
+        # Cascades to everything the workers created
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        Category.objects.filter(name__startswith=USERNAME_PREFIX).delete()
+
+    def run_workload(self, workload, data, options):
+        concurrency = options['concurrency']
+        workers = [
+            Worker(data, data['users'][i], seed=options['seed'] * 1000 + i)
+            for i in range(concurrency)
+        ]
+        shares = [options['requests'] // concurrency + (i < options['requests'] % concurrency) for i in range(concurrency)]
+
+        def run(worker, requests):
+            try:
+                worker.run(workload, requests, options['warmup'])
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connection.close()
+
+        start = time.perf_counter()
+        if concurrency == 1:
+            run(workers[0], shares[0])
+        else:
+            with ThreadPoolExecutor(concurrency) as executor:
+                for future in [executor.submit(run, worker, share) for worker, share in zip(workers, shares)]:
+                    future.result()
+        elapsed = time.perf_counter() - start
+
+        timings = [timing for worker in workers for timing in worker.timings]
+        statuses = sum((worker.statuses for worker in workers), Counter())
+        requests = len(timings)
+        # Warm-up requests are part of the wall time, not of the count
+        measured = elapsed * requests / (requests + options['warmup'] * concurrency)
+        return {
+            'requests': requests,
+            'errors': sum(count for status, count in statuses.items() if status >= 400),
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'seconds': round(elapsed, 3),
+            'rps': requests / measured if measured else 0.0,
+            'mean_ms': sum(timings) / requests if requests else 0.0,
+            'p50_ms': percentile(timings, 50),
+            'p95_ms': percentile(timings, 95),
+            'p99_ms': percentile(timings, 99),
+            'queries_per_request': sum(worker.queries for worker in workers) / requests if requests else 0.0,
+        }
+
+    def compare(self, baseline, results, threshold):
+        self.stdout.write(
+            f"Compared with {baseline['meta'].get('commit') or baseline['meta'].get('date')} "
+            f"(worse by more than {threshold:g}% is a regression)"
+        )
+        if baseline['meta'].get('options') != results['meta']['options']:
+            self.stdout.write(self.style.WARNING('The runs used different options, the figures may not be comparable'))
+        self.stdout.write(f"{'workload':<10}{'p95':>12}{'rps':>12}{'q/req':>12}")
+        regressions = []
+        for workload, result in results['workloads'].items():
+            before = baseline['workloads'].get(workload)
+            if before is None:
+                continue
+            changes = {
+                # Positive is worse
+                'p95': change(before['p95_ms'], result['p95_ms']),
+                'rps': -change(before['rps'], result['rps']),
+                'q/req': change(before['queries_per_request'], result['queries_per_request']),
+            }
+            self.stdout.write(f'{workload:<10}' + ''.join(f'{value:>+11.1f}%' for value in changes.values()))
+            regressions.extend(f'{workload} {name}' for name, value in changes.items() if value > threshold)
+        if regressions:
+            raise CommandError(f"Regressions: {', '.join(regressions)}")
+
+
+def change(before, after):
+    """
+    Percent change from `before` to `after`.
+    """
+    if not before:
+        return 0.0 if not after else 100.0
+    return (after - before) / before * 100
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,86 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api.benchmarking import make_rng, make_text
+from notices.models import Notice
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare creating, updating and deleting notices one request at a time with the bulk endpoint. '
+        'Runs in a transaction that is rolled back, so the database is left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=500, help='Notices per run')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = make_rng(options['seed'])
+        count = options['items']
+        with transaction.atomic():
+            user = User.objects.create_user('benchmark-bulk')
+            client = APIClient()
+            client.force_authenticate(user)
+            items = [
+                {
+                    'title': make_text(rng, 6),
+                    'content': make_text(rng, 80),
+                    'category': rng.choice(['General', 'HR', 'IT', 'Facilities']),
+                    'author_id': user.pk,
+                }
+                for _ in range(count)
+            ]
+
+            def single_create():
+                return [client.post(reverse('notice-list'), item, format='json').data['id'] for item in items]
+
+            def bulk_create():
+                response = client.post(reverse('notice-bulk'), items, format='json')
+                return [result['id'] for result in response.data['results']]
+
+            def single_update(ids):
+                for pk in ids:
+                    client.patch(reverse('notice-detail', args=[pk]), {'pinned': True}, format='json')
+
+            def bulk_update(ids):
+                client.patch(reverse('notice-bulk'), [{'id': pk, 'pinned': True} for pk in ids], format='json')
+
+            def single_delete(ids):
+                for pk in ids:
+                    client.delete(reverse('notice-detail', args=[pk]))
+
+            def bulk_delete(ids):
+                client.delete(reverse('notice-bulk'), {'ids': ids}, format='json')
+
+            self.stdout.write(f"{count} notices{'':<6}{'time':>12}{'per item':>12}{'queries':>10}")
+            for name, create, update, delete in [
+                ('single', single_create, single_update, single_delete),
+                ('bulk', bulk_create, bulk_update, bulk_delete),
+            ]:
+                ids = self.measure(f'{name} create', create)
+                self.measure(f'{name} update', update, ids)
+                self.measure(f'{name} delete', delete, ids)
+                if Notice.objects.filter(pk__in=ids).exists():
+                    raise RuntimeError(f'{name} delete left rows behind')
+
+            transaction.set_rollback(True)
+
+    def measure(self, label, func, *args):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            start = time.perf_counter()
+            result = func(*args)
+            elapsed = (time.perf_counter() - start) * 1000
+        per_item = elapsed / len(args[0] if args else result)
+        self.stdout.write(f'{label:<20}{elapsed:>9.0f} ms{per_item:>9.2f} ms{queries:>10}')
+        return result
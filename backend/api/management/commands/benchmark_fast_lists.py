@@ -0,0 +1,100 @@
+import time
+import tracemalloc
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api.benchmarking import make_rng, make_text
+from api.fastpath import orjson
+from api.testing import unsigned_cursors
+from knowledge.models import Article, Category, Comment
+from notices.models import Notice, NoticeAttachment
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the regular and the fast path (FAST_LISTS) of the notice, article and comment lists: '
+        'requests per second and peak memory allocated per request. Runs in a transaction that is rolled back, '
+        'so the database is left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Notices, articles and comments each')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and path')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = make_rng(options['seed'])
+        count = options['rows']
+        with transaction.atomic(), override_settings(RESPONSE_CACHE={'ENABLED': False}):
+            users = [User.objects.create_user(f'benchmark-fast-{i}', first_name=make_text(rng, 1)) for i in range(20)]
+            categories = [Category.objects.create(name=f'benchmark-fast-{i}') for i in range(10)]
+            notices = Notice.objects.bulk_create(
+                Notice(
+                    title=make_text(rng, 6), content=make_text(rng, 80), author=rng.choice(users),
+                    category=rng.choice(['General', 'HR', 'IT', 'Facilities']),
+                    priority=rng.choice(['low', 'medium', 'high']),
+                )
+                for _ in range(count)
+            )
+            NoticeAttachment.objects.bulk_create(
+                NoticeAttachment(notice=notice, file=f'notice_attachments/{notice.pk}.pdf', filename=f'{notice.pk}.pdf')
+                for notice in rng.sample(notices, count // 4)
+            )
+            articles = Article.objects.bulk_create(
+                Article(
+                    title=make_text(rng, 6), content=make_text(rng, 300), author=rng.choice(users),
+                    category=rng.choice(categories), tags=', '.join(make_text(rng, 3).split()),
+                )
+                for _ in range(count)
+            )
+            Comment.objects.bulk_create(
+                Comment(article=rng.choice(articles), author=rng.choice(users), content=make_text(rng, 30))
+                for _ in range(count)
+            )
+
+            client = APIClient()
+            client.force_authenticate(users[0])
+            params = {'page_size': options['page_size']}
+            self.stdout.write(
+                f"orjson {'installed' if orjson is not None else 'not installed'}, "
+                f"{count} rows, {options['requests']} requests of {options['page_size']} items"
+            )
+            self.stdout.write(f"{'':<22}{'rps':>10}{'ms/req':>10}{'peak KiB':>10}{'max KiB':>10}")
+            for name in ['notice-list', 'article-list', 'comment-list']:
+                url = reverse(name)
+                contents = []
+                for fast in [False, True]:
+                    with override_settings(FAST_LISTS=fast):
+                        contents.append(unsigned_cursors(client.get(url, params).content))
+                        self.measure(f"{name} {'fast' if fast else 'regular'}", client, url, params, options['requests'])
+                if contents[0] != contents[1]:
+                    raise RuntimeError(f'{name}: the fast path returned different content')
+
+            transaction.set_rollback(True)
+
+    def measure(self, label, client, url, params, requests):
+        start = time.perf_counter()
+        for _ in range(requests):
+            client.get(url, params)
+        elapsed = time.perf_counter() - start
+
+        # Memory allocated at the peak of a request, over a few requests
+        # traced separately as tracing slows them down
+        samples = max(1, requests // 10)
+        peaks = []
+        tracemalloc.start()
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            client.get(url, params)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f'{label:<22}{requests / elapsed:>10.0f}{elapsed / requests * 1000:>10.2f}'
+            f'{sum(peaks) / len(peaks) / 1024:>10.0f}{max(peaks) / 1024:>10.0f}'
+        )
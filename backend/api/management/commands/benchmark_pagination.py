@@ -0,0 +1,86 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api.benchmarking import make_rng, make_text, timed, percentile, chunked
+from api.pagination import KeysetPagination
+from notices.models import Notice
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare page-number and keyset pagination of notices at page 1 and a deep page. '
+        'Runs in a transaction that is rolled back, so the database is left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help='Synthetic notices to insert')
+        parser.add_argument('--page', type=int, default=10000, help='Deep page number to compare')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        with transaction.atomic():
+            self.seed(options)
+            queryset = Notice.objects.select_related('author')
+
+            page_size = KeysetPagination.page_size
+            offset = (options['page'] - 1) * page_size
+            # The keyset cursor of the deep page: the position of the last row
+            # of the page before it, as a client following `next` links would have
+            paginator = KeysetPagination()
+            paginator.ordering = paginator.get_ordering(queryset)
+            before = queryset.order_by(*paginator.ordering)[offset - 1]
+            cursor = paginator.make_cursor(before, reverse=False)
+
+            cases = [
+                ('page number', 1, PageNumberPagination, {}),
+                ('page number', options['page'], PageNumberPagination, {'page': options['page']}),
+                ('keyset', 1, KeysetPagination, {}),
+                ('keyset', options['page'], KeysetPagination, {'cursor': cursor}),
+            ]
+            self.stdout.write(f"{'pagination':<14}{'page':>8}{'p50':>12}{'p95':>12}")
+            for name, page, pagination_class, params in cases:
+                request = Request(factory.get('/api/notices/', params))
+
+                def run():
+                    list(pagination_class().paginate_queryset(queryset, request))
+
+                timings = timed(run, options['repeat'])
+                self.stdout.write(
+                    f'{name:<14}{page:>8}{percentile(timings, 50):>9.1f} ms{percentile(timings, 95):>9.1f} ms'
+                )
+
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        rng = make_rng(options['seed'])
+        author, _ = User.objects.get_or_create(username='benchmark')
+        now = timezone.now()
+        start = time.perf_counter()
+        rows = (
+            Notice(
+                title=make_text(rng, 6),
+                content=make_text(rng, 40),
+                category=rng.choice(['General', 'IT', 'HR', 'Facilities']),
+                priority=rng.choice(['low', 'medium', 'medium', 'high']),
+                pinned=rng.random() < 0.01,
+                author=author,
+            )
+            for _ in range(options['rows'])
+        )
+        for batch in chunked(rows, options['batch_size']):
+            Notice.objects.bulk_create(batch)
+        # Spread creation times over a year, bulk_create gives them all "now"
+        Notice.objects.filter(author=author).update(created_at=now)
+        for batch in chunked(Notice.objects.filter(author=author).values_list('pk', flat=True).iterator(), 5000):
+            Notice.objects.filter(pk__in=batch).update(
+                created_at=now - timezone.timedelta(seconds=rng.randrange(365 * 86400))
+            )
+        self.stdout.write(f"Inserted {options['rows']} notices in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,18 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = 'Delete upload sessions (and their partial files) not touched for UPLOAD_SESSION_MAX_AGE seconds'
+
+    def handle(self, *args, **kwargs):
+        cutoff = timezone.now() - timedelta(seconds=settings.UPLOAD_SESSION_MAX_AGE)
+        removed = 0
+        for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+            session.delete()
+            session.discard_file()
+            removed += 1
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} stale upload sessions'))
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.defaultfilters import filesizeformat
+from api import blobs
+from api.conditional import bump_version
+from api.models import Blob
+from api.storage import BLOB_DIR, attachment_storage, content_name
+from knowledge.models import ArticleAttachment
+from notices.models import NoticeAttachment, ArchivedNoticeAttachment
+
+ATTACHMENT_MODELS = [NoticeAttachment, ArchivedNoticeAttachment, ArticleAttachment]
+
+
+class Command(BaseCommand):
+    help = 'Move existing attachment files into content-addressed storage, storing duplicates once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the space that would be saved')
+
+    def handle(self, *args, **options):
+        storage = attachment_storage()
+        dry_run = options['dry_run']
+        seen = set()
+        migrated = missing = before = after = 0
+
+        for model in ATTACHMENT_MODELS:
+            changed = False
+            rows = model.objects.exclude(file__startswith=f'{BLOB_DIR}/').values_list('pk', 'file')
+            for pk, name in rows.iterator():
+                if not name or not storage.exists(name):
+                    missing += 1
+                    continue
+                size = storage.size(name)
+                with storage.open(name) as content:
+                    if dry_run:
+                        blob = content_name(content, name)
+                    else:
+                        blob = storage.save(name, content)
+                if blob not in seen and not Blob.objects.filter(name=blob).exists():
+                    after += size
+                seen.add(blob)
+                before += size
+                migrated += 1
+                if not dry_run:
+                    self.repoint(model, pk, name, blob, size)
+                    changed = True
+            if changed:
+                # The attachments' URLs changed
+                bump_version(model._meta.label)
+
+        saved = before - after
+        percent = saved * 100 / before if before else 0
+        prefix = 'Would migrate' if dry_run else 'Migrated'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} {migrated} attachments ({missing} missing files skipped): '
+            f'{filesizeformat(before)} -> {filesizeformat(after)}, '
+            f'saved {filesizeformat(saved)} ({percent:.1f}%)'
+        ))
+
+    def repoint(self, model, pk, name, blob, size):
+        storage = attachment_storage()
+        with transaction.atomic():
+            if model.objects.filter(pk=pk, file=name).update(file=blob):
+                with storage.open(name) as content:
+                    blobs.acquire(blob, size, content)
+
+            def delete_old():
+                if not any(m.objects.filter(file=name).exists() for m in ATTACHMENT_MODELS):
+                    storage.delete(name)
+            transaction.on_commit(delete_old)
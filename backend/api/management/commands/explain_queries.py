@@ -0,0 +1,99 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import NotSupportedError, connections
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+from knowledge.models import Article, Category
+from knowledge.views import ArticleViewSet, CommentViewSet
+from notices.models import Notice
+from notices.views import NoticeViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the database's query plan for the first page of each list endpoint "
+        'under every filter combination, to check that the indexes are used. '
+        'Uses EXPLAIN, or SET SHOWPLAN_TEXT (SHOWPLAN_XML with --xml) on SQL Server'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=['notices', 'articles', 'comments'], help='Only this endpoint')
+        parser.add_argument('--sql', action='store_true', help='Also print the SQL of each query')
+        parser.add_argument('--xml', action='store_true', help='SQL Server: print the XML showplan')
+
+    def get_cases(self):
+        category = Notice.objects.values_list('category', flat=True).first() or 'General'
+        category_id = Category.objects.values_list('pk', flat=True).first() or 1
+        article_id = Article.objects.values_list('pk', flat=True).first() or 1
+        return {
+            'notices': (NoticeViewSet, [
+                {},
+                {'category': category},
+                {'priority': 'high'},
+                {'active_only': 'true'},
+                {'category': category, 'priority': 'high'},
+                {'category': category, 'active_only': 'true'},
+                {'priority': 'high', 'active_only': 'true'},
+            ]),
+            'articles': (ArticleViewSet, [
+                {},
+                {'category_id': category_id},
+                {'published': 'true'},
+                {'category_id': category_id, 'published': 'true'},
+            ]),
+            'comments': (CommentViewSet, [
+                {},
+                {'article_id': article_id},
+            ]),
+        }
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        user = User.objects.order_by('pk').first()
+
+        for endpoint, (viewset, cases) in self.get_cases().items():
+            if options['endpoint'] and endpoint != options['endpoint']:
+                continue
+            for params in cases:
+                wsgi_request = factory.get(f'/api/{endpoint}/', params)
+                force_authenticate(wsgi_request, user=user)
+                view = viewset(action='list', format_kwarg=None, args=(), kwargs={})
+                view.request = Request(wsgi_request)
+
+                queryset = view.filter_queryset(view.get_queryset())
+                paginator = view.paginator
+                paginator.page_size = paginator.get_page_size(view.request)
+                ordering = paginator.get_ordering(queryset)
+                page = queryset.order_by(*ordering)[:paginator.page_size + 1]
+
+                query = '&'.join(f'{key}={value}' for key, value in params.items())
+                self.stdout.write(self.style.MIGRATE_HEADING(f"/api/{endpoint}/{'?' + query if query else ''}"))
+                if options['sql']:
+                    self.stdout.write(str(page.query))
+                try:
+                    self.stdout.write(self.explain(page, options['xml']))
+                except NotSupportedError:
+                    self.stdout.write(self.style.WARNING('EXPLAIN is not supported by this database backend'))
+                self.stdout.write('')
+
+    def explain(self, queryset, xml=False):
+        connection = connections[queryset.db]
+        if connection.vendor != 'microsoft':
+            return queryset.explain()
+        # mssql-django doesn't support explain(). With SHOWPLAN on, SQL
+        # Server returns the estimated plan instead of running the query;
+        # the SET has to be a batch of its own.
+        option = 'SHOWPLAN_XML' if xml else 'SHOWPLAN_TEXT'
+        sql, params = queryset.query.sql_with_params()
+        lines = []
+        with connection.cursor() as cursor:
+            cursor.execute(f'SET {option} ON')
+            try:
+                cursor.execute(sql, params)
+                while True:
+                    lines.extend(str(row[0]) for row in cursor.fetchall())
+                    if not cursor.nextset():
+                        break
+            finally:
+                cursor.execute(f'SET {option} OFF')
+        return '\n'.join(lines)
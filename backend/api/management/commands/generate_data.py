@@ -0,0 +1,58 @@
+import math
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from api import datagen
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with synthetic users, categories, notices, articles, comments and attachment stubs, '
+        'e.g. to reproduce production volumes locally. Run initialize_data first for the admin user.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1, help='Multiplies every default count')
+        for table, count in datagen.DEFAULT_COUNTS.items():
+            parser.add_argument(f"--{table.replace('_', '-')}", type=int, help=f'Rows (default {count} x scale)')
+        parser.add_argument('--workers', type=int, default=1, help='Parallel worker processes')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per transaction')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT')
+        parser.add_argument('--no-search-index', action='store_true', help='Skip indexing the new rows')
+        parser.add_argument('--prefix', help='Username prefix (default gen<seed>-)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        counts = {
+            table: options[table] if options[table] is not None else math.ceil(count * options['scale'])
+            for table, count in datagen.DEFAULT_COUNTS.items()
+        }
+        prefix = options['prefix'] or f"gen{options['seed']}-"
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'Users named {prefix}* exist already, pass another --seed or --prefix')
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite allows one writer at a time, using one worker'))
+            workers = 1
+
+        self.stdout.write(', '.join(f'{count} {table}' for table, count in counts.items()))
+        start = time.perf_counter()
+        result = datagen.generate(
+            counts,
+            seed=options['seed'],
+            prefix=prefix,
+            workers=workers,
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+            search_index=not options['no_search_index'],
+            progress=self.report,
+        )
+        elapsed = time.perf_counter() - start
+        total = sum(result['inserted'].values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted {total} rows in {elapsed:.1f} s ({total / elapsed:.0f} rows/s)'
+        ))
+
+    def report(self, table, rows, seconds):
+        self.stdout.write(f'{table:<22}{rows:>10} rows{seconds:>9.1f} s{rows / seconds if seconds else 0:>10.0f} rows/s')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from api import stats
+
+
+class Command(BaseCommand):
+    help = 'Recount the dashboard statistics counters and clear the cached statistics'
+
+    def handle(self, *args, **kwargs):
+        counters = stats.rebuild()
+        for name, value in counters.items():
+            self.stdout.write(f'{name}: {value}')
+        self.stdout.write(self.style.SUCCESS('Statistics rebuilt'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    StatCounter = apps.get_model('api', 'StatCounter')
+    for name, (app_label, model_name) in {
+        'total_notices': ('notices', 'Notice'),
+        'total_articles': ('knowledge', 'Article'),
+        'total_categories': ('knowledge', 'Category'),
+        'total_comments': ('knowledge', 'Comment'),
+    }.items():
+        StatCounter.objects.create(name=name, value=apps.get_model(app_label, model_name).objects.count())
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('notices', '0001_initial'),
+        ('knowledge', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
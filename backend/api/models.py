@@ -1,3 +1,122 @@
+import os
+import uuid
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class StatCounter(models.Model):
+    """
+    Row count of a model, kept up to date by signals so the dashboard
+    doesn't need COUNT(*) queries. `manage.py rebuild_stats` recounts.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+
+class ModelVersion(models.Model):
+    """
+    Version number of a model's data, bumped by signals whenever one of its
+    rows is saved or deleted. Used to derive HTTP validators for responses
+    built from those models.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
+
+
+class UploadSession(models.Model):
+    """
+    A resumable attachment upload. The file is sent in fixed-size chunks
+    that are written straight to a temporary file; completing the session
+    moves that file into storage and creates the attachment.
+    """
+    TARGET_CHOICES = [
+        ('notice', 'Notice'),
+        ('article', 'Article'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    target_type = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    target_id = models.BigIntegerField()
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    offset = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size})'
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def temp_path(self):
+        return os.path.join(settings.UPLOAD_SESSION_DIR, str(self.id))
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_range(self, index):
+        """
+        (start, end) byte offsets of chunk `index`, end exclusive.
+        """
+        start = index * self.chunk_size
+        return start, min(self.size, start + self.chunk_size)
+
+    @property
+    def is_complete(self):
+        return self.offset >= self.size
+
+    def discard_file(self):
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+class Blob(models.Model):
+    """
+    A file in content-addressed attachment storage and the number of
+    attachments using it. The file is deleted with its last reference.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.references})'
+
+
+class AuthToken(models.Model):
+    """
+    An API token of a user (see api.tokens). Only a digest of the key is
+    stored; deleting the token revokes it.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='auth_tokens')
+    name = models.CharField(max_length=100, blank=True)
+    key_prefix = models.CharField(max_length=8)
+    key_digest = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.name or self.key_prefix} ({self.user})'
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def is_expired(self):
+        return self.expires_at is not None and self.expires_at <= timezone.now()
@@ -0,0 +1,225 @@
+from datetime import datetime
+from django.core import signing
+from django.db.models import BooleanField, Expression, F, Q, Value
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def decode_value(value):
+    if isinstance(value, dict):
+        return parse_datetime(value['dt'])
+    return value
+
+
+class RowComparison(Expression):
+    """
+    `(a, b, c) < (x, y, z)` for databases with row value comparisons, which
+    they can answer with a single index seek. Elsewhere (SQL Server) it is
+    compiled to the equivalent (a < x) OR (a = x AND b < y) OR ... form.
+    """
+    conditional = True
+    output_field = BooleanField()
+    row_value_vendors = {'sqlite', 'postgresql', 'mysql'}
+
+    def __init__(self, lhs, operator, rhs):
+        super().__init__()
+        self.lhs = list(lhs)
+        self.operator = operator
+        self.rhs = list(rhs)
+
+    def get_source_expressions(self):
+        return [*self.lhs, *self.rhs]
+
+    def set_source_expressions(self, exprs):
+        self.lhs, self.rhs = list(exprs[:len(self.lhs)]), list(exprs[len(self.lhs):])
+
+    def as_sql(self, compiler, connection):
+        lhs = [compiler.compile(expr) for expr in self.lhs]
+        rhs = [compiler.compile(expr) for expr in self.rhs]
+        if connection.vendor in self.row_value_vendors:
+            sql = '(%s) %s (%s)' % (
+                ', '.join(sql for sql, params in lhs),
+                self.operator,
+                ', '.join(sql for sql, params in rhs),
+            )
+            params = [p for sql, params in lhs for p in params] + [p for sql, params in rhs for p in params]
+            return sql, params
+
+        branches, params = [], []
+        for i in range(len(lhs)):
+            parts = []
+            for (lhs_sql, lhs_params), (rhs_sql, rhs_params) in zip(lhs[:i], rhs[:i]):
+                parts.append(f'{lhs_sql} = {rhs_sql}')
+                params.extend([*lhs_params, *rhs_params])
+            parts.append(f'{lhs[i][0]} {self.operator} {rhs[i][0]}')
+            params.extend([*lhs[i][1], *rhs[i][1]])
+            branches.append('(%s)' % ' AND '.join(parts))
+        return '(%s)' % ' OR '.join(branches), params
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on the queryset's own ordering (or the model's
+    Meta.ordering), with the primary key appended as a tie breaker.
+
+    Pages are selected with a WHERE on the ordering columns of the last row
+    seen instead of an OFFSET, and no COUNT(*) is run, so every page costs
+    the same. Ordering may use several fields with mixed directions, model
+    fields or annotations, as long as their values are never NULL.
+    Cursors are signed, so they are opaque and can't be tampered with.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    salt = 'api.pagination.KeysetPagination'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        cursor = self.decode_cursor(request)
+        self.reverse = cursor is not None and cursor['reverse']
+        if cursor is not None:
+            queryset = queryset.filter(self.get_position_filter(cursor['position'], self.reverse))
+
+        ordering = [self.flip(field) for field in self.ordering] if self.reverse else self.ordering
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        del results[self.page_size:]
+        if self.reverse:
+            results.reverse()
+
+        if self.reverse:
+            self.has_next = bool(results)
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None and bool(results)
+        self.results = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        for field in ordering:
+            if not isinstance(field, str):
+                raise ValueError('KeysetPagination only supports ordering by field names')
+        names = [field.lstrip('-') for field in ordering]
+        if 'pk' not in names and queryset.model._meta.pk.name not in names:
+            descending = ordering[-1].startswith('-') if ordering else True
+            ordering.append('-pk' if descending else 'pk')
+        return ordering
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    def get_position_filter(self, position, reverse):
+        """
+        Rows strictly after `position` in the ordering (before it if
+        `reverse`): (a > x) OR (a = x AND b > y) OR ...
+        """
+        directions = {field.startswith('-') != reverse for field in self.ordering}
+        if len(directions) == 1:
+            return RowComparison(
+                [F(field.lstrip('-')) for field in self.ordering],
+                '<' if directions.pop() else '>',
+                [Value(value) for value in position],
+            )
+
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            condition |= Q(**equal, **{f"{name}__{'lt' if descending else 'gt'}": value})
+            equal[name] = value
+        return condition
+
+    def get_position(self, item):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if isinstance(item, dict):
+                value = item[name] if name != 'pk' else item.get('pk', item.get('id'))
+            else:
+                value = getattr(item, name)
+            values.append(value)
+        return values
+
+    def make_cursor(self, item, reverse):
+        """
+        Opaque cursor for the rows after `item` (before it if `reverse`).
+        """
+        payload = {
+            'o': self.ordering,
+            'p': [encode_value(value) for value in self.get_position(item)],
+            'r': reverse,
+        }
+        return signing.dumps(payload, salt=self.salt, compress=True)
+
+    def encode_cursor(self, item, reverse):
+        cursor = self.make_cursor(item, reverse)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = signing.loads(encoded, salt=self.salt)
+        except signing.BadSignature:
+            raise NotFound(self.invalid_cursor_message)
+        if payload.get('o') != self.ordering or len(payload.get('p', ())) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return {
+            'position': [decode_value(value) for value in payload['p']],
+            'reverse': bool(payload.get('r')),
+        }
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.results[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.results[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
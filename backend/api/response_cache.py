@@ -0,0 +1,83 @@
+"""
+Cache of rendered API responses.
+
+ConditionalGetMixin stores the rendered JSON of list and retrieve responses
+under a key made of their ETag (normalized path and query, Accept header and
+the versions of every model the response is built from) and the permission
+scope of the user. Saves and deletes bump those versions (see api.signals),
+so after a change requests simply map to new keys and the stale entries
+expire. A hit costs the one versions query and no serialization.
+
+Hits and misses are counted per view in each process; `metrics.snapshot()`
+returns them.
+"""
+import collections
+import threading
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = collections.defaultdict(collections.Counter)
+
+    def record(self, view, outcome):
+        with self._lock:
+            self._counts[view][outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = {view: dict(counter) for view, counter in self._counts.items()}
+        hits = sum(count.get('hit', 0) for count in counts.values())
+        misses = sum(count.get('miss', 0) for count in counts.values())
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else None,
+            'views': {
+                view: {'hits': count.get('hit', 0), 'misses': count.get('miss', 0)}
+                for view, count in sorted(counts.items())
+            },
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+metrics = Metrics()
+
+
+def get(key, view):
+    """
+    The cached response stored under `key`, or None.
+    """
+    entry = caches[get_config()['CACHE_ALIAS']].get(key)
+    metrics.record(view, 'miss' if entry is None else 'hit')
+    if entry is None:
+        return None
+    content, content_type = entry
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def store(key, response):
+    """
+    Cache a rendered response under `key`.
+    """
+    config = get_config()
+    caches[config['CACHE_ALIAS']].set(key, (response.content, response['Content-Type']), config['TIMEOUT'])
+    response['X-Cache'] = 'MISS'
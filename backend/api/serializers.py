@@ -0,0 +1,62 @@
+import datetime
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+from .fieldsets import SparseFieldsMixin
+from .instrumentation import TimedSerializerMixin
+from . import tokens
+from .models import AuthToken, UploadSession
+
+
+class UploadSessionSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'target_type', 'target_id', 'filename', 'size',
+            'chunk_size', 'offset', 'created_at', 'updated_at',
+        ]
+        read_only_fields = ['chunk_size', 'offset']
+
+    def validate_size(self, value):
+        if value < 0:
+            raise serializers.ValidationError('Size must not be negative')
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'Files may be at most {settings.UPLOAD_MAX_SIZE} bytes')
+        return value
+
+
+class AuthTokenSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    A token without its key, which is only added (`key`) when the token is
+    issued or rotated. `expires_in` sets the expiry in seconds from now;
+    null means never when TOKEN_AUTH['MAX_LIFETIME'] allows it.
+    """
+    expires_in = serializers.IntegerField(min_value=1, required=False, allow_null=True, write_only=True)
+
+    class Meta:
+        model = AuthToken
+        fields = ['id', 'name', 'key_prefix', 'created_at', 'expires_at', 'expires_in']
+        read_only_fields = ['key_prefix', 'created_at', 'expires_at']
+
+    def validate_expires_in(self, value):
+        max_lifetime = tokens.get_config()['MAX_LIFETIME']
+        if max_lifetime and (value is None or value > max_lifetime):
+            raise serializers.ValidationError(f'Tokens may be valid for at most {max_lifetime} seconds')
+        return value
+
+    def validate(self, attrs):
+        if 'expires_in' in attrs:
+            expires_in = attrs.pop('expires_in')
+            attrs['expires_at'] = timezone.now() + datetime.timedelta(seconds=expires_in) if expires_in else None
+        elif self.instance is None:
+            attrs['expires_at'] = tokens.default_expiry()
+        return attrs
+
+    def create(self, validated_data):
+        return tokens.issue(**validated_data)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if hasattr(instance, 'key'):
+            data['key'] = instance.key
+        return data
@@ -0,0 +1,45 @@
+"""
+Session engine (SESSION_ENGINE = 'api.sessions') storing sessions in the
+database, like the default engine, and reading them through the auth cache
+tiers: process memory, then the shared cache, then the database. See
+api.auth_cache.
+"""
+import copy
+from django.contrib.sessions.backends import cached_db
+from . import auth_cache
+
+
+class SessionStore(cached_db.SessionStore):
+    cache_key_prefix = 'api.sessions:'
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = auth_cache.get_shared_cache()
+
+    def load(self):
+        if not auth_cache.get_config()['ENABLED']:
+            return self.load_from_db()
+        key = self.cache_key
+        data = auth_cache.sessions.get(key)
+        if data is None:
+            data = super().load()
+            if not data:
+                return data
+            auth_cache.sessions.set(key, data)
+        # Callers may change the session's values in place
+        return copy.deepcopy(data)
+
+    def load_from_db(self):
+        session = self._get_session_from_db()
+        return self.decode(session.session_data) if session else {}
+
+    def save(self, must_create=False):
+        super().save(must_create)
+        auth_cache.sessions.set(self.cache_key, copy.deepcopy(self._session))
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        if session_key is not None:
+            auth_cache.sessions.delete(self.cache_key_prefix + session_key)
+        super().delete(session_key)
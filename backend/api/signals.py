@@ -0,0 +1,188 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from knowledge.models import Article, ArticleAttachment, Category, Comment
+from knowledge.tags import invalidate_tag_cloud, sync_tags
+from knowledge.view_counts import view_counts_flushed
+from notices.models import Notice, NoticeAttachment, ArchivedNotice, ArchivedNoticeAttachment
+from . import auth_cache, blobs, stats, tokens
+from .conditional import bump_version
+from .events import get_broker
+from .models import AuthToken
+
+COUNTERS = {model: name for name, model in [
+    ('total_notices', Notice),
+    ('total_articles', Article),
+    ('total_categories', Category),
+    ('total_comments', Comment),
+]}
+
+
+@receiver(post_save, sender=Notice)
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Comment)
+def count_created(sender, instance, created, **kwargs):
+    if created:
+        stats.adjust(COUNTERS[sender], 1)
+
+
+@receiver(post_delete, sender=Notice)
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Comment)
+def count_deleted(sender, instance, **kwargs):
+    stats.adjust(COUNTERS[sender], -1)
+    if sender is Notice:
+        # Read counts taken before are recounted, see notices.reads
+        stats.adjust('notice_deletions', 1)
+
+
+@receiver(post_save, sender=Notice)
+@receiver(post_delete, sender=Notice)
+def invalidate_latest_notices(sender, **kwargs):
+    stats.invalidate(stats.LATEST_NOTICES_KEY)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+@receiver(post_save, sender=Category)
+def invalidate_top_articles(sender, **kwargs):
+    stats.invalidate(stats.TOP_ARTICLES_KEY)
+
+
+@receiver(post_save, sender=Article)
+def sync_article_tags(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'tags' not in update_fields:
+        return
+    if created and not instance.tags:
+        return
+    # Unchanged since loaded (instances not loaded from the database are synced)
+    if not created and hasattr(instance, '_loaded_tags') and instance._loaded_tags == instance.tags:
+        return
+    sync_tags(instance)
+    instance._loaded_tags = instance.tags
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def invalidate_article_tag_cloud(sender, **kwargs):
+    # Publishing and deleting articles change the counts too
+    invalidate_tag_cloud()
+
+
+@receiver(view_counts_flushed)
+def invalidate_top_articles_on_views(sender, **kwargs):
+    stats.invalidate(stats.TOP_ARTICLES_KEY)
+    # Articles show their view_count: validators and cached responses change
+    bump_version('knowledge.Article')
+
+
+VERSIONED_MODELS = [
+    Notice, NoticeAttachment, ArchivedNotice, ArchivedNoticeAttachment,
+    Article, ArticleAttachment, Category, Comment, User,
+]
+
+
+def bump_model_version(sender, **kwargs):
+    # Logging in only updates last_login, which no response shows
+    if kwargs.get('update_fields') == frozenset({'last_login'}):
+        return
+    bump_version(sender._meta.label)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_model_version, sender=model, dispatch_uid=f'bump_version_save_{model._meta.label}')
+    post_delete.connect(bump_model_version, sender=model, dispatch_uid=f'bump_version_delete_{model._meta.label}')
+
+
+@receiver(post_save, sender=AuthToken)
+@receiver(post_delete, sender=AuthToken)
+def evict_token(sender, instance, **kwargs):
+    # Revoked, or with a new expiry
+    tokens.evict(instance.key_digest)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Password, is_active and is_staff changes apply to cached sessions and
+    # tokens; logging in only updates last_login
+    if kwargs.get('update_fields') == frozenset({'last_login'}):
+        return
+    auth_cache.invalidate_user(instance.pk)
+    tokens.evict_user(instance.pk)
+
+
+@receiver(pre_save, sender=NoticeAttachment)
+@receiver(pre_save, sender=ArchivedNoticeAttachment)
+@receiver(pre_save, sender=ArticleAttachment)
+def remember_attachment_file(sender, instance, update_fields=None, **kwargs):
+    # The content about to be stored, in case its blob has to be written
+    # again when it is acquired
+    instance._uploaded_file = instance.file.file if instance.file and not instance.file._committed else None
+    if instance._state.adding or (update_fields is not None and 'file' not in update_fields):
+        return
+    instance._previous_file = sender.objects.filter(pk=instance.pk).values_list('file', flat=True).first()
+
+
+@receiver(post_save, sender=NoticeAttachment)
+@receiver(post_save, sender=ArchivedNoticeAttachment)
+@receiver(post_save, sender=ArticleAttachment)
+def acquire_attachment_blob(sender, instance, created, **kwargs):
+    content, instance._uploaded_file = getattr(instance, '_uploaded_file', None), None
+    if created:
+        blobs.acquire(instance.file.name, content=content)
+        return
+    previous = getattr(instance, '_previous_file', None)
+    if previous is not None and previous != instance.file.name:
+        blobs.acquire(instance.file.name, content=content)
+        blobs.release(previous)
+    instance._previous_file = None
+
+
+@receiver(post_delete, sender=NoticeAttachment)
+@receiver(post_delete, sender=ArchivedNoticeAttachment)
+@receiver(post_delete, sender=ArticleAttachment)
+def release_attachment_blob(sender, instance, **kwargs):
+    blobs.release(instance.file.name)
+
+
+def notice_event_data(notice):
+    return {
+        'id': notice.pk,
+        'title': notice.title,
+        'category': notice.category,
+        'priority': notice.priority,
+        'pinned': notice.pinned,
+        'author': notice.author_id,
+        'created_at': notice.created_at,
+        'updated_at': notice.updated_at,
+        'expires_at': notice.expires_at,
+    }
+
+
+def publish_notice_event(type, categories, data):
+    # Only committed changes are announced
+    transaction.on_commit(lambda: get_broker().publish(type, categories, data))
+
+
+@receiver(post_save, sender=Notice)
+def publish_notice_saved(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded', {})
+    if created:
+        type = 'created'
+    elif loaded.get('pinned') is not None and loaded['pinned'] != instance.pinned:
+        type = 'pinned' if instance.pinned else 'unpinned'
+    else:
+        type = 'updated'
+    # Subscribers of the category a notice left hear about it too
+    categories = {instance.category, loaded.get('category')} - {None}
+    publish_notice_event(type, categories, notice_event_data(instance))
+    instance._loaded = {'pinned': instance.pinned, 'category': instance.category}
+
+
+@receiver(post_delete, sender=Notice)
+def publish_notice_deleted(sender, instance, **kwargs):
+    publish_notice_event('deleted', {instance.category}, {'id': instance.pk, 'category': instance.category})
@@ -0,0 +1,144 @@
+"""
+Dashboard statistics.
+
+Totals come from StatCounter rows maintained by signals (see api.signals),
+and every part of the payload is cached until a relevant model changes, so
+a warm /api/stats/ request runs no queries and a cold part costs one query.
+"""
+import collections
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from . import batching
+from .models import StatCounter
+
+# Counter name -> model counted
+COUNTED_MODELS = {
+    'total_notices': 'notices.Notice',
+    'total_articles': 'knowledge.Article',
+    'total_categories': 'knowledge.Category',
+    'total_comments': 'knowledge.Comment',
+}
+
+TOP_ARTICLES = 5
+LATEST_NOTICES = 5
+
+COUNTERS_KEY = 'stats:counters'
+TOP_ARTICLES_KEY = 'stats:top_articles'
+LATEST_NOTICES_KEY = 'stats:latest_notices'
+# Counters that aren't part of the payload
+COUNTER_KEY = 'stats:counter:{}'
+
+
+def get_timeout():
+    return getattr(settings, 'STATS_CACHE_TIMEOUT', 300)
+
+
+def adjust(name, delta):
+    """
+    Add `delta` to a counter. The update is part of the current transaction,
+    so it commits or rolls back together with the change being counted.
+    """
+    batching.defer(apply_adjustments, (name, delta))
+
+
+def apply_adjustments(adjustments):
+    totals = collections.Counter()
+    for name, delta in adjustments:
+        totals[name] += delta
+    for name, delta in totals.items():
+        if delta:
+            StatCounter.objects.filter(name=name).update(value=F('value') + delta)
+    invalidate(COUNTERS_KEY, *(COUNTER_KEY.format(name) for name in totals))
+
+
+def invalidate(*keys):
+    """
+    Drop cached parts now, and again on commit so that a value cached by a
+    concurrent request before the commit doesn't survive it.
+    """
+    cache.delete_many(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_counters():
+    counters = cache.get(COUNTERS_KEY)
+    if counters is None:
+        counters = dict.fromkeys(COUNTED_MODELS, 0)
+        counters.update(StatCounter.objects.filter(name__in=COUNTED_MODELS).values_list('name', 'value'))
+        cache.set(COUNTERS_KEY, counters, get_timeout())
+    return counters
+
+
+def get_counter(name, cached=True):
+    """
+    The value of one counter. `cached=False` reads the row, e.g. to compare
+    it inside a transaction.
+    """
+    if not cached:
+        return StatCounter.objects.filter(name=name).values_list('value', flat=True).first() or 0
+    if name in COUNTED_MODELS:
+        return get_counters()[name]
+    key = COUNTER_KEY.format(name)
+    value = cache.get(key)
+    if value is None:
+        value = get_counter(name, cached=False)
+        cache.set(key, value, get_timeout())
+    return value
+
+
+def get_top_articles():
+    top_articles = cache.get(TOP_ARTICLES_KEY)
+    if top_articles is None:
+        Article = apps.get_model('knowledge', 'Article')
+        top_articles = [
+            {
+                'id': article['id'],
+                'title': article['title'],
+                'view_count': article['view_count'],
+                'category': article['category__name'],
+            }
+            for article in Article.objects.order_by('-view_count', '-pk').values(
+                'id', 'title', 'view_count', 'category__name'
+            )[:TOP_ARTICLES]
+        ]
+        cache.set(TOP_ARTICLES_KEY, top_articles, get_timeout())
+    return top_articles
+
+
+def get_latest_notices():
+    latest_notices = cache.get(LATEST_NOTICES_KEY)
+    if latest_notices is None:
+        Notice = apps.get_model('notices', 'Notice')
+        latest_notices = list(
+            Notice.objects.order_by('-created_at', '-pk').values(
+                'id', 'title', 'priority', 'created_at'
+            )[:LATEST_NOTICES]
+        )
+        cache.set(LATEST_NOTICES_KEY, latest_notices, get_timeout())
+    return latest_notices
+
+
+def get_stats():
+    return {
+        **get_counters(),
+        'top_articles': get_top_articles(),
+        'latest_notices': get_latest_notices(),
+    }
+
+
+def rebuild():
+    """
+    Recount every counter from its table and drop the cached parts.
+    Returns the new counter values.
+    """
+    counters = {}
+    with transaction.atomic():
+        for name, label in COUNTED_MODELS.items():
+            counters[name] = apps.get_model(label).objects.count()
+            StatCounter.objects.update_or_create(name=name, defaults={'value': counters[name]})
+    cache.delete_many([COUNTERS_KEY, TOP_ARTICLES_KEY, LATEST_NOTICES_KEY])
+    return counters
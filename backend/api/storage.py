@@ -0,0 +1,92 @@
+"""
+Content-addressed storage for attachments.
+
+Files are stored under blobs/<aa>/<bb>/<sha256><ext>, so identical content
+is written once however many attachments use it. The hash is computed
+while the upload is streamed to a temporary file next to the blobs, which
+is then renamed into place (or discarded if the blob already exists).
+
+Which attachments use a blob is tracked by api.blobs, which deletes the
+file once its last attachment is gone, and writes it again if that
+happened between an attachment's save and its reference.
+"""
+import hashlib
+import os
+import tempfile
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, storages
+
+BLOB_DIR = 'blobs'
+
+
+def attachment_storage():
+    """
+    Storage of NoticeAttachment.file and ArticleAttachment.file, configured
+    as STORAGES['attachments'].
+    """
+    return storages['attachments']
+
+
+def is_blob(name):
+    return name.startswith(f'{BLOB_DIR}/')
+
+
+def blob_name(digest, ext=''):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}'
+
+
+def content_name(content, name):
+    """
+    Name the blob for `content` would be stored under, without storing it.
+    """
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return blob_name(digest.hexdigest(), os.path.splitext(name)[1])
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # The name passed to _save only supplies the extension; the stored
+        # name comes from the content, and an existing file is the same file.
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1]
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk: hash it in place and move it if it's new
+            source = content.temporary_file_path()
+            digest = hashlib.sha256()
+            with open(source, 'rb') as f:
+                for chunk in iter(lambda: f.read(64 * 1024), b''):
+                    digest.update(chunk)
+            target = blob_name(digest.hexdigest(), ext)
+            if not self.exists(target):
+                os.makedirs(os.path.dirname(self.path(target)), exist_ok=True)
+                file_move_safe(source, self.path(target), allow_overwrite=True)
+                self._set_permissions(target)
+            return target
+
+        tmp_dir = self.path(os.path.join(BLOB_DIR, 'tmp'))
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+            target = blob_name(digest.hexdigest(), ext)
+            if not self.exists(target):
+                os.makedirs(os.path.dirname(self.path(target)), exist_ok=True)
+                os.replace(tmp_path, self.path(target))
+                self._set_permissions(target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return target
+
+    def _set_permissions(self, name):
+        if self.file_permissions_mode is not None:
+            os.chmod(self.path(name), self.file_permissions_mode)
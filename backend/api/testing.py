@@ -0,0 +1,35 @@
+import re
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    Test case mixin that fails when a block of code issues more queries
+    than it is allowed to.
+    """
+
+    def assertMaxQueries(self, budget, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args, **kwargs)
+
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(
+                f"{i}. {query['sql']}"
+                for i, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(
+                f"{executed} queries executed, budget is {budget}\n"
+                f"Captured queries were:\n{queries}"
+            )
+        return result
+
+
+def unsigned_cursors(content):
+    """
+    Response content with the timestamp and signature dropped from its
+    pagination cursors, which differ between two requests made a second
+    apart.
+    """
+    return re.sub(rb'(cursor=[^&"%]+)%3A[^&"]*', rb'\1', content)
@@ -1,3 +1,1418 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import asyncio
+import datetime
+import json
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient
+from notices.models import Notice, NoticeAttachment, ArchivedNotice, ArchivedNoticeAttachment
+from knowledge.models import Category, Article, ArticleAttachment, Comment
+from knowledge.serializers import CommentSerializer
+from knowledge.tags import parse_tags
+from knowledge.views import CommentViewSet
+from knowledge.view_counts import buffer
+from . import auth_cache, instrumentation, tokens
+from .events import LocalBroker, get_broker, stream
+from .models import AuthToken, Blob, StatCounter, UploadSession
+from .response_cache import metrics
+from .pagination import RowComparison
+from .storage import ContentAddressedStorage, attachment_storage
+from .testing import QueryBudgetMixin, unsigned_cursors
+from .urls import router
 
-# Create your tests here.
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Every list and detail endpoint under /api/ has a declared query budget.
+    The fixture holds more rows than a page and several related rows per
+    object, so an N+1 regression shows up as a blown budget.
+    """
+
+    # Maximum number of queries per URL name. Every endpoint registered on
+    # the API router must have both a list and a detail budget.
+    QUERY_BUDGETS = {
+        'user-list': 3,
+        'user-detail': 2,
+        'notice-list': 4,
+        'notice-detail': 4,
+        'archived-notice-list': 3,
+        'archived-notice-detail': 3,
+        'category-list': 3,
+        'category-detail': 2,
+        'article-list': 2,
+        'article-detail': 4,
+        'article-comments': 2,
+        'comment-list': 1,
+        'comment-detail': 1,
+        'upload-list': 2,
+        'upload-detail': 1,
+        'token-list': 2,
+        'token-detail': 1,
+        'stats': 3,
+    }
+
+    ROWS = 15
+    CHILDREN = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('budget', password='budget')
+        authors = [cls.user] + [
+            User.objects.create_user(f'author{i}') for i in range(cls.CHILDREN)
+        ]
+        categories = [
+            Category.objects.create(name=f'Category {i}') for i in range(cls.CHILDREN)
+        ]
+
+        for i in range(cls.ROWS):
+            notice = Notice.objects.create(
+                title=f'Notice {i}',
+                content='Content',
+                author=authors[i % len(authors)],
+                category='General',
+                pinned=i % 4 == 0,
+            )
+            article = Article.objects.create(
+                title=f'Article {i}',
+                content='Content',
+                author=authors[i % len(authors)],
+                category=categories[i % len(categories)],
+                tags='a,b',
+            )
+            for j in range(cls.CHILDREN):
+                NoticeAttachment.objects.create(
+                    notice=notice, file=f'notice_attachments/{i}-{j}.pdf', filename=f'{i}-{j}.pdf'
+                )
+                ArticleAttachment.objects.create(
+                    article=article, file=f'article_attachments/{i}-{j}.pdf', filename=f'{i}-{j}.pdf'
+                )
+                Comment.objects.create(article=article, author=authors[j], content='Comment')
+
+        now = timezone.now()
+        for i in range(cls.ROWS):
+            archived = ArchivedNotice.objects.create(
+                id=10000 + i, title=f'Archived {i}', content='Content', author=authors[i % len(authors)],
+                category='General', created_at=now, updated_at=now, expires_at=now, archived_at=now,
+            )
+            for j in range(cls.CHILDREN):
+                ArchivedNoticeAttachment.objects.create(
+                    id=10000 + i * cls.CHILDREN + j, notice=archived,
+                    file=f'notice_attachments/{i}-{j}.pdf', filename=f'{i}-{j}.pdf', upload_date=now,
+                )
+
+        for i in range(cls.ROWS):
+            UploadSession.objects.create(
+                owner=cls.user, target_type='notice', target_id=1,
+                filename=f'{i}.pdf', size=1024, chunk_size=256,
+            )
+            tokens.issue(cls.user, name=f'Token {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_endpoints(self):
+        for prefix, viewset, basename in router.registry:
+            obj = viewset.queryset.order_by('pk').first()
+            yield f'{basename}-list', reverse(f'{basename}-list')
+            yield f'{basename}-detail', reverse(f'{basename}-detail', args=[obj.pk])
+        article = Article.objects.order_by('pk').first()
+        yield 'article-comments', reverse('article-comments', args=[article.pk])
+        yield 'stats', reverse('stats')
+
+    def test_every_endpoint_has_a_budget(self):
+        missing = [name for name, url in self.get_endpoints() if name not in self.QUERY_BUDGETS]
+        self.assertEqual(missing, [])
+
+    def test_endpoints_stay_within_budget(self):
+        for name, url in self.get_endpoints():
+            with self.subTest(endpoint=name):
+                response = self.assertMaxQueries(self.QUERY_BUDGETS[name], self.client.get, url)
+                self.assertEqual(response.status_code, 200)
+
+
+class StatsTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('stats')
+        cls.category = Category.objects.create(name='Guides')
+        for i in range(3):
+            Notice.objects.create(title=f'Notice {i}', content='...', author=cls.user, category='General')
+        cls.article = Article.objects.create(
+            title='Popular', content='...', author=cls.user, category=cls.category, view_count=7
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_stats(self):
+        return self.client.get(reverse('stats')).data
+
+    def test_warm_stats_run_no_queries(self):
+        self.get_stats()
+        data = self.assertMaxQueries(0, self.get_stats)
+        self.assertEqual(data['total_notices'], 3)
+        self.assertEqual(data['total_articles'], 1)
+        self.assertEqual(data['top_articles'][0]['category'], 'Guides')
+
+    def test_counters_follow_saves_and_deletes(self):
+        self.get_stats()
+        notice = Notice.objects.create(title='New', content='...', author=self.user, category='General')
+        Comment.objects.create(article=self.article, author=self.user, content='Hi')
+        data = self.get_stats()
+        self.assertEqual(data['total_notices'], 4)
+        self.assertEqual(data['total_comments'], 1)
+        self.assertEqual(data['latest_notices'][0]['id'], notice.pk)
+
+        notice.delete()
+        self.assertEqual(self.get_stats()['total_notices'], 3)
+
+    def test_rebuild_fixes_drift(self):
+        StatCounter.objects.filter(name='total_notices').update(value=42)
+        call_command('rebuild_stats', stdout=StringIO())
+        self.assertEqual(self.get_stats()['total_notices'], 3)
+
+
+class FacetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('facets')
+        cls.guides = Category.objects.create(name='Guides')
+        cls.policies = Category.objects.create(name='Policies')
+        for category, priority in [('HR', 'high'), ('HR', 'low'), ('IT', 'high'), ('IT', 'high')]:
+            Notice.objects.create(
+                title=f'{category} notice', content='...', author=cls.user, category=category, priority=priority
+            )
+        for category, published in [(cls.guides, True), (cls.guides, False), (cls.policies, True)]:
+            Article.objects.create(
+                title='Article', content='...', author=cls.user, category=category, is_published=published
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_facets(self, params=None):
+        return self.client.get(reverse('facets'), params).data
+
+    def counts(self, facet):
+        return {entry['value']: entry['count'] for entry in facet}
+
+    def test_counts_per_facet(self):
+        data = self.assertMaxQueries(4, self.get_facets)
+        notices = data['notices']
+        self.assertEqual(notices['count'], 4)
+        self.assertEqual(notices['category'], [{'value': 'HR', 'count': 2}, {'value': 'IT', 'count': 2}])
+        self.assertEqual(self.counts(notices['priority']), {'low': 1, 'medium': 0, 'high': 3})
+
+        articles = data['articles']
+        self.assertEqual(articles['count'], 3)
+        self.assertEqual(articles['category'], [
+            {'id': self.guides.pk, 'name': 'Guides', 'count': 2},
+            {'id': self.policies.pk, 'name': 'Policies', 'count': 1},
+        ])
+        self.assertEqual(self.counts(articles['published']), {True: 2, False: 1})
+
+    def test_facets_ignore_their_own_filter(self):
+        data = self.get_facets({'category': 'HR', 'published': 'true', 'type': ['notice', 'article']})
+        notices = data['notices']
+        self.assertEqual(notices['count'], 2)
+        # Other categories are still counted, priorities only within HR
+        self.assertEqual(self.counts(notices['category']), {'HR': 2, 'IT': 2})
+        self.assertEqual(self.counts(notices['priority']), {'low': 1, 'medium': 0, 'high': 1})
+
+        articles = data['articles']
+        self.assertEqual(articles['count'], 2)
+        self.assertEqual([entry['count'] for entry in articles['category']], [1, 1])
+        self.assertEqual(self.counts(articles['published']), {True: 2, False: 1})
+
+    def test_type_and_search(self):
+        data = self.get_facets({'type': 'notice', 'search': 'IT'})
+        self.assertNotIn('articles', data)
+        self.assertEqual(data['notices']['count'], 2)
+        self.assertEqual(self.counts(data['notices']['category']), {'IT': 2})
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_search_counts_every_match(self):
+        data = self.get_facets({'type': 'notice', 'search': 'notice'})
+        self.assertEqual(data['notices']['count'], 4)
+        self.assertEqual(self.counts(data['notices']['category']), {'HR': 2, 'IT': 2})
+
+    def test_cached_until_a_write(self):
+        self.get_facets()
+        data = self.assertMaxQueries(1, self.get_facets)
+        self.assertEqual(data['notices']['count'], 4)
+
+        Notice.objects.create(title='New', content='...', author=self.user, category='HR')
+        self.assertEqual(self.get_facets()['notices']['count'], 5)
+        self.guides.name = 'Handbooks'
+        self.guides.save()
+        self.assertEqual(self.get_facets()['articles']['category'][0]['name'], 'Handbooks')
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('pager')
+        for i in range(25):
+            Notice.objects.create(
+                title=f'Notice {i}', content='fire drill' if i % 2 else 'parking', author=cls.user,
+                category='IT' if i % 3 else 'HR', priority='high' if i % 5 else 'low', pinned=i % 7 == 0,
+            )
+        # Ties on created_at must be broken by the primary key
+        Notice.objects.filter(pk__in=Notice.objects.order_by('pk').values('pk')[:10]).update(
+            created_at=timezone.now()
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, params=None):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            ids.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                return ids, response
+            response = self.client.get(response.data['next'])
+
+    def test_pages_follow_model_ordering_with_filters(self):
+        for params in [{}, {'category': 'IT'}, {'priority': 'high', 'active_only': 'true'}]:
+            with self.subTest(params=params):
+                expected = list(
+                    Notice.objects.filter(**{k: v for k, v in params.items() if k != 'active_only'})
+                    .order_by('-pinned', '-created_at', '-pk').values_list('pk', flat=True)
+                )
+                ids, last = self.walk(reverse('notice-list'), params)
+                self.assertEqual(ids, expected)
+
+                # And back again through the previous links
+                previous_ids = []
+                response = last
+                while response.data['previous']:
+                    response = self.client.get(response.data['previous'])
+                    previous_ids = [item['id'] for item in response.data['results']] + previous_ids
+                self.assertEqual(previous_ids + [item['id'] for item in last.data['results']], expected)
+
+    def test_pages_without_row_value_support(self):
+        expected = list(Notice.objects.order_by('-pinned', '-created_at', '-pk').values_list('pk', flat=True))
+        with mock.patch.object(RowComparison, 'row_value_vendors', set()):
+            ids, last = self.walk(reverse('notice-list'))
+        self.assertEqual(ids, expected)
+
+    def test_search_results_are_paginated_by_rank(self):
+        ids, response = self.walk(reverse('notice-list'), {'search': 'fire', 'page_size': 5})
+        self.assertEqual(sorted(ids), sorted(Notice.objects.filter(content='fire drill').values_list('pk', flat=True)))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('notice-list'), {'cursor': 'nonsense'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('poller')
+        cls.notice = Notice.objects.create(title='Notice', content='...', author=cls.user, category='General')
+        cls.article = Article.objects.create(
+            title='Article', content='...', author=cls.user, category=Category.objects.create(name='Guides')
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertRevalidates(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.assertMaxQueries(1, self.client.get, url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_article_list_changes_with_flushed_views(self):
+        def view():
+            buffer.record(self.article.pk)
+            buffer.flush()
+        buffer.flush()
+        self.addCleanup(buffer.flush)
+        self.assertRevalidates(reverse('article-list'), view)
+        results = json.loads(self.client.get(reverse('article-list')).content)['results']
+        self.assertEqual(results[0]['view_count'], Article.objects.get(pk=self.article.pk).view_count)
+
+    def test_notice_list_changes_with_attachments(self):
+        self.assertRevalidates(reverse('notice-list'), lambda: NoticeAttachment.objects.create(
+            notice=self.notice, file='notice_attachments/a.pdf', filename='a.pdf'
+        ))
+
+    def test_article_detail_changes_with_comments(self):
+        url = reverse('article-detail', args=[self.article.pk])
+        self.assertRevalidates(url, lambda: Comment.objects.create(
+            article=self.article, author=self.user, content='Hi'
+        ))
+
+    def test_validators_differ_per_query(self):
+        first = self.client.get(reverse('notice-list'))['ETag']
+        second = self.client.get(reverse('notice-list'), {'priority': 'high'})['ETag']
+        self.assertNotEqual(first, second)
+
+    def test_last_modified(self):
+        response = self.client.get(reverse('notice-list'))
+        response = self.client.get(reverse('notice-list'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_last_modified_changes_with_read_state(self):
+        last_modified = self.client.get(reverse('notice-list'))['Last-Modified']
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + datetime.timedelta(seconds=10)):
+            self.client.post(reverse('notice-mark-read', args=[self.notice.pk]))
+        response = self.client.get(reverse('notice-list'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'][0]['is_read'])
+
+    def test_active_only_changes_when_notices_expire(self):
+        now = timezone.now()
+        Notice.objects.create(
+            title='Expiring', content='...', author=self.user, category='General',
+            expires_at=now + datetime.timedelta(hours=1),
+        )
+        url = reverse('notice-list')
+        response = self.client.get(url, {'active_only': 'true'})
+        self.assertEqual(len(response.data['results']), 2)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get(url, {'active_only': 'true'}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with mock.patch('django.utils.timezone.now', return_value=now + datetime.timedelta(hours=2)):
+            response = self.client.get(url, {'active_only': 'true'}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([notice['title'] for notice in response.data['results']], ['Notice'])
+            response = self.client.get(url, {'active_only': 'true'}, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, 200)
+
+
+class ResponseCacheTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cached')
+        cls.admin = User.objects.create_user('cache-admin', is_staff=True)
+        cls.category = Category.objects.create(name='Guides')
+        cls.article = Article.objects.create(title='Cached', content='...', author=cls.user, category=cls.category)
+        cls.notice = Notice.objects.create(title='Cached', content='...', author=cls.user, category='General')
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_hits_only_run_the_versions_query(self):
+        for name in ['notice-list', 'article-list', 'category-list', 'user-list']:
+            with self.subTest(endpoint=name):
+                first = self.client.get(reverse(name), {'page_size': 5, 'search': ''})
+                self.assertEqual(first['X-Cache'], 'MISS')
+                # Parameter order doesn't matter
+                second = self.assertMaxQueries(1, self.client.get, reverse(name) + '?search=&page_size=5')
+                self.assertEqual(second['X-Cache'], 'HIT')
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_writes_invalidate(self):
+        url = reverse('article-list')
+        self.client.get(url)
+        Comment.objects.create(article=self.article, author=self.user, content='New')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['comment_count'], 1)
+
+        url = reverse('notice-detail', args=[self.notice.pk])
+        self.client.get(url)
+        NoticeAttachment.objects.create(notice=self.notice, file='notice_attachments/a.pdf', filename='a.pdf')
+        self.assertEqual(len(self.client.get(url).json()['attachments']), 1)
+
+    def test_scopes_are_separate(self):
+        url = reverse('category-list')
+        self.client.get(url)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_hosts_and_schemes_are_separate(self):
+        url = reverse('notice-list')
+        Notice.objects.bulk_create([
+            Notice(title=f'More {i}', content='...', author=self.user, category='General') for i in range(3)
+        ])
+        self.client.get(url, {'page_size': 1})
+        for extra in [{'HTTP_HOST': 'other.example.com'}, {'secure': True}]:
+            with self.subTest(**extra):
+                response = self.client.get(url, {'page_size': 1}, **extra)
+                self.assertEqual(response['X-Cache'], 'MISS')
+                self.assertEqual(response.json()['next'].split('?')[0], response.wsgi_request.build_absolute_uri(url))
+
+    def test_read_state_is_part_of_the_key(self):
+        url = reverse('notice-list')
+        self.client.get(url)
+        self.client.post(reverse('notice-mark-read', args=[self.notice.pk]))
+        self.assertTrue(self.client.get(url).json()['results'][0]['is_read'])
+
+    def test_uncached_responses(self):
+        # Article views are counted on every request
+        url = reverse('article-detail', args=[self.article.pk])
+        self.addCleanup(buffer.flush)
+        self.client.get(url)
+        self.assertNotIn('X-Cache', self.client.get(url))
+        # Browsable API
+        self.assertNotIn('X-Cache', self.client.get(reverse('category-list'), HTTP_ACCEPT='text/html'))
+        with self.settings(RESPONSE_CACHE={'ENABLED': False}):
+            self.assertNotIn('X-Cache', self.client.get(reverse('category-list')))
+
+    def test_metrics(self):
+        url = reverse('category-list')
+        for _ in range(3):
+            self.client.get(url)
+        self.assertEqual(self.client.get(reverse('response-cache')).status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        data = self.client.get(reverse('response-cache')).data
+        self.assertEqual(data['views']['category-list'], {'hits': 2, 'misses': 1})
+        self.assertEqual(data['hit_ratio'], 2 / 3)
+
+
+class SparseFieldsetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('sparse')
+        cls.category = Category.objects.create(name='Guides')
+        cls.notice = Notice.objects.create(title='Sparse', content='x' * 1000, author=cls.user, category='HR')
+        cls.attachment = NoticeAttachment.objects.create(
+            notice=cls.notice, file='notice_attachments/a.pdf', filename='a.pdf'
+        )
+        cls.article = Article.objects.create(title='Sparse', content='...', author=cls.user, category=cls.category)
+        Comment.objects.create(article=cls.article, author=cls.user, content='Hi')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data, [query['sql'] for query in queries]
+
+    def test_fields_select_only_the_requested_columns(self):
+        data, queries = self.get(reverse('notice-list'), fields='id,title,priority')
+        self.assertEqual(data['results'], [{'id': self.notice.pk, 'title': 'Sparse', 'priority': 'medium'}])
+        # No attachments prefetch and no author join
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn('"content"', queries[-1])
+        self.assertNotIn('auth_user', queries[-1])
+
+    def test_relations_are_keys_unless_expanded(self):
+        data, queries = self.get(reverse('notice-list'), fields='id,author,attachments')
+        self.assertEqual(data['results'][0]['author'], self.user.pk)
+        self.assertEqual(data['results'][0]['attachments'], [self.attachment.pk])
+
+        data, queries = self.get(reverse('notice-list'), fields='id,author,attachments', expand='author')
+        self.assertEqual(data['results'][0]['author']['username'], 'sparse')
+        self.assertEqual(data['results'][0]['attachments'], [self.attachment.pk])
+
+        data, queries = self.get(
+            reverse('article-detail', args=[self.article.pk]), fields=['id', 'comments'], expand='comments'
+        )
+        self.assertEqual(list(data), ['id', 'comments'])
+        self.assertEqual(data['comments'][0]['author']['username'], 'sparse')
+
+    def test_annotations_are_skipped(self):
+        data, queries = self.get(reverse('article-list'), fields='id,comment_count')
+        self.assertEqual(data['results'], [{'id': self.article.pk, 'comment_count': 1}])
+        self.assertNotIn('knowledge_articleattachment', queries[-1])
+
+    def test_every_serializer(self):
+        for url in [reverse('user-list'), reverse('category-list'), reverse('comment-list'), reverse('upload-list')]:
+            with self.subTest(url=url):
+                data, queries = self.get(url, fields='id')
+                for item in data['results']:
+                    self.assertEqual(list(item), ['id'])
+
+    def test_writes_are_unaffected(self):
+        response = self.client.patch(
+            reverse('notice-detail', args=[self.notice.pk]) + '?fields=id', {'title': 'Renamed'}, format='json'
+        )
+        self.assertEqual(response.data['title'], 'Renamed')
+        self.assertIn('content', response.data)
+
+
+class FastPathTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fast', first_name='Zoë', email='fast@example.com')
+        cls.other = User.objects.create_user('other')
+        cls.category = Category.objects.create(name='Guides')
+        policies = Category.objects.create(name='Policies', description='')
+        for i in range(7):
+            notice = Notice.objects.create(
+                title=f'Notice {i} \u2028 «quoted»', content=f'Budget line {i}', author=cls.user,
+                category='HR' if i % 2 else 'IT', priority='high' if i % 3 else 'low', pinned=i == 3,
+            )
+            if i % 2:
+                NoticeAttachment.objects.create(
+                    notice=notice, file=f'notice_attachments/{i}.pdf', filename=f'{i}.pdf'
+                )
+            article = Article.objects.create(
+                title=f'Article {i}', content='Budget ' * 100, author=cls.other if i % 2 else cls.user,
+                category=cls.category if i % 3 else policies, tags='budget, finance',
+            )
+            Comment.objects.create(article=article, author=cls.user, content=f'Comment {i}\n"quoted"')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.post(reverse('notice-mark-read', args=[Notice.objects.order_by('pk')[1].pk]))
+        # Both paths render every response
+        settings = override_settings(RESPONSE_CACHE={'ENABLED': False})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def get(self, url, params, fast):
+        with override_settings(FAST_LISTS=fast):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertSameResponse(self, url, params=None):
+        regular = self.get(url, params, False)
+        fast = self.get(url, params, True)
+        self.assertEqual(unsigned_cursors(fast.content), unsigned_cursors(regular.content))
+        self.assertEqual(fast['Content-Type'], regular['Content-Type'])
+        return fast
+
+    def test_lists_match_the_regular_path(self):
+        for url in [reverse('notice-list'), reverse('article-list'), reverse('comment-list')]:
+            for params in [
+                {}, {'page_size': 3}, {'fields': 'id,title'}, {'fields': 'id,author,attachments'},
+                {'fields': 'id,author', 'expand': 'author'}, {'search': 'budget'},
+            ]:
+                with self.subTest(url=url, params=params):
+                    self.assertSameResponse(url, params)
+
+    def test_filters_match_the_regular_path(self):
+        self.assertSameResponse(reverse('notice-list'), {'category': 'HR', 'priority': 'high'})
+        self.assertSameResponse(reverse('article-list'), {'tag': 'finance', 'category': self.category.pk})
+        self.assertSameResponse(reverse('comment-list'), {'article_id': Article.objects.first().pk})
+
+    def test_pages_match_the_regular_path(self):
+        url, params = reverse('notice-list'), {'page_size': 2}
+        while url:
+            response = self.assertSameResponse(url, params)
+            url, params = response.json()['next'], None
+
+    def test_indented_json_matches_the_regular_path(self):
+        regular = self.client.get(reverse('article-list'), HTTP_ACCEPT='application/json; indent=2')
+        with override_settings(FAST_LISTS=True):
+            fast = self.client.get(reverse('article-list'), HTTP_ACCEPT='application/json; indent=2')
+        self.assertEqual(fast.content, regular.content)
+
+    def test_fast_path_query_budget(self):
+        with override_settings(FAST_LISTS=True):
+            # Versions, read state, notices, attachments
+            self.assertMaxQueries(4, self.client.get, reverse('notice-list'))
+            self.assertMaxQueries(2, self.client.get, reverse('article-list'))
+            self.assertMaxQueries(1, self.client.get, reverse('comment-list'))
+
+    def test_unsupported_serializers_use_the_regular_path(self):
+        class Custom(CommentSerializer):
+            def to_representation(self, instance):
+                return {'id': instance.pk}
+
+        with mock.patch.object(CommentViewSet, 'serializer_class', Custom):
+            response = self.get(reverse('comment-list'), None, True)
+        self.assertEqual(set(response.json()['results'][0]), {'id'})
+
+
+class PerformanceMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('timed')
+        cls.staff = User.objects.create_user('metrics', is_staff=True)
+        Notice.objects.create(title='Timed', content='...', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        instrumentation.registry.reset()
+        self.addCleanup(instrumentation.registry.reset)
+        # The middleware is set up on the client's first request
+        settings = override_settings(PERFORMANCE_METRICS={'ENABLED': True})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_timings(self, response):
+        return {entry.split(';')[0]: entry for entry in response['Server-Timing'].split(', ')}
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('notice-list'))
+        timings = self.get_timings(response)
+        self.assertEqual(set(timings), {'db', 'view', 'serialize', 'render', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timings['db'])
+
+    def test_cache_hits_are_not_serialized(self):
+        self.client.get(reverse('notice-list'))
+        response = self.client.get(reverse('notice-list'))
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(set(self.get_timings(response)), {'db', 'view', 'total'})
+
+    def test_log_line(self):
+        with self.assertLogs('api.performance', 'INFO') as logs:
+            response = self.client.get(reverse('notice-list'))
+        self.assertIn('method=GET route=notice-list status=200', logs.output[0])
+        fields = logs.records[0].performance
+        self.assertEqual(fields['bytes'], len(response.content))
+        self.assertGreater(fields['queries'], 0)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('notice-list'))
+        self.client.get(reverse('notice-list'))
+        self.client.get(reverse('stats'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(reverse('metrics'), HTTP_ACCEPT='text/plain')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        content = response.content.decode()
+        self.assertIn('# TYPE api_request_duration_seconds histogram', content)
+        self.assertIn('api_request_duration_seconds_count{route="notice-list",method="GET"} 2', content)
+        self.assertIn('api_request_duration_seconds_bucket{route="notice-list",method="GET",le="+Inf"} 2', content)
+        self.assertIn('api_request_queries_count{route="stats",method="GET"} 1', content)
+
+    @override_settings(PERFORMANCE_METRICS={'ENABLED': False})
+    def test_disabled(self):
+        response = self.client.get(reverse('notice-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.get(reverse('metrics')).content, b'')
+
+
+class BenchmarkCommandTests(TestCase):
+    def run_benchmark(self, *args):
+        out = StringIO()
+        call_command('benchmark', '--rows', '40', '--requests', '10', '--warmup', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_results_and_comparison(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'results.json')
+        self.run_benchmark('--workload', 'filter', '--workload', 'write', '--output', path)
+        with open(path) as f:
+            results = json.load(f)
+        self.assertEqual(set(results['workloads']), {'filter', 'write'})
+        filter_results = results['workloads']['filter']
+        self.assertEqual(filter_results['requests'], 10)
+        self.assertEqual(filter_results['errors'], 0)
+        self.assertLessEqual(filter_results['p50_ms'], filter_results['p99_ms'])
+        self.assertGreater(filter_results['queries_per_request'], 0)
+        # The synthetic rows are gone
+        self.assertFalse(User.objects.filter(username__startswith='benchmark-load-').exists())
+
+        # Against a baseline making far fewer queries
+        for result in results['workloads'].values():
+            result['queries_per_request'] /= 10
+        with open(path, 'w') as f:
+            json.dump(results, f)
+        with self.assertRaisesMessage(CommandError, 'filter q/req'):
+            self.run_benchmark('--workload', 'filter', '--compare', path)
+
+
+class DataGenerationTests(TestCase):
+    COUNTS = [
+        '--users', '6', '--categories', '2', '--notices', '30', '--articles', '12', '--comments', '20',
+        '--notice-attachments', '5', '--article-attachments', '4', '--chunk-size', '7', '--batch-size', '5',
+    ]
+
+    def generate(self, *args):
+        out = StringIO()
+        call_command('generate_data', *self.COUNTS, *args, stdout=out)
+        return out.getvalue()
+
+    def test_generated_rows(self):
+        output = self.generate('--seed', '3')
+        self.assertIn('rows/s', output)
+        self.assertEqual(User.objects.filter(username__startswith='gen3-').count(), 6)
+        self.assertEqual(Notice.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 20)
+        self.assertEqual(NoticeAttachment.objects.count(), 5)
+        self.assertEqual(ArticleAttachment.objects.count(), 4)
+        self.assertTrue(Notice.objects.filter(author__username__startswith='gen3-').exists())
+        names = [*NoticeAttachment.objects.values_list('file', flat=True),
+                 *ArticleAttachment.objects.values_list('file', flat=True)]
+        self.assertTrue(all(name.startswith('blobs/') for name in names))
+        self.assertEqual(
+            dict(Blob.objects.values_list('name', 'references')), {name: names.count(name) for name in names}
+        )
+        # What the save signals would have done
+        for article in Article.objects.all():
+            self.assertEqual(
+                sorted(article.tag_set.values_list('name', flat=True)), sorted(parse_tags(article.tags))
+            )
+        article = Article.objects.filter(is_published=True).first()
+        self.client.force_login(User.objects.get(username='gen3-0'))
+        hits = self.client.get(reverse('search'), {'q': article.title, 'type': 'article', 'limit': 50}).data
+        self.assertIn(article.pk, [hit['id'] for hit in hits['results']])
+        # Rows created afterwards do not collide with the generated ones
+        Notice.objects.create(title='Later', content='...', author=User.objects.first(), category='General')
+
+        with self.assertRaisesMessage(CommandError, 'exist already'):
+            self.generate('--seed', '3')
+
+    def test_same_seed_same_data(self):
+        fields = ['title', 'content', 'category', 'priority', 'pinned', 'author__first_name']
+        self.generate('--seed', '4')
+        first = list(Notice.objects.order_by('pk').values_list(*fields))
+        Notice.objects.all().delete()
+        self.generate('--seed', '4', '--prefix', 'again-')
+        self.assertEqual(list(Notice.objects.order_by('pk').values_list(*fields)), first)
+
+
+class TokenAuthTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('integration', password='secret')
+
+    def setUp(self):
+        tokens.cache.clear()
+        self.client = APIClient()
+
+    def issue(self, **data):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('token-list'), {'name': 'Script', **data}, format='json')
+        self.client.force_authenticate(None)
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def get_stats(self, key):
+        return self.client.get(reverse('stats'), HTTP_AUTHORIZATION=f'Token {key}')
+
+    def test_issue_and_authenticate(self):
+        token = self.issue()
+        self.assertEqual(token['key'][:8], token['key_prefix'])
+        self.assertIsNotNone(token['expires_at'])
+        stored = AuthToken.objects.get()
+        self.assertNotIn(token['key'], [stored.key_digest, stored.key_prefix])
+
+        self.assertEqual(self.get_stats(token['key']).status_code, 200)
+        # Cached: no token or user queries
+        with self.assertNumQueries(0):
+            self.assertEqual(tokens.TokenAuthentication().authenticate_credentials(token['key'])[0], self.user)
+        response = self.client.get(reverse('stats'), HTTP_AUTHORIZATION=f"Bearer {token['key']}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_stats('wrong').status_code, 403)
+
+        # The key is not shown again
+        self.client.force_authenticate(self.user)
+        listed = self.client.get(reverse('token-list')).data['results']
+        self.assertEqual([item['name'] for item in listed], ['Script'])
+        self.assertNotIn('key', listed[0])
+
+    def test_revoke(self):
+        token = self.issue()
+        self.assertEqual(self.get_stats(token['key']).status_code, 200)
+        response = self.client.delete(reverse('token-detail', args=[token['id']]),
+                                      HTTP_AUTHORIZATION=f"Token {token['key']}")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_stats(token['key']).status_code, 403)
+
+    def test_rotate(self):
+        token = self.issue()
+        self.assertEqual(self.get_stats(token['key']).status_code, 200)
+        response = self.client.post(reverse('token-rotate', args=[token['id']]),
+                                    HTTP_AUTHORIZATION=f"Token {token['key']}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], token['id'])
+        self.assertNotEqual(response.data['key'], token['key'])
+        self.assertEqual(self.get_stats(token['key']).status_code, 403)
+        self.assertEqual(self.get_stats(response.data['key']).status_code, 200)
+
+    def test_expiry(self):
+        token = self.issue(expires_in=60)
+        self.assertEqual(self.get_stats(token['key']).status_code, 200)
+        AuthToken.objects.filter(pk=token['id']).update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        tokens.cache.clear()
+        response = self.get_stats(token['key'])
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('expired', str(response.data['detail']))
+
+        # Changing the expiry applies at once
+        token = self.issue(expires_in=60)
+        self.assertEqual(self.get_stats(token['key']).status_code, 200)
+        self.client.force_authenticate(self.user)
+        response = self.client.patch(reverse('token-detail', args=[token['id']]), {'expires_in': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        AuthToken.objects.filter(pk=token['id']).update(expires_at=timezone.now())
+        self.client.force_authenticate(None)
+        self.assertEqual(self.get_stats(token['key']).status_code, 403)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('token-list'), {'expires_in': None}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_user_changes_apply(self):
+        token = self.issue()
+        self.assertEqual(self.get_stats(token['key']).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_stats(token['key']).status_code, 403)
+
+
+class AuthCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('editor', password='secret', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        auth_cache.users.clear()
+        auth_cache.sessions.clear()
+        self.client = APIClient()
+        self.client.login(username='editor', password='secret')
+
+    def get_stats(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('stats'))
+        tables = ' '.join(query['sql'] for query in queries.captured_queries)
+        return response, 'django_session' in tables or 'auth_user' in tables
+
+    def create_category(self, name):
+        return self.client.post(reverse('category-list'), {'name': name}, format='json')
+
+    def test_session_and_user_are_cached(self):
+        response, queried = self.get_stats()
+        self.assertEqual(response.status_code, 200)
+        response, queried = self.get_stats()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(queried)
+
+        # Only the shared cache left
+        auth_cache.users.clear()
+        auth_cache.sessions.clear()
+        self.assertFalse(self.get_stats()[1])
+        # Only the in-memory tier left
+        cache.clear()
+        self.assertFalse(self.get_stats()[1])
+
+    @override_settings(AUTH_CACHE={'ENABLED': False})
+    def test_disabled(self):
+        self.get_stats()
+        response, queried = self.get_stats()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(queried)
+
+    def test_logout(self):
+        self.assertEqual(self.get_stats()[0].status_code, 200)
+        session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.client.logout()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        self.assertEqual(self.get_stats()[0].status_code, 403)
+
+    def test_password_change(self):
+        self.assertEqual(self.get_stats()[0].status_code, 200)
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertEqual(self.get_stats()[0].status_code, 403)
+
+    def test_staff_change(self):
+        self.assertEqual(self.create_category('Allowed').status_code, 201)
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.create_category('Refused').status_code, 403)
+        self.assertEqual(self.get_stats()[0].status_code, 200)
+
+
+class UploadTests(TestCase):
+    CHUNK_SIZE = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('uploader')
+        cls.notice = Notice.objects.create(title='Notice', content='...', author=cls.user, category='General')
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(
+            MEDIA_ROOT=os.path.join(directory, 'media'),
+            UPLOAD_SESSION_DIR=os.path.join(directory, 'sessions'),
+            UPLOAD_CHUNK_SIZE=self.CHUNK_SIZE,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start(self, data=b'0123456789', target=None):
+        response = self.client.post(reverse('upload-list'), {
+            'target_type': 'notice',
+            'target_id': target or self.notice.pk,
+            'filename': 'report.txt',
+            'size': len(data),
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def put_chunk(self, session, index, data):
+        url = reverse('upload-chunk', args=[session, index])
+        return self.client.put(url, data, content_type='application/octet-stream')
+
+    def test_chunked_upload_creates_attachment(self):
+        data = b'0123456789'
+        session = self.start(data)
+        for index in range(3):
+            chunk = data[index * self.CHUNK_SIZE:(index + 1) * self.CHUNK_SIZE]
+            self.assertEqual(self.put_chunk(session, index, chunk).status_code, 200)
+
+        response = self.client.post(reverse('upload-complete', args=[session]))
+        self.assertEqual(response.status_code, 201)
+        attachment = NoticeAttachment.objects.get(notice=self.notice)
+        self.assertEqual(attachment.filename, 'report.txt')
+        with attachment.file.open('rb') as stored:
+            self.assertEqual(stored.read(), data)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_resume_from_reported_offset(self):
+        session = self.start()
+        self.put_chunk(session, 0, b'0123')
+        response = self.client.get(reverse('upload-detail', args=[session]))
+        self.assertEqual(response.data['offset'], 4)
+        # A retried chunk is accepted and does not move the offset back
+        self.assertEqual(self.put_chunk(session, 0, b'0123').data['offset'], 4)
+
+    def test_chunks_must_arrive_in_order(self):
+        session = self.start()
+        self.assertEqual(self.put_chunk(session, 1, b'4567').status_code, 409)
+        self.assertEqual(self.put_chunk(session, 0, b'012').status_code, 400)
+
+    def test_incomplete_upload_cannot_finish(self):
+        session = self.start()
+        self.put_chunk(session, 0, b'0123')
+        response = self.client.post(reverse('upload-complete', args=[session]))
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(NoticeAttachment.objects.exists())
+
+    def test_only_the_author_can_upload(self):
+        other = User.objects.create_user('other')
+        notice = Notice.objects.create(title='Theirs', content='...', author=other, category='General')
+        response = self.client.post(reverse('upload-list'), {
+            'target_type': 'notice', 'target_id': notice.pk, 'filename': 'x.txt', 'size': 1,
+        })
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(UPLOAD_SESSION_MAX_AGE=3600)
+    def test_cleanup_keeps_sessions_receiving_chunks(self):
+        active, abandoned = self.start(), self.start()
+        UploadSession.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=2))
+        self.put_chunk(active, 0, b'0123')
+        call_command('cleanup_upload_sessions', stdout=StringIO())
+        self.assertEqual([str(pk) for pk in UploadSession.objects.values_list('pk', flat=True)], [active])
+        self.assertEqual(self.put_chunk(active, 1, b'4567').status_code, 200)
+
+    def test_sessions_are_private(self):
+        session = self.start()
+        self.client.force_authenticate(User.objects.create_user('other'))
+        self.assertEqual(self.client.get(reverse('upload-detail', args=[session])).status_code, 404)
+
+
+class BlobStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('blobs')
+        cls.notices = [
+            Notice.objects.create(title=f'Notice {i}', content='...', author=cls.user, category='General')
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(MEDIA_ROOT=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.storage = attachment_storage()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def attach(self, notice, data=b'%PDF policy'):
+        upload = SimpleUploadedFile('policy.pdf', data, content_type='application/pdf')
+        response = self.client.post(
+            reverse('notice-add-attachment', args=[notice.pk]), {'file': upload}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 200)
+        return NoticeAttachment.objects.filter(notice=notice).latest('pk')
+
+    def remove(self, attachment):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                reverse('notice-remove-attachment', args=[attachment.notice_id]),
+                {'attachment_id': attachment.pk}, format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_identical_files_are_stored_once(self):
+        first = self.attach(self.notices[0])
+        second = self.attach(self.notices[1])
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith('blobs/'))
+        self.assertTrue(first.file.name.endswith('.pdf'))
+        self.assertEqual(Blob.objects.get().references, 2)
+        other = self.attach(self.notices[1], b'%PDF other')
+        self.assertNotEqual(other.file.name, first.file.name)
+
+    def test_blob_is_deleted_with_its_last_attachment(self):
+        first = self.attach(self.notices[0])
+        second = self.attach(self.notices[1])
+        name = first.file.name
+
+        self.remove(first)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(Blob.objects.get().references, 1)
+
+        self.remove(second)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_blob_deleted_after_the_save_is_written_again(self):
+        first = self.attach(self.notices[0])
+        name = first.file.name
+        save = ContentAddressedStorage._save
+
+        def save_then_lose_last_reference(storage, *args):
+            # The existing blob is skipped, then its last attachment goes
+            target = save(storage, *args)
+            if first.pk is not None:
+                with self.captureOnCommitCallbacks(execute=True):
+                    first.delete()
+                self.assertFalse(self.storage.exists(target))
+            return target
+
+        with mock.patch.object(ContentAddressedStorage, '_save', save_then_lose_last_reference):
+            second = self.attach(self.notices[1])
+        self.assertEqual(second.file.name, name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(Blob.objects.get().references, 1)
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'%PDF policy')
+
+    def test_blob_acquired_before_its_deletion_is_kept(self):
+        first = self.attach(self.notices[0])
+        name = first.file.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            first.delete()
+        self.assertEqual(Blob.objects.get().references, 0)
+        second = self.attach(self.notices[1])
+        for callback in callbacks:
+            callback()
+        self.assertTrue(self.storage.exists(second.file.name))
+        self.assertEqual(Blob.objects.get(name=name).references, 1)
+
+    def test_dedupe_command_migrates_existing_files(self):
+        for notice in self.notices:
+            # Files stored the old way, one copy per attachment
+            name = f'notice_attachments/policy-{notice.pk}.pdf'
+            path = self.storage.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b'x' * 1000)
+            NoticeAttachment.objects.create(notice=notice, file=name, filename='policy.pdf')
+        archived = ArchivedNotice.objects.create(
+            id=10 ** 6, title='Old', content='...', author=self.user, category='General',
+            created_at=timezone.now(), updated_at=timezone.now(), archived_at=timezone.now(),
+        )
+        with open(self.storage.path('notice_attachments/old.pdf'), 'wb') as f:
+            f.write(b'x' * 1000)
+        ArchivedNoticeAttachment.objects.create(
+            id=10 ** 6, notice=archived, file='notice_attachments/old.pdf', filename='old.pdf',
+            upload_date=timezone.now(),
+        )
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('dedupe_attachments', stdout=out)
+        self.assertIn('Migrated 3 attachments', out.getvalue())
+        self.assertIn('saved 2.0', out.getvalue())
+
+        names = set(NoticeAttachment.objects.values_list('file', flat=True))
+        names |= set(ArchivedNoticeAttachment.objects.values_list('file', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(Blob.objects.get().references, 3)
+        self.assertFalse(self.storage.exists(f'notice_attachments/policy-{self.notices[0].pk}.pdf'))
+
+
+class DownloadTests(TestCase):
+    DATA = bytes(range(256)) * 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader')
+        cls.notice = Notice.objects.create(title='Notice', content='...', author=cls.user, category='General')
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(MEDIA_ROOT=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.attachment = NoticeAttachment.objects.create(
+            notice=self.notice, file=SimpleUploadedFile('a.pdf', self.DATA), filename='Policy 2024.pdf'
+        )
+        self.url = reverse('notice-download-attachment', args=[self.notice.pk, self.attachment.pk])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, **headers):
+        response = self.client.get(self.url, **headers)
+        self.addCleanup(response.close)
+        return response
+
+    def test_full_download(self):
+        response = self.get(HTTP_ACCEPT='application/pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.DATA)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('Policy 2024.pdf', response['Content-Disposition'])
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_range_requests(self):
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.DATA)}')
+        self.assertEqual(b''.join(response.streaming_content), self.DATA[10:20])
+
+        response = self.get(HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.DATA[-5:])
+
+        self.assertEqual(self.get(HTTP_RANGE=f'bytes={len(self.DATA)}-').status_code, 416)
+
+    def test_stale_if_range_gets_whole_file(self):
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_revalidation(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    @override_settings(ATTACHMENT_SEND_MODE='x-accel-redirect')
+    def test_accel_redirect(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.attachment.file.name)
+
+    def test_attachment_must_belong_to_notice(self):
+        other = Notice.objects.create(title='Other', content='...', author=self.user, category='General')
+        url = reverse('notice-download-attachment', args=[other.pk, self.attachment.pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get(self.url).status_code, (401, 403))
+
+
+class LiveFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('live')
+
+    def test_resume_from_buffer(self):
+        broker = LocalBroker(buffer_size=3)
+        events = [broker.publish('created', {category}, {'n': i}) for i, category in enumerate('ABAB')]
+        # The first event has left the buffer
+        self.assertIsNone(broker.since(f'{broker.epoch}-0'))
+        self.assertEqual([e.data['n'] for e in broker.since(events[1].id)], [2, 3])
+        self.assertEqual([e.data['n'] for e in broker.since(events[1].id, {'B'})], [3])
+        self.assertIsNone(broker.since('0-1'))
+
+    def test_notice_changes_are_published(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notice = Notice.objects.create(title='New', content='...', author=self.user, category='HR')
+        notice = Notice.objects.get(pk=notice.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            notice.pinned = True
+            notice.save()
+            notice.category = 'General'
+            notice.save()
+            notice.delete()
+
+        events = list(get_broker().buffer)[-4:]
+        self.assertEqual([e.type for e in events], ['created', 'pinned', 'updated', 'deleted'])
+        self.assertEqual(events[2].categories, {'HR', 'General'})
+        self.assertEqual(events[0].data['title'], 'New')
+
+    async def read(self, events, count):
+        return [await anext(events) for _ in range(count)]
+
+    async def test_stream_replays_then_pushes(self):
+        broker = LocalBroker()
+        start = broker.last_id()
+        broker.publish('created', {'HR'}, {'id': 1})
+        broker.publish('created', {'General'}, {'id': 2})
+
+        events = stream(broker, {'General'}, start, heartbeat=0.01)
+        retry, replayed = await self.read(events, 2)
+        self.assertTrue(retry.startswith(b'retry:'))
+        self.assertIn(b'"id": 2', replayed)
+
+        broker.publish('pinned', {'General'}, {'id': 3})
+        pushed, = await self.read(events, 1)
+        self.assertIn(b'event: pinned', pushed)
+        self.assertEqual(await anext(events), b': keep-alive\n\n')
+        await events.aclose()
+        self.assertEqual(broker.subscriptions, {})
+
+    async def test_slow_reader_catches_up(self):
+        broker = LocalBroker(queue_size=2)
+        events = stream(broker, heartbeat=1)
+        await anext(events)
+        # Subscribed; now fill the queue past its size before reading
+        reading = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0)
+        for i in range(5):
+            broker.publish('created', {'HR'}, {'id': i})
+        await asyncio.sleep(0)
+        received = [await reading] + await self.read(events, 4)
+        self.assertEqual([int(e.split(b'"id": ')[1][0:1]) for e in received], [0, 1, 2, 3, 4])
+        await events.aclose()
+
+    async def test_unknown_last_event_id_resets(self):
+        broker = LocalBroker()
+        events = stream(broker, last_id='1-1')
+        _, reset = await self.read(events, 2)
+        self.assertIn(b'event: reset', reset)
+        await events.aclose()
+
+    async def test_endpoint(self):
+        client = AsyncClient()
+        response = await client.get(reverse('notice-events'))
+        self.assertEqual(response.status_code, 403)
+
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('notice-events'), {'category': 'HR,General'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        self.assertTrue((await anext(content)).startswith(b'retry:'))
+        await content.aclose()
+
+
+class BulkTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('bulk')
+        cls.other = User.objects.create_user('other')
+        cls.category = Category.objects.create(name='Guides')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('notice-bulk')
+
+    def notice_data(self, i, **extra):
+        return {'title': f'Notice {i}', 'content': '...', 'category': 'HR', 'author_id': self.user.pk, **extra}
+
+    def test_create(self):
+        items = [self.notice_data(i) for i in range(20)]
+        response = self.assertMaxQueries(12, self.client.post, self.url, items, format="json")
+        self.assertEqual(response.status_code, 201)
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], [201] * 20)
+        self.assertEqual(
+            list(Notice.objects.filter(pk__in=[r['id'] for r in results]).order_by('pk').values_list('title', flat=True)),
+            [f'Notice {i}' for i in range(20)],
+        )
+        self.assertEqual(StatCounter.objects.get(name='total_notices').value, 20)
+        hits = self.client.get(reverse('search'), {'q': 'Notice', 'type': 'notice', 'limit': 50}).data
+        self.assertEqual(len(hits['results']), 20)
+
+    def test_invalid_batch_writes_nothing(self):
+        items = [self.notice_data(0), {'title': 'No content'}, self.notice_data(2, author_id=999999)]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.data['results']], [424, 400, 400])
+        self.assertIn('author_id', response.data['results'][2]['errors'])
+        self.assertFalse(Notice.objects.exists())
+
+    def test_update(self):
+        notices = [Notice.objects.create(**self.notice_data(i)) for i in range(3)]
+        before = notices[0].updated_at
+        items = [{'id': notice.pk, 'pinned': True} for notice in notices]
+        response = self.assertMaxQueries(7, self.client.patch, self.url, items, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Notice.objects.filter(pinned=True).count(), 3)
+        self.assertGreater(Notice.objects.get(pk=notices[0].pk).updated_at, before)
+
+    def test_update_checks_each_item(self):
+        mine = Notice.objects.create(**self.notice_data(0))
+        theirs = Notice.objects.create(**self.notice_data(1, author_id=self.other.pk))
+        items = [{'id': mine.pk, 'title': 'Changed'}, {'id': theirs.pk, 'title': 'Changed'}, {'id': 999999}]
+        response = self.client.patch(self.url, items, format='json')
+        self.assertEqual([r['status'] for r in response.data['results']], [424, 403, 404])
+        self.assertFalse(Notice.objects.filter(title='Changed').exists())
+
+    def test_invalid_ids_are_not_found(self):
+        notice = Notice.objects.create(**self.notice_data(0))
+        items = [{'id': 'abc', 'title': 'z'}, {'id': [notice.pk], 'title': 'z'}, {'id': {'x': 1}}, {'id': True}]
+        response = self.client.patch(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.data['results']], [404] * 4)
+        response = self.client.delete(self.url, {'ids': ['abc', [notice.pk], True]}, format='json')
+        self.assertEqual([r['status'] for r in response.data['results']], [404] * 3)
+        self.assertTrue(Notice.objects.filter(pk=notice.pk, title='Notice 0').exists())
+
+    def test_delete(self):
+        notices = [Notice.objects.create(**self.notice_data(i)) for i in range(3)]
+        response = self.client.delete(self.url, {'ids': [n.pk for n in notices]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Notice.objects.exists())
+        self.assertEqual(StatCounter.objects.get(name='total_notices').value, 0)
+
+    @override_settings(BULK_MAX_BATCH_SIZE=2)
+    def test_batch_size_limit(self):
+        response = self.client.post(self.url, [self.notice_data(i) for i in range(3)], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Notice.objects.exists())
+
+    def test_articles(self):
+        items = [
+            {'title': f'Article {i}', 'content': '...', 'author_id': self.user.pk, 'category_id': self.category.pk}
+            for i in range(3)
+        ]
+        response = self.client.post(reverse('article-bulk'), items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Article.objects.filter(category=self.category).count(), 3)
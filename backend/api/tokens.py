@@ -0,0 +1,177 @@
+"""
+Token authentication for scripts and integrations.
+
+Clients send `Authorization: Token <key>`. Keys are random, so they are
+stored as a SHA-256 digest rather than with the slow password hashers,
+and the key itself is only shown when the token is issued or rotated.
+
+Verified tokens are kept in a bounded cache in each process, so a request
+with a known token costs a digest and a dictionary lookup instead of a
+password hash and queries. Revoking or rotating a token, and saving or
+deleting its user, evict it from the cache of the process making the
+change (see api.signals); other processes drop their entries after
+TOKEN_AUTH['CACHE_TIMEOUT'] seconds.
+"""
+import collections
+import copy
+import datetime
+import hashlib
+import secrets
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import authentication, exceptions
+from .models import AuthToken
+
+DEFAULTS = {
+    'LIFETIME': 30 * 86400,
+    'MAX_LIFETIME': 365 * 86400,
+    'CACHE_SIZE': 10000,
+    'CACHE_TIMEOUT': 60,
+}
+
+KEYWORDS = ('Token', 'Bearer')
+# Shown with the token to tell tokens apart, not enough to guess the key
+PREFIX_LENGTH = 8
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH', {})}
+
+
+def digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def default_expiry():
+    lifetime = get_config()['LIFETIME']
+    return timezone.now() + datetime.timedelta(seconds=lifetime) if lifetime else None
+
+
+def issue(user, name='', expires_at=None):
+    """
+    Create a token for `user`. Returns it with its key in `token.key`, which
+    is not stored.
+    """
+    key = secrets.token_urlsafe(32)
+    token = AuthToken.objects.create(
+        user=user, name=name, key_prefix=key[:PREFIX_LENGTH], key_digest=digest(key), expires_at=expires_at,
+    )
+    token.key = key
+    return token
+
+
+def rotate(token, expires_at=None):
+    """
+    Give `token` a new key, invalidating the old one. Returns the token with
+    the new key in `token.key`.
+    """
+    old_digest = token.key_digest
+    key = secrets.token_urlsafe(32)
+    token.key_prefix = key[:PREFIX_LENGTH]
+    token.key_digest = digest(key)
+    token.created_at = timezone.now()
+    token.expires_at = expires_at
+    token.save(update_fields=['key_prefix', 'key_digest', 'created_at', 'expires_at'])
+    evict(old_digest)
+    token.key = key
+    return token
+
+
+class TokenCache:
+    """
+    Verified tokens by key digest: (user, token id, expiry, time cached).
+    Least recently used entries are dropped first.
+    """
+
+    def __init__(self):
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key_digest):
+        with self._lock:
+            entry = self._entries.get(key_digest)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[3] > get_config()['CACHE_TIMEOUT']:
+                del self._entries[key_digest]
+                return None
+            self._entries.move_to_end(key_digest)
+            return entry
+
+    def set(self, key_digest, user, token_id, expires_at):
+        size = get_config()['CACHE_SIZE']
+        with self._lock:
+            self._entries[key_digest] = (user, token_id, expires_at, time.monotonic())
+            self._entries.move_to_end(key_digest)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key_digest):
+        with self._lock:
+            self._entries.pop(key_digest, None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for key_digest in [key for key, entry in self._entries.items() if entry[0].pk == user_id]:
+                del self._entries[key_digest]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = TokenCache()
+
+
+def evict(key_digest):
+    # Again on commit, in case a request cached the token in between
+    cache.discard(key_digest)
+    transaction.on_commit(lambda: cache.discard(key_digest))
+
+
+def evict_user(user_id):
+    cache.discard_user(user_id)
+    transaction.on_commit(lambda: cache.discard_user(user_id))
+
+
+class TokenAuthentication(authentication.BaseAuthentication):
+    """
+    `Authorization: Token <key>` (or `Bearer <key>`) authentication against
+    AuthToken, through the token cache.
+    """
+
+    def authenticate(self, request):
+        parts = authentication.get_authorization_header(request).split()
+        if not parts or parts[0].decode('latin-1') not in KEYWORDS:
+            return None
+        if len(parts) != 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+        try:
+            key = parts[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return self.authenticate_credentials(key)
+
+    def authenticate_credentials(self, key):
+        key_digest = digest(key)
+        entry = cache.get(key_digest)
+        if entry is None:
+            token = AuthToken.objects.select_related('user').filter(key_digest=key_digest).first()
+            if token is None:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            entry = (token.user, token.pk, token.expires_at)
+            cache.set(key_digest, *entry)
+        user, token_id, expires_at = entry[:3]
+        if expires_at is not None and expires_at <= timezone.now():
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        # A copy, as views may change the user they are given
+        return copy.copy(user), token_id
+
+    def authenticate_header(self, request):
+        return KEYWORDS[0]
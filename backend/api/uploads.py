@@ -0,0 +1,110 @@
+"""
+Chunked, resumable attachment uploads.
+
+    POST   /api/uploads/                      start a session (target, filename, size)
+    GET    /api/uploads/<id>/                 offset received so far, to resume
+    PUT    /api/uploads/<id>/chunks/<index>/  raw bytes of one chunk
+    POST   /api/uploads/<id>/complete/        create the attachment
+    DELETE /api/uploads/<id>/                 abort
+
+Chunks are UPLOAD_CHUNK_SIZE bytes (the last one may be shorter) and are
+accepted in order. Each one is streamed from the request body to the
+session's temporary file, so no file is ever held in memory, and on
+completion the file is moved into storage rather than copied.
+"""
+import os
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from knowledge.models import Article, ArticleAttachment
+from notices.models import Notice, NoticeAttachment
+
+# Target type -> (model, attachment model, attachment's foreign key)
+TARGETS = {
+    'notice': (Notice, NoticeAttachment, 'notice'),
+    'article': (Article, ArticleAttachment, 'article'),
+}
+
+# Bytes read from the request body per read
+READ_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class SessionFile(File):
+    """
+    The assembled upload. Exposing its path lets the storage backend move
+    it into place instead of copying it.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def get_target(target_type, target_id):
+    model = TARGETS[target_type][0]
+    return model.objects.filter(pk=target_id).first()
+
+
+def write_chunk(session, index, stream, length):
+    """
+    Write chunk `index` of `session` from `stream`, which must hold exactly
+    `length` bytes. Chunks before the current offset are accepted again (a
+    retried request), chunks after it are rejected.
+    """
+    if index >= session.chunk_count:
+        raise ChunkError('Chunk index out of range')
+    start, end = session.chunk_range(index)
+    if start > session.offset:
+        raise ChunkError(f'Expected chunk {session.offset // session.chunk_size} first', status=409)
+    if length != end - start:
+        raise ChunkError(f'Chunk {index} must be {end - start} bytes')
+
+    os.makedirs(settings.UPLOAD_SESSION_DIR, exist_ok=True)
+    mode = 'r+b' if os.path.exists(session.temp_path) else 'wb'
+    with open(session.temp_path, mode) as destination:
+        destination.seek(start)
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                raise ChunkError('Request body ended before the chunk did')
+            destination.write(data)
+            remaining -= len(data)
+
+    if end > session.offset:
+        # Only one of two racing requests for the same chunk moves the offset.
+        # update() skips auto_now: set updated_at, or cleanup_upload_sessions
+        # takes the session for abandoned
+        now = timezone.now()
+        type(session).objects.filter(pk=session.pk, offset=session.offset).update(offset=end, updated_at=now)
+        session.offset, session.updated_at = end, now
+
+
+def complete(session):
+    """
+    Move the assembled file into storage and create the attachment.
+    """
+    if not session.is_complete or not os.path.exists(session.temp_path):
+        raise ChunkError('Upload is not complete', status=409)
+    if os.path.getsize(session.temp_path) != session.size:
+        raise ChunkError('Uploaded size does not match the declared size', status=409)
+
+    model, attachment_model, field = TARGETS[session.target_type]
+    target = get_target(session.target_type, session.target_id)
+    if target is None:
+        raise ChunkError(f'{model.__name__} no longer exists', status=404)
+
+    with transaction.atomic():
+        attachment = attachment_model(**{field: target}, filename=session.filename)
+        with open(session.temp_path, 'rb') as assembled:
+            attachment.file.save(session.filename, SessionFile(assembled, name=session.filename), save=False)
+        attachment.save()
+        session.delete()
+    session.discard_file()
+    return attachment
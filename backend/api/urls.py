@@ -1,18 +1,29 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
-from notices.views import NoticeViewSet
-from knowledge.views import CategoryViewSet, ArticleViewSet, CommentViewSet
+from notices.views import NoticeViewSet, ArchivedNoticeViewSet, notice_events
+from knowledge.views import CategoryViewSet, ArticleViewSet, CommentViewSet, tag_cloud
+from search.views import search
 
 router = DefaultRouter()
 router.register(r'users', views.UserViewSet)
 router.register(r'notices', NoticeViewSet)
+router.register(r'archived-notices', ArchivedNoticeViewSet, basename='archived-notice')
 router.register(r'categories', CategoryViewSet)
 router.register(r'articles', ArticleViewSet)
 router.register(r'comments', CommentViewSet)
+router.register(r'uploads', views.UploadSessionViewSet, basename='upload')
+router.register(r'tokens', views.AuthTokenViewSet, basename='token')
 
 urlpatterns = [
+    # Before the router, whose notice-detail route would match 'events'
+    path('notices/events/', notice_events, name='notice-events'),
     path('', include(router.urls)),
     path('stats/', views.get_stats, name='stats'),
+    path('facets/', views.get_facets, name='facets'),
+    path('response-cache/', views.get_response_cache_metrics, name='response-cache'),
+    path('metrics/', views.get_metrics, name='metrics'),
+    path('search/', search, name='search'),
+    path('tags/', tag_cloud, name='tag-cloud'),
     path('auth/', include('rest_framework.urls', namespace='rest_framework')),
 ]
\ No newline at end of file
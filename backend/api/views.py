@@ -1,10 +1,18 @@
-from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework import viewsets, mixins, permissions, status
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, action
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound, PermissionDenied
+from django.conf import settings
+from django.http import HttpResponse
 from django.contrib.auth.models import User
-from notices.models import Notice
-from knowledge.models import Article, Category, Comment
-from notices.serializers import UserSerializer
+from notices.serializers import UserSerializer, NoticeAttachmentSerializer
+from knowledge.serializers import ArticleAttachmentSerializer
+from . import facets, instrumentation, response_cache, stats, tokens, uploads
+from .conditional import ConditionalGetMixin
+from .downloads import PassthroughRenderer
+from .fieldsets import SparseQuerysetMixin
+from .models import AuthToken, UploadSession
+from .serializers import AuthTokenSerializer, UploadSessionSerializer
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -12,49 +20,136 @@ def get_stats(request):
     """
     Get statistics for the dashboard.
     """
-    total_notices = Notice.objects.count()
-    total_articles = Article.objects.count()
-    total_categories = Category.objects.count()
-    total_comments = Comment.objects.count()
-    
-    # Get 5 most viewed articles
-    top_articles = Article.objects.order_by('-view_count')[:5]
-    top_articles_data = [
-        {
-            'id': article.id,
-            'title': article.title,
-            'view_count': article.view_count,
-            'category': article.category.name
-        }
-        for article in top_articles
-    ]
-    
-    # Get latest notices
-    latest_notices = Notice.objects.order_by('-created_at')[:5]
-    latest_notices_data = [
-        {
-            'id': notice.id,
-            'title': notice.title,
-            'priority': notice.priority,
-            'created_at': notice.created_at
-        }
-        for notice in latest_notices
-    ]
-    
-    return Response({
-        'total_notices': total_notices,
-        'total_articles': total_articles,
-        'total_categories': total_categories,
-        'total_comments': total_comments,
-        'top_articles': top_articles_data,
-        'latest_notices': latest_notices_data
-    })
-
-
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+    return Response(stats.get_stats())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_facets(request):
+    """
+    Counts per notice category and priority, and per article category and
+    published state, for the search and filters of the request (the query
+    parameters of /api/notices/ and /api/articles/). `type` (repeatable)
+    restricts them to `notice` or `article`.
+    """
+    return Response(facets.get_facets(request.query_params, request.query_params.getlist('type')))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def get_response_cache_metrics(request):
+    """
+    Response cache hits and misses of this process, in total and per view.
+    """
+    return Response(response_cache.metrics.snapshot())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+@renderer_classes([PassthroughRenderer])
+def get_metrics(request):
+    """
+    Request latency, SQL and response size histograms of this process per
+    route, in the Prometheus text format.
+    """
+    return HttpResponse(instrumentation.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class UserViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint that allows users to be viewed.
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    permission_classes = [permissions.IsAuthenticated]
\ No newline at end of file
+    permission_classes = [permissions.IsAuthenticated]
+    conditional_models = ['auth.User']
+
+    def get_queryset(self):
+        return self.only_requested(User.objects.all())
+
+
+class UploadSessionViewSet(mixins.CreateModelMixin,
+                           mixins.RetrieveModelMixin,
+                           mixins.ListModelMixin,
+                           mixins.DestroyModelMixin,
+                           SparseQuerysetMixin,
+                           viewsets.GenericViewSet):
+    """
+    API endpoint for chunked, resumable attachment uploads. See api.uploads.
+    """
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return self.only_requested(UploadSession.objects.filter(owner=self.request.user))
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        target = uploads.get_target(data['target_type'], data['target_id'])
+        if target is None:
+            raise NotFound(f"{data['target_type'].capitalize()} not found")
+        # Same rule as add_attachment: only the author may attach files
+        if target.author_id != self.request.user.pk:
+            raise PermissionDenied('Only the author can add attachments')
+        serializer.save(owner=self.request.user, chunk_size=settings.UPLOAD_CHUNK_SIZE)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        instance.discard_file()
+
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<index>\d+)')
+    def chunk(self, request, pk=None, index=None):
+        session = self.get_object()
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            uploads.write_chunk(session, int(index), request.stream, length)
+        except uploads.ChunkError as error:
+            return Response({'error': str(error), 'offset': session.offset}, status=error.status)
+        return Response({'offset': session.offset, 'size': session.size})
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        session = self.get_object()
+        try:
+            attachment = uploads.complete(session)
+        except uploads.ChunkError as error:
+            return Response({'error': str(error), 'offset': session.offset}, status=error.status)
+
+        if session.target_type == 'notice':
+            serializer = NoticeAttachmentSerializer(attachment, context=self.get_serializer_context())
+        else:
+            serializer = ArticleAttachmentSerializer(attachment, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AuthTokenViewSet(mixins.CreateModelMixin,
+                       mixins.RetrieveModelMixin,
+                       mixins.UpdateModelMixin,
+                       mixins.ListModelMixin,
+                       mixins.DestroyModelMixin,
+                       SparseQuerysetMixin,
+                       viewsets.GenericViewSet):
+    """
+    API endpoint for the current user's API tokens: POST issues one
+    (returning its key once), PATCH changes its name or expiry, DELETE
+    revokes it and POST .../rotate/ replaces its key. See api.tokens.
+    """
+    queryset = AuthToken.objects.all()
+    serializer_class = AuthTokenSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return self.only_requested(AuthToken.objects.filter(user=self.request.user))
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @action(detail=True, methods=['post'])
+    def rotate(self, request, pk=None):
+        token = self.get_object()
+        serializer = self.get_serializer(token, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        expires_at = serializer.validated_data.get('expires_at', tokens.default_expiry())
+        tokens.rotate(token, expires_at)
+        return Response(self.get_serializer(token).data)
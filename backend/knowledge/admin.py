@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Article, ArticleAttachment, Comment
+from .models import Category, Tag, Article, ArticleAttachment, Comment
 
 class ArticleAttachmentInline(admin.TabularInline):
     model = ArticleAttachment
@@ -15,6 +15,11 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'description', 'created_at')
     search_fields = ('name', 'description')
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
+
 @admin.register(Article)
 class ArticleAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'category', 'created_at', 'updated_at', 'is_published', 'view_count')
@@ -23,6 +28,7 @@ class ArticleAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
     inlines = [ArticleAttachmentInline, CommentInline]
     readonly_fields = ('view_count',)
+    exclude = ('tag_set',)
 
 @admin.register(ArticleAttachment)
 class ArticleAttachmentAdmin(admin.ModelAdmin):
@@ -0,0 +1,34 @@
+from search.filters import match_queryset, search_queryset
+from .tags import filter_by_tags
+
+
+def filter_articles(queryset, params, ranked=True):
+    """
+    Apply the article list filters in `params` (a QueryDict): category_id,
+    search, tag (with tag_match) and published. With `ranked=False` a
+    search only filters, without ordering by relevance, e.g. to count the
+    matches.
+    """
+    # Filter by category
+    category_id = params.get('category_id')
+    if category_id:
+        queryset = queryset.filter(category_id=category_id)
+
+    # Filter by search term
+    search = params.get('search')
+    if search:
+        queryset = search_queryset(queryset, search) if ranked else match_queryset(queryset, search)
+
+    # Filter by exact tags: ?tag=a&tag=b or ?tag=a,b; all of them, or
+    # any of them with tag_match=any
+    tags = [tag for value in params.getlist('tag') for tag in value.split(',')]
+    if tags:
+        queryset = filter_by_tags(queryset, tags, params.get('tag_match', 'all'))
+
+    # Filter by published status
+    published = params.get('published')
+    if published is not None:
+        is_published = published.lower() == 'true'
+        queryset = queryset.filter(is_published=is_published)
+
+    return queryset
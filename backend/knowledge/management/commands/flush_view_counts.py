@@ -0,0 +1,50 @@
+import signal
+import time
+from django.core.management.base import BaseCommand
+from knowledge.view_counts import buffer, drain_shared, get_config
+
+
+class Command(BaseCommand):
+    help = (
+        'Write buffered article views to the database. Drains the shared view '
+        'log used in VIEW_COUNT_BUFFER "shared" mode; with --loop keeps doing so '
+        'until interrupted, draining once more before exiting.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep draining until stopped')
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Seconds between drains with --loop (default: FLUSH_INTERVAL)',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or get_config()['FLUSH_INTERVAL']
+        self.stopping = False
+
+        if options['loop']:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+            self.stdout.write(f'Draining view counts every {interval}s...')
+            while not self.stopping:
+                self.drain()
+                deadline = time.monotonic() + interval
+                while not self.stopping and time.monotonic() < deadline:
+                    time.sleep(min(0.5, interval))
+
+        # Final drain, also on shutdown of the loop
+        self.drain()
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def drain(self):
+        written = buffer.flush()
+        if get_config()['MODE'] == 'shared':
+            drained = drain_shared()
+            if drained is None:
+                self.stdout.write(self.style.WARNING('Another drain is running, skipped'))
+                return
+            written += drained
+        if written:
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} article views'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-18 13:14
+
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0002_api_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='articleattachment',
+            name='file',
+            field=models.FileField(storage=api.storage.attachment_storage, upload_to='article_attachments/'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.0.14 on 2026-10-18 13:37
+
+import django.db.models.deletion
+import re
+from django.db import migrations, models
+
+
+def split_tags(apps, schema_editor):
+    """
+    Link every article to the tags of its comma-separated `tags` string,
+    normalized as by knowledge.tags.normalize_tag.
+    """
+    Article = apps.get_model('knowledge', 'Article')
+    Tag = apps.get_model('knowledge', 'Tag')
+    ArticleTag = apps.get_model('knowledge', 'ArticleTag')
+
+    ids = {}
+    links = []
+    articles = Article.objects.exclude(tags__isnull=True).exclude(tags='').values_list('id', 'tags')
+    for article_id, value in articles.iterator():
+        names = dict.fromkeys(
+            name for name in (re.sub(r'\s+', ' ', tag).strip().lower()[:100] for tag in value.split(',')) if name
+        )
+        for name in names:
+            if name not in ids:
+                ids[name] = Tag.objects.create(name=name).id
+            links.append(ArticleTag(article_id=article_id, tag_id=ids[name]))
+        if len(links) >= 1000:
+            ArticleTag.objects.bulk_create(links)
+            links = []
+    ArticleTag.objects.bulk_create(links)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0003_attachment_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArticleTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('article', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='knowledge.article')),
+                ('tag', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='knowledge.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='articles', through='knowledge.ArticleTag', to='knowledge.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='articletag',
+            index=models.Index(fields=['tag', 'article'], name='article_tag_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='articletag',
+            constraint=models.UniqueConstraint(fields=('article', 'tag'), name='article_tag_unique'),
+        ),
+        migrations.RunPython(split_tags, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from api.storage import attachment_storage
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
@@ -13,27 +14,73 @@ class Category(models.Model):
         verbose_name_plural = "Categories"
 
 
+class Tag(models.Model):
+    """
+    A normalized article tag (see knowledge.tags.normalize_tag), kept in
+    step with Article.tags.
+    """
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+
+
 class Article(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='articles')
-    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='articles')
+    # Indexed through article_category_idx, which starts with the category
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='articles', db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True)
     view_count = models.IntegerField(default=0)
     tags = models.CharField(max_length=500, blank=True, null=True, help_text="Comma-separated tags")
+    # Derived from `tags` on save; used for exact tag filters and counts
+    tag_set = models.ManyToManyField(Tag, through='ArticleTag', related_name='articles', blank=True)
     
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Tags as loaded, so saves that don't change them skip the sync
+        instance._loaded_tags = instance.__dict__.get('tags')
+        return instance
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='article_list_idx'),
+            models.Index(fields=['is_published', '-created_at', '-id'], name='article_published_idx'),
+            models.Index(
+                fields=['category', 'is_published', '-created_at', '-id'], name='article_category_idx'
+            ),
+        ]
+
+
+class ArticleTag(models.Model):
+    # Indexed through the unique constraint and article_tag_idx
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, db_index=False)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'tag'], name='article_tag_unique'),
+        ]
+        indexes = [
+            # Tag filters go from tags to articles
+            models.Index(fields=['tag', 'article'], name='article_tag_idx'),
+        ]
 
 
 class ArticleAttachment(models.Model):
     article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='attachments')
-    file = models.FileField(upload_to='article_attachments/')
+    file = models.FileField(upload_to='article_attachments/', storage=attachment_storage)
     filename = models.CharField(max_length=255)
     upload_date = models.DateTimeField(auto_now_add=True)
     
@@ -51,4 +98,8 @@ class Comment(models.Model):
         return f"Comment by {self.author.username} on {self.article.title}"
     
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='comment_list_idx'),
+            models.Index(fields=['article', '-created_at', '-id'], name='comment_article_idx'),
+        ]
\ No newline at end of file
@@ -1,26 +1,28 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from api.fieldsets import SparseFieldsMixin
+from api.instrumentation import TimedSerializerMixin
 from .models import Category, Article, ArticleAttachment, Comment
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'email']
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
 
-class ArticleAttachmentSerializer(serializers.ModelSerializer):
+class ArticleAttachmentSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ArticleAttachment
         fields = ['id', 'file', 'filename', 'upload_date']
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     author_id = serializers.IntegerField(write_only=True)
     
@@ -29,7 +31,27 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleListSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Lightweight article representation used by list responses. Carries a
+    content excerpt and related-object counts instead of the full content,
+    attachments and comments.
+    """
+    author = UserSerializer(read_only=True)
+    category = CategorySerializer(read_only=True)
+    excerpt = serializers.CharField(read_only=True)
+    comment_count = serializers.IntegerField(read_only=True)
+    attachment_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Article
+        fields = [
+            'id', 'title', 'excerpt', 'author', 'category', 'created_at', 'updated_at',
+            'is_published', 'view_count', 'tags', 'comment_count', 'attachment_count',
+        ]
+
+
+class ArticleSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     attachments = ArticleAttachmentSerializer(many=True, read_only=True)
@@ -39,7 +61,8 @@ class ArticleSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Article
-        fields = '__all__'
+        # Tags are read and written through the `tags` string
+        exclude = ['tag_set']
         
     def create(self, validated_data):
         attachments_data = self.context.get('request').FILES
@@ -0,0 +1,110 @@
+"""
+Normalized article tags.
+
+Article.tags stays the comma-separated string clients read and write. On
+save it is parsed into Tag rows linked through ArticleTag, which back the
+exact `?tag=` filter and the tag cloud.
+"""
+import re
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+from api import batching, stats
+from .models import Article, ArticleTag, Tag
+
+TAG_CLOUD_KEY = 'tags:cloud'
+
+MAX_TAG_LENGTH = 100
+
+
+def normalize_tag(tag):
+    return re.sub(r'\s+', ' ', tag).strip().lower()[:MAX_TAG_LENGTH]
+
+
+def parse_tags(value):
+    """
+    Normalized, de-duplicated tags of a comma-separated string, in order.
+    """
+    return list(dict.fromkeys(tag for tag in map(normalize_tag, (value or '').split(',')) if tag))
+
+
+def sync_tags(article):
+    """
+    Bring the article's tag links in line with its `tags` string, once per
+    batch of saved articles (see api.batching).
+    """
+    batching.defer(sync_article_tags, article)
+
+
+def sync_article_tags(articles):
+    wanted = {article.pk: parse_tags(article.tags) for article in articles}
+    names = {name for tags in wanted.values() for name in tags}
+
+    ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names - ids.keys()
+    if missing:
+        ids.update(create_tags(missing))
+
+    ArticleTag.objects.filter(article_id__in=wanted).delete()
+    ArticleTag.objects.bulk_create([
+        ArticleTag(article_id=pk, tag_id=ids[name]) for pk, tags in wanted.items() for name in tags
+    ])
+    invalidate_tag_cloud()
+
+
+def create_tags(names):
+    """
+    {name: id} of new tags, created in one INSERT unless another writer
+    created some of them meanwhile. Not with ignore_conflicts, which SQL
+    Server doesn't support.
+    """
+    try:
+        with transaction.atomic():
+            Tag.objects.bulk_create([Tag(name=name) for name in sorted(names)])
+        return dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+    except IntegrityError:
+        pass
+    ids = {}
+    for name in sorted(names):
+        try:
+            with transaction.atomic():
+                ids[name] = Tag.objects.create(name=name).pk
+        except IntegrityError:
+            ids[name] = Tag.objects.get(name=name).pk
+    return ids
+
+
+def filter_by_tags(queryset, tags, match='all'):
+    """
+    Articles carrying all (or with match='any', any) of the given tags.
+    """
+    names = list(dict.fromkeys(filter(None, map(normalize_tag, tags))))
+    if not names:
+        return queryset
+    links = ArticleTag.objects.filter(tag__name__in=names)
+    if match == 'any':
+        return queryset.filter(pk__in=links.values('article_id'))
+    return queryset.filter(pk__in=(
+        links.values('article_id').annotate(matched=Count('tag_id')).filter(matched=len(names)).values('article_id')
+    ))
+
+
+def get_tag_cloud():
+    """
+    [{'name', 'count'}] of the tags of published articles, most used first.
+    """
+    cloud = cache.get(TAG_CLOUD_KEY)
+    if cloud is None:
+        cloud = list(
+            Tag.objects.annotate(count=Count('articles', filter=Q(articles__is_published=True)))
+            .filter(count__gt=0)
+            .order_by('-count', 'name')
+            .values('name', 'count')
+        )
+        cache.set(TAG_CLOUD_KEY, cloud, getattr(settings, 'TAG_CLOUD_CACHE_TIMEOUT', 300))
+    return cloud
+
+
+def invalidate_tag_cloud():
+    stats.invalidate(TAG_CLOUD_KEY)
@@ -1,3 +1,217 @@
-from django.test import TestCase
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from .models import Category, Article, ArticleAttachment, Comment, Tag
+from .tags import create_tags, get_tag_cloud, parse_tags
+from .view_counts import buffer, drain_shared
 
-# Create your tests here.
+
+class ArticleRepresentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader')
+        cls.category = Category.objects.create(name='Guides')
+        cls.article = Article.objects.create(
+            title='Long read',
+            content='x' * 1000,
+            author=cls.user,
+            category=cls.category,
+        )
+        for i in range(3):
+            Comment.objects.create(article=cls.article, author=cls.user, content=f'Comment {i}')
+        ArticleAttachment.objects.create(article=cls.article, file='article_attachments/a.pdf', filename='a.pdf')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_returns_excerpt_and_counts(self):
+        response = self.client.get(reverse('article-list'))
+        item = response.data['results'][0]
+        self.assertNotIn('comments', item)
+        self.assertNotIn('content', item)
+        self.assertEqual(len(item['excerpt']), 300)
+        self.assertEqual(item['comment_count'], 3)
+        self.assertEqual(item['attachment_count'], 1)
+
+    def test_retrieve_returns_full_representation(self):
+        self.addCleanup(buffer.flush)
+        response = self.client.get(reverse('article-detail', args=[self.article.pk]))
+        self.assertEqual(len(response.data['content']), 1000)
+        self.assertEqual(len(response.data['comments']), 3)
+
+    def test_comments_sub_resource(self):
+        url = reverse('article-comments', args=[self.article.pk])
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 3)
+
+        response = self.client.post(url, {'content': 'New'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['article'], self.article.pk)
+        self.assertEqual(response.data['author']['id'], self.user.pk)
+
+        response = self.client.get(reverse('article-comments', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(VIEW_COUNT_BUFFER={'FLUSH_THRESHOLD': 3, 'FLUSH_INTERVAL': 3600})
+class ViewCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer')
+        category = Category.objects.create(name='Guides')
+        cls.article = Article.objects.create(title='Hot', content='...', author=cls.user, category=category)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('article-detail', args=[self.article.pk])
+        buffer.flush()
+        self.addCleanup(buffer.flush)
+
+    def stored_count(self):
+        return Article.objects.values_list('view_count', flat=True).get(pk=self.article.pk)
+
+    def test_views_are_buffered_and_flushed_in_batches(self):
+        self.assertEqual(self.client.get(self.url).data['view_count'], 1)
+        self.assertEqual(self.client.get(self.url).data['view_count'], 2)
+        self.assertEqual(self.stored_count(), 0)
+
+        # Third view reaches the threshold, and is in the count served
+        self.assertEqual(self.client.get(self.url).data['view_count'], 3)
+        self.assertEqual(self.stored_count(), 3)
+        self.assertEqual(buffer.pending(self.article.pk), 0)
+
+    def test_revalidated_views_are_counted(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(buffer.pending(self.article.pk), 2)
+
+    def test_views_are_flushed_after_the_interval_without_more_views(self):
+        self.client.get(self.url)
+        with override_settings(VIEW_COUNT_BUFFER={'FLUSH_INTERVAL': 0}):
+            # Any request
+            self.client.get(reverse('category-list'))
+        self.assertEqual(self.stored_count(), 1)
+
+    def test_views_being_flushed_are_still_counted(self):
+        self.client.get(self.url)
+        counts = []
+        with mock.patch('knowledge.view_counts.apply_view_counts', lambda pending: counts.append(
+            buffer.pending(self.article.pk)
+        )):
+            buffer.flush()
+        self.assertEqual(counts, [1])
+        self.assertEqual(buffer.pending(self.article.pk), 0)
+
+    def test_flush_writes_pending_views(self):
+        self.client.get(self.url)
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(self.stored_count(), 1)
+
+    @override_settings(VIEW_COUNT_BUFFER={'MODE': 'shared', 'FLUSH_THRESHOLD': 2, 'FLUSH_INTERVAL': 3600})
+    def test_shared_mode_is_applied_by_drain(self):
+        self.addCleanup(cache.clear)
+        for _ in range(4):
+            self.client.get(self.url)
+        self.assertEqual(self.stored_count(), 0)
+
+        self.assertEqual(drain_shared(), 4)
+        self.assertEqual(self.stored_count(), 4)
+        self.assertEqual(drain_shared(), 0)
+
+
+class TagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('tagger', is_staff=True)
+        cls.category = Category.objects.create(name='Guides')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def create(self, tags, **kwargs):
+        kwargs.setdefault('is_published', True)
+        return Article.objects.create(
+            title='Tagged', content='...', author=self.user, category=self.category, tags=tags, **kwargs
+        )
+
+    def tag_names(self, article):
+        return sorted(article.tag_set.values_list('name', flat=True))
+
+    def test_parse_tags_normalizes(self):
+        self.assertEqual(parse_tags(' Python,django , PYTHON,,Web   Dev '), ['python', 'django', 'web dev'])
+
+    def test_tags_are_created_without_ignore_conflicts(self):
+        # As on SQL Server
+        with mock.patch.object(connection.features, 'supports_ignore_conflicts', False):
+            article = self.create('Python, Django')
+            self.assertEqual(self.tag_names(article), ['django', 'python'])
+
+            # A tag another writer created after the lookup
+            Tag.objects.create(name='raced')
+            ids = create_tags({'raced', 'new'})
+            self.assertEqual(ids, dict(Tag.objects.filter(name__in=['raced', 'new']).values_list('name', 'id')))
+
+    def test_tags_are_synced_on_save(self):
+        article = self.create('Python, Django')
+        self.assertEqual(self.tag_names(article), ['django', 'python'])
+
+        article.tags = 'django, testing'
+        article.save()
+        self.assertEqual(self.tag_names(article), ['django', 'testing'])
+        self.assertEqual(Tag.objects.count(), 3)
+
+        # Saves that leave the tags alone don't touch the links
+        article.title = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            article.save()
+        self.assertFalse([q for q in queries if 'knowledge_articletag' in q['sql']])
+
+    def test_filter_by_tags(self):
+        both = self.create('python, django')
+        python = self.create('python')
+        self.create('pythonic')
+        url = reverse('article-list')
+
+        def ids(params):
+            return {item['id'] for item in self.client.get(url, params).data['results']}
+
+        self.assertEqual(ids({'tag': 'python'}), {both.pk, python.pk})
+        self.assertEqual(ids({'tag': ['python', 'Django']}), {both.pk})
+        self.assertEqual(ids({'tag': 'python,django'}), {both.pk})
+        self.assertEqual(ids({'tag': 'django,pythonic', 'tag_match': 'any'}), {both.pk} | ids({'tag': 'pythonic'}))
+        self.assertEqual(ids({'tag': 'pyth'}), set())
+
+    def test_tag_cloud_counts_published_articles(self):
+        self.create('python, django')
+        self.create('python')
+        self.create('django, draft', is_published=False)
+
+        response = self.client.get(reverse('tag-cloud'))
+        self.assertEqual(response.data, [{'name': 'python', 'count': 2}, {'name': 'django', 'count': 1}])
+        self.assertEqual(len(self.client.get(reverse('tag-cloud'), {'limit': 1}).data), 1)
+
+        # Served from the cache until an article changes
+        with self.assertNumQueries(0):
+            get_tag_cloud()
+        self.create('django')
+        self.assertEqual(get_tag_cloud()[0], {'name': 'django', 'count': 2})
+
+    def test_bulk_create_syncs_tags(self):
+        response = self.client.post(reverse('article-bulk'), [
+            {'title': f'Bulk {i}', 'content': '...', 'author_id': self.user.pk,
+             'category_id': self.category.pk, 'tags': 'bulk, batch'}
+            for i in range(3)
+        ], format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Tag.objects.get(name='bulk').articles.count(), 3)
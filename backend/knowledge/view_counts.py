@@ -0,0 +1,228 @@
+"""
+Buffered article view counting.
+
+Views are counted in memory and written to the database in batches, once
+FLUSH_THRESHOLD views are pending or FLUSH_INTERVAL seconds have passed
+since the last flush, and when the process exits cleanly. The interval is
+checked when a view is counted and at the end of every request, so views
+don't wait for the next view to be written. Reads add the process's
+pending views, including those being written, to the stored count, so they
+serve an approximate value without touching the row.
+
+In 'local' mode every process writes its batches straight to the database.
+In 'shared' mode batches are appended to a log in the cache (which should be
+shared between processes, e.g. Redis or Memcached) and applied by
+`manage.py flush_view_counts`.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+from .models import Article
+
+logger = logging.getLogger(__name__)
+
+# Sent after view counts were written to the database, with `counts`
+# mapping article ids to the number of views added
+view_counts_flushed = Signal()
+
+DEFAULTS = {
+    'MODE': 'local',
+    'FLUSH_INTERVAL': 10,
+    'FLUSH_THRESHOLD': 100,
+    'CACHE_ALIAS': 'default',
+}
+
+SEQUENCE_KEY = 'article_views:seq'
+DRAINED_KEY = 'article_views:drained'
+BATCH_KEY = 'article_views:batch:%d'
+MISSING_KEY = 'article_views:missing:%d'
+LOCK_KEY = 'article_views:lock'
+
+# How long a batch number may stay without data before the drain skips it.
+# A writer takes its number and stores the batch right after, so a gap that
+# lasts this long means the writer died in between.
+MISSING_BATCH_GRACE = 60
+
+# Articles updated per UPDATE statement
+UPDATE_CHUNK_SIZE = 500
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'VIEW_COUNT_BUFFER', {})}
+
+
+def apply_view_counts(counts):
+    """
+    Add `counts` ({article_id: views}) to the stored view counts. Articles
+    with the same number of new views share one UPDATE.
+    """
+    by_delta = defaultdict(list)
+    for article_id, delta in counts.items():
+        by_delta[delta].append(article_id)
+
+    with transaction.atomic():
+        for delta, article_ids in by_delta.items():
+            for start in range(0, len(article_ids), UPDATE_CHUNK_SIZE):
+                Article.objects.filter(pk__in=article_ids[start:start + UPDATE_CHUNK_SIZE]).update(
+                    view_count=F('view_count') + delta
+                )
+    view_counts_flushed.send(sender=Article, counts=dict(counts))
+
+
+def push_batch(counts):
+    """
+    Append a batch of view counts to the shared log.
+    """
+    cache = caches[get_config()['CACHE_ALIAS']]
+    cache.add(SEQUENCE_KEY, 0, timeout=None)
+    sequence = cache.incr(SEQUENCE_KEY)
+    cache.set(BATCH_KEY % sequence, dict(counts), timeout=None)
+
+
+def drain_shared():
+    """
+    Apply every complete batch of the shared log to the database. Returns
+    the number of views written, or None if another drain is running.
+    """
+    cache = caches[get_config()['CACHE_ALIAS']]
+    if not cache.add(LOCK_KEY, 1, timeout=300):
+        return None
+    try:
+        drained = cache.get(DRAINED_KEY, 0)
+        latest = cache.get(SEQUENCE_KEY, 0)
+        sequences = range(drained + 1, latest + 1)
+        batches = cache.get_many([BATCH_KEY % sequence for sequence in sequences])
+
+        total = Counter()
+        last = drained
+        for sequence in sequences:
+            batch = batches.get(BATCH_KEY % sequence)
+            if batch is None:
+                cache.add(MISSING_KEY % sequence, time.time(), timeout=MISSING_BATCH_GRACE * 10)
+                if time.time() - cache.get(MISSING_KEY % sequence, time.time()) < MISSING_BATCH_GRACE:
+                    break
+            else:
+                total.update(batch)
+            last = sequence
+
+        if total:
+            apply_view_counts(total)
+        if last != drained:
+            # Written after the database update: a crash in between applies
+            # the batches again on the next drain rather than losing them
+            cache.set(DRAINED_KEY, last, timeout=None)
+            cache.delete_many(
+                [BATCH_KEY % sequence for sequence in range(drained + 1, last + 1)]
+                + [MISSING_KEY % sequence for sequence in range(drained + 1, last + 1)]
+            )
+        return sum(total.values())
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+class ViewCountBuffer:
+    """
+    Per-process buffer of article views waiting to be flushed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        # Taken out of _pending by a flush, until they are written
+        self._flushing = Counter()
+        self._size = 0
+        self._last_flush = time.monotonic()
+
+    def record(self, article_id):
+        with self._lock:
+            self._pending[article_id] += 1
+            self._size += 1
+        self.flush_if_due()
+
+    def is_due(self):
+        config = get_config()
+        return self._size > 0 and (
+            self._size >= config['FLUSH_THRESHOLD']
+            or time.monotonic() - self._last_flush >= config['FLUSH_INTERVAL']
+        )
+
+    def flush_if_due(self):
+        if self.is_due():
+            self.flush()
+
+    def pending(self, article_id):
+        with self._lock:
+            return self._pending.get(article_id, 0) + self._flushing.get(article_id, 0)
+
+    def flush(self):
+        """
+        Write out the pending views. They are put back if the write fails,
+        so a failed flush is retried by the next one.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushing.update(pending)
+            self._size = 0
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            if get_config()['MODE'] == 'shared':
+                push_batch(pending)
+            else:
+                apply_view_counts(pending)
+        except Exception:
+            with self._lock:
+                self._pending.update(pending)
+                self._size += sum(pending.values())
+            raise
+        finally:
+            with self._lock:
+                self._flushing.subtract(pending)
+                self._flushing = +self._flushing
+        return sum(pending.values())
+
+
+buffer = ViewCountBuffer()
+
+
+def count_view(article_id):
+    buffer.record(article_id)
+
+
+def add_pending_views(article):
+    """
+    Set the view_count of `article`, loaded from the database, to the
+    approximate current value, including views not flushed yet.
+    """
+    if 'view_count' not in article.get_deferred_fields():
+        article.view_count += buffer.pending(article.pk)
+
+
+def flush_when_due(**kwargs):
+    try:
+        buffer.flush_if_due()
+    except Exception:
+        logger.exception('Could not flush buffered article views')
+
+
+request_finished.connect(flush_when_due, dispatch_uid='knowledge.view_counts.flush_when_due')
+
+
+def flush_at_exit():
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception('Could not flush buffered article views at exit')
+
+
+atexit.register(flush_at_exit)
@@ -1,63 +1,144 @@
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q, F
+from rest_framework.generics import get_object_or_404
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Substr
 from .models import Category, Article, ArticleAttachment, Comment
 from .serializers import (
     CategorySerializer, 
     ArticleSerializer, 
+    ArticleListSerializer,
     ArticleAttachmentSerializer,
     CommentSerializer
 )
+from .filters import filter_articles
+from .tags import get_tag_cloud
+from .view_counts import add_pending_views, count_view
+from api.bulk import BulkMixin
+from api.conditional import ConditionalGetMixin
+from api.fastpath import FastListMixin
+from api.fieldsets import SparseQuerysetMixin
+from api.downloads import PassthroughRenderer, send_attachment
+from api.pagination import KeysetPagination
 from api.permissions import IsAuthorOrReadOnly, IsAdminOrReadOnly
 
-class CategoryViewSet(viewsets.ModelViewSet):
+# Number of characters of content returned as the excerpt in article lists
+EXCERPT_LENGTH = 300
+
+
+def related_count(model, field):
+    """
+    Correlated subquery counting the rows of `model` pointing at the outer
+    row through `field`. Unlike Count() over a join it is only evaluated for
+    the rows actually returned, and several counts don't multiply each other.
+    """
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class CategoryViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminOrReadOnly]
+    conditional_models = ['knowledge.Category']
+
+    def get_queryset(self):
+        return self.only_requested(Category.objects.all())
 
 
-class ArticleViewSet(viewsets.ModelViewSet):
+class ArticleViewSet(ConditionalGetMixin, SparseQuerysetMixin, FastListMixin, BulkMixin, viewsets.ModelViewSet):
     queryset = Article.objects.all()
     serializer_class = ArticleSerializer
     permission_classes = [permissions.IsAuthenticated, IsAuthorOrReadOnly]
+    pagination_class = KeysetPagination
+    bulk_select_related = ['author']
+    conditional_models = [
+        'knowledge.Article', 'knowledge.ArticleAttachment', 'knowledge.Comment', 'knowledge.Category', 'auth.User',
+    ]
     
     def get_queryset(self):
-        queryset = Article.objects.all()
+        queryset = self.select_requested(Article.objects.all(), 'author', 'category')
+        if self.action == 'list':
+            annotations = {
+                'excerpt': Substr('content', 1, EXCERPT_LENGTH),
+                'comment_count': related_count(Comment, 'article'),
+                'attachment_count': related_count(ArticleAttachment, 'article'),
+            }
+            queryset = queryset.defer('content').annotate(**{
+                name: expression for name, expression in annotations.items() if self.sparse_fields.wants(name)
+            })
+        else:
+            queryset = self.prefetch_requested(queryset, 'attachments')
+            queryset = self.prefetch_requested(queryset, 'comments', Comment.objects.select_related('author'))
         
-        # Filter by category
-        category_id = self.request.query_params.get('category_id')
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
-            
-        # Filter by search term
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | 
-                Q(content__icontains=search) |
-                Q(tags__icontains=search)
-            )
-            
-        # Filter by published status
-        published = self.request.query_params.get('published')
-        if published is not None:
-            is_published = published.lower() == 'true'
-            queryset = queryset.filter(is_published=is_published)
-            
-        return queryset
+        return self.only_requested(filter_articles(queryset, self.request.query_params))
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ArticleListSerializer
+        return ArticleSerializer
     
+    def get_response_cache_key(self, request, etag):
+        # Every view of an article changes its view count
+        if self.action == 'retrieve':
+            return None
+        return super().get_response_cache_key(request, etag)
+
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        
-        # Increment view count
-        instance.view_count = F('view_count') + 1
-        instance.save()
-        instance.refresh_from_db()  # Refresh to get the updated view_count
-        
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        # Counted before ConditionalGetMixin, which answers revalidations
+        # with 304 without loading the article
+        article_id = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if str(article_id).isdigit():
+            count_view(int(article_id))
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_object(self):
+        instance = super().get_object()
+        if self.action == 'retrieve':
+            # Views are buffered and written in batches, the count returned
+            # includes this process's pending views
+            add_pending_views(instance)
+        return instance
+
+    @action(detail=True, methods=['get', 'post'], serializer_class=CommentSerializer)
+    def comments(self, request, pk=None):
+        """
+        Paginated comments of a single article. POST adds a comment to it.
+        """
+        # Commenting is open to everyone, so the article's object permissions
+        # (author only for writes) deliberately don't apply here
+        article = get_object_or_404(Article.objects.only('pk'), pk=pk)
+
+        if request.method == 'POST':
+            data = request.data.copy()
+            data['article'] = article.pk
+            data.setdefault('author_id', request.user.pk)
+            serializer = CommentSerializer(data=data, context=self.get_serializer_context())
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        queryset = self.select_requested(Comment.objects.filter(article=article), 'author')
+        page = self.paginate_queryset(queryset)
+        serializer = CommentSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
     
+    @action(detail=True, methods=['get'], url_path=r'attachments/(?P<attachment_id>\d+)/download',
+            renderer_classes=[PassthroughRenderer])
+    def download_attachment(self, request, pk=None, attachment_id=None):
+        attachment = get_object_or_404(
+            ArticleAttachment.objects.select_related('article'), pk=attachment_id, article_id=pk
+        )
+        self.check_object_permissions(request, attachment.article)
+        return send_attachment(request, attachment)
+
     @action(detail=True, methods=['post'])
     def add_attachment(self, request, pk=None):
         article = self.get_object()
@@ -87,13 +168,29 @@ class ArticleViewSet(viewsets.ModelViewSet):
         return Response({'error': 'attachment_id not provided'}, status=400)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(SparseQuerysetMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated, IsAuthorOrReadOnly]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
+        queryset = self.select_requested(Comment.objects.all(), 'author')
         article_id = self.request.query_params.get('article_id')
         if article_id:
-            return Comment.objects.filter(article_id=article_id)
-        return Comment.objects.all()
\ No newline at end of file
+            queryset = queryset.filter(article_id=article_id)
+        return self.only_requested(queryset)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def tag_cloud(request):
+    """
+    Tags of published articles with their article counts, most used first.
+    `limit` keeps the top ones.
+    """
+    cloud = get_tag_cloud()
+    limit = request.query_params.get('limit')
+    if limit and limit.isdigit():
+        cloud = cloud[:int(limit)]
+    return Response(cloud)
@@ -51,9 +51,11 @@ INSTALLED_APPS = [
     'api',
     'notices',
     'knowledge',
+    'search',
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.PerformanceMiddleware',  # Removes itself unless PERFORMANCE_METRICS is enabled
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware
@@ -160,6 +162,38 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Attachments are stored once per unique content (see api.storage)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'attachments': {
+        'BACKEND': 'api.storage.ContentAddressedStorage',
+    },
+}
+
+# Largest batch accepted by /api/notices/bulk/ and /api/articles/bulk/
+BULK_MAX_BATCH_SIZE = 500
+
+# Chunked uploads (/api/uploads/)
+# Partial files are kept in UPLOAD_SESSION_DIR; keep it on the same file
+# system as MEDIA_ROOT so completed uploads are moved, not copied.
+UPLOAD_SESSION_DIR = os.path.join(BASE_DIR, 'upload_sessions')
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024
+UPLOAD_SESSION_MAX_AGE = 24 * 60 * 60
+
+# Attachment downloads (/api/notices/<id>/attachments/<id>/download/ and the
+# article equivalent). 'stream' serves files from Django; 'x-accel-redirect'
+# (nginx, with an internal location at ATTACHMENT_ACCEL_PREFIX aliased to
+# MEDIA_ROOT) and 'x-sendfile' (Apache, lighttpd) let the web server send them.
+ATTACHMENT_SEND_MODE = os.environ.get('ATTACHMENT_SEND_MODE', 'stream')
+ATTACHMENT_ACCEL_PREFIX = '/protected-media/'
+ATTACHMENT_CACHE_MAX_AGE = 3600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -172,8 +206,103 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        'api.tokens.TokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
+
+# Full-text search
+# The backend is picked from the database vendor (SQLite FTS5, SQL Server
+# full-text) unless SEARCH_BACKEND names a backend class explicitly.
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND')
+SEARCH_MAX_RESULTS = 200
+
+# Article view counting
+# Views are buffered and written in batches when FLUSH_THRESHOLD views are
+# pending or FLUSH_INTERVAL seconds have passed, and on clean shutdown.
+# In 'shared' mode batches go to the cache (which must then be shared between
+# processes) and are applied by `manage.py flush_view_counts --loop`.
+VIEW_COUNT_BUFFER = {
+    'MODE': os.environ.get('VIEW_COUNT_MODE', 'local'),
+    'FLUSH_INTERVAL': 10,
+    'FLUSH_THRESHOLD': 100,
+    'CACHE_ALIAS': 'default',
+}
+
+# Dashboard statistics
+# Cached parts of /api/stats/ are dropped when the underlying models change;
+# the timeout bounds staleness when the cache isn't shared between processes.
+STATS_CACHE_TIMEOUT = 300
+
+# Article tag cloud (/api/tags/), dropped from the cache when articles change
+TAG_CLOUD_CACHE_TIMEOUT = 300
+
+# Filter facet counts (/api/facets/), cached per filter combination until
+# notices or articles change. The timeout bounds how long active_only counts
+# lag behind notices expiring.
+FACETS_CACHE_TIMEOUT = 60
+
+# Notice read state (is_read, /api/notices/unread-count/), cached per user
+# until the user marks notices read
+NOTICE_READ_STATE_CACHE_TIMEOUT = 300
+
+# Response cache for list and retrieve on the notice, article, category and
+# user endpoints. Entries are keyed by the model versions the response is
+# built from, so writes make them unreachable; TIMEOUT only frees memory.
+RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('RESPONSE_CACHE', 'True') == 'True',
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Fast path for the notice, article and comment lists: responses built from
+# values() rows by a compiled field mapper, rendered with orjson when it is
+# installed. The output is the same as the regular path's.
+FAST_LISTS = os.environ.get('FAST_LISTS', 'False') == 'True'
+
+# Per-request performance instrumentation of /api/: SQL, view, serializer
+# and render times in a Server-Timing header and a log line (logger
+# api.performance), and latency histograms at /api/metrics/ (staff only).
+PERFORMANCE_METRICS = {
+    'ENABLED': os.environ.get('PERFORMANCE_METRICS', 'False') == 'True',
+    'SERVER_TIMING': True,
+    'LOG': True,
+    # Seconds, for the duration histograms
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+}
+
+# API tokens (/api/tokens/, `Authorization: Token <key>`). Lifetimes are in
+# seconds, None for no limit. Verified tokens are cached in each process;
+# revocations reach other processes within CACHE_TIMEOUT seconds.
+TOKEN_AUTH = {
+    'LIFETIME': 30 * 86400,
+    'MAX_LIFETIME': 365 * 86400,
+    'CACHE_SIZE': 10000,
+    'CACHE_TIMEOUT': 60,
+}
+
+# Sessions and the users they belong to are looked up in process memory,
+# then in the shared cache, then in the database (api.auth_cache). Logging
+# out, password, is_staff and is_active changes drop them from both caches;
+# other processes keep their in-memory copies for up to LOCAL_TIMEOUT
+# seconds, so keep it short. ENABLED False reads the database every time.
+SESSION_ENGINE = 'api.sessions'
+AUTHENTICATION_BACKENDS = ['api.auth_cache.CachedModelBackend']
+AUTH_CACHE = {
+    'ENABLED': os.environ.get('AUTH_CACHE', 'True') == 'True',
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_SIZE': 10000,
+    'LOCAL_TIMEOUT': 5,
+}
+
+# Live notice feed (/api/notices/events/, needs the ASGI application). The
+# local broker only reaches connections in the process making the change.
+LIVE_FEED = {
+    'BROKER': 'api.events.LocalBroker',
+    'BUFFER_SIZE': 1000,
+    'QUEUE_SIZE': 100,
+    'HEARTBEAT': 15,
+}
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notice, NoticeAttachment
+from .models import Notice, NoticeAttachment, ArchivedNotice, ArchivedNoticeAttachment
 
 class NoticeAttachmentInline(admin.TabularInline):
     model = NoticeAttachment
@@ -16,4 +16,16 @@ class NoticeAdmin(admin.ModelAdmin):
 @admin.register(NoticeAttachment)
 class NoticeAttachmentAdmin(admin.ModelAdmin):
     list_display = ('filename', 'notice', 'upload_date')
-    search_fields = ('filename', 'notice__title')
\ No newline at end of file
+    search_fields = ('filename', 'notice__title')
+
+class ArchivedNoticeAttachmentInline(admin.TabularInline):
+    model = ArchivedNoticeAttachment
+    extra = 0
+
+@admin.register(ArchivedNotice)
+class ArchivedNoticeAdmin(admin.ModelAdmin):
+    list_display = ('title', 'author', 'category', 'priority', 'expires_at', 'archived_at')
+    list_filter = ('priority', 'category')
+    search_fields = ('title', 'content', 'category')
+    date_hierarchy = 'expires_at'
+    inlines = [ArchivedNoticeAttachmentInline]
@@ -0,0 +1,102 @@
+"""
+Archival of expired notices.
+
+Notices that expired before a cutoff are copied, with their attachments,
+into ArchivedNotice/ArchivedNoticeAttachment and deleted from the live
+tables, a batch per transaction. Archived notices keep their ids and
+attachments keep their files: the blob references move with them, so
+reference counts don't change.
+
+Rows are copied with INSERT ... SELECT and deleted with plain DELETEs
+rather than saved and deleted one by one, so the side effects the model
+signals would have are applied here once per batch.
+"""
+from django.db import connections, router, transaction
+from django.utils import timezone
+from api import batching, stats
+from api.conditional import bump_version
+from api.events import get_broker
+from search.backends import get_backend
+from .models import Notice, NoticeAttachment, ArchivedNotice, ArchivedNoticeAttachment
+
+# Batches select their rows with an IN list of one parameter per notice;
+# SQL Server takes at most 2100 parameters per statement
+MAX_BATCH_SIZE = 2000
+
+
+def copy_rows(source, target, ids, extra=None, key='id'):
+    """
+    INSERT INTO target SELECT ... FROM source WHERE key IN ids, without
+    loading the rows. `extra` gives values of target columns that source
+    doesn't have. Returns the number of rows copied.
+    """
+    connection = connections[router.db_for_write(target)]
+    quote = connection.ops.quote_name
+    extra = extra or {}
+    columns = [field.column for field in source._meta.concrete_fields]
+    target_columns = columns + [target._meta.get_field(name).column for name in extra]
+    placeholders = ', '.join(['%s'] * len(ids))
+    sql = (
+        f'INSERT INTO {quote(target._meta.db_table)} ({", ".join(map(quote, target_columns))}) '
+        f'SELECT {", ".join([*map(quote, columns), *["%s"] * len(extra)])} '
+        f'FROM {quote(source._meta.db_table)} WHERE {quote(key)} IN ({placeholders})'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*extra.values(), *ids])
+        return cursor.rowcount
+
+
+def archive_batch(cutoff, batch_size=1000):
+    """
+    Archive up to `batch_size` (at most MAX_BATCH_SIZE) notices that expired
+    before `cutoff`, oldest first. Returns (notices archived, attachments
+    archived).
+    """
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    with transaction.atomic(), batching.batch():
+        notices = list(
+            Notice.objects.select_for_update()
+            .filter(expires_at__lt=cutoff)
+            .order_by('expires_at', 'id')
+            .values_list('id', 'category')[:batch_size]
+        )
+        if not notices:
+            return 0, 0
+        ids = [pk for pk, category in notices]
+
+        copy_rows(Notice, ArchivedNotice, ids, extra={'archived_at': timezone.now()})
+        attachments = copy_rows(NoticeAttachment, ArchivedNoticeAttachment, ids, key='notice_id')
+
+        # Plain DELETEs: a regular delete() would load every row to send
+        # signals, and the archive takes over the attachments' blobs
+        NoticeAttachment.objects.filter(notice_id__in=ids)._raw_delete(NoticeAttachment.objects.db)
+        Notice.objects.filter(pk__in=ids)._raw_delete(Notice.objects.db)
+
+        stats.adjust('total_notices', -len(ids))
+        stats.adjust('notice_deletions', len(ids))
+        stats.invalidate(stats.LATEST_NOTICES_KEY)
+        for label in ['notices.Notice', 'notices.NoticeAttachment',
+                      'notices.ArchivedNotice', 'notices.ArchivedNoticeAttachment']:
+            bump_version(label)
+        get_backend().remove_many([(Notice, pk) for pk in ids])
+
+        events = [('archived', {category}, {'id': pk, 'category': category}) for pk, category in notices]
+        transaction.on_commit(lambda: [get_broker().publish(*event) for event in events])
+    return len(notices), attachments
+
+
+def archive_expired(cutoff=None, batch_size=1000, limit=None):
+    """
+    Archive notices expired before `cutoff` (default: now) in batches,
+    until none are left or `limit` notices were archived. Yields each
+    batch's (notices, attachments) counts.
+    """
+    cutoff = cutoff or timezone.now()
+    archived = 0
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        counts = archive_batch(cutoff, size)
+        if not counts[0]:
+            return
+        archived += counts[0]
+        yield counts
@@ -0,0 +1,50 @@
+import datetime
+from django.db.models import Max, Q
+from django.utils import timezone
+from search.filters import match_queryset, search_queryset
+from .models import Notice
+
+
+def filter_notices(queryset, params, ranked=True):
+    """
+    Apply the notice list filters in `params` (a QueryDict): category,
+    search, priority and active_only. With `ranked=False` a search only
+    filters, without ordering by relevance, e.g. to count the matches.
+    """
+    # Filter by category
+    category = params.get('category')
+    if category:
+        queryset = queryset.filter(category=category)
+
+    # Filter by search term
+    search = params.get('search')
+    if search:
+        queryset = search_queryset(queryset, search) if ranked else match_queryset(queryset, search)
+
+    # Filter by priority
+    priority = params.get('priority')
+    if priority:
+        queryset = queryset.filter(priority=priority)
+
+    # Filter by active notices (not expired)
+    if is_active_only(params):
+        now = timezone.now()
+        queryset = queryset.filter(
+            Q(expires_at__gt=now) | Q(expires_at__isnull=True)
+        )
+
+    return queryset
+
+
+def is_active_only(params):
+    active_only = params.get('active_only')
+    return bool(active_only) and active_only.lower() == 'true'
+
+
+def last_expiry():
+    """
+    When the latest notice to expire so far expired, or the epoch if none
+    did: what active_only results depend on besides the notices themselves.
+    """
+    expired = Notice.objects.filter(expires_at__lte=timezone.now()).aggregate(last=Max('expires_at'))['last']
+    return expired or datetime.datetime.fromtimestamp(0, datetime.timezone.utc)
@@ -0,0 +1,62 @@
+import signal
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from notices.archive import MAX_BATCH_SIZE, archive_expired
+
+
+class Command(BaseCommand):
+    help = (
+        'Move expired notices and their attachments to the archive, in batches. '
+        'With --loop keeps archiving at an interval until interrupted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000, help=f'Notices per transaction (at most {MAX_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--grace-days', type=float, default=0,
+            help='Only archive notices that expired at least this many days ago',
+        )
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many notices')
+        parser.add_argument('--loop', action='store_true', help='Keep archiving until stopped')
+        parser.add_argument('--interval', type=float, default=3600, help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        if options['batch_size'] > MAX_BATCH_SIZE:
+            self.stdout.write(self.style.WARNING(f'Using batches of {MAX_BATCH_SIZE} notices'))
+        if not options['loop']:
+            self.archive(options)
+            return
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.stdout.write(f"Archiving expired notices every {options['interval']}s...")
+        while not self.stopping:
+            self.archive(options)
+            deadline = time.monotonic() + options['interval']
+            while not self.stopping and time.monotonic() < deadline:
+                time.sleep(min(0.5, options['interval']))
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def archive(self, options):
+        cutoff = timezone.now() - timedelta(days=options['grace_days'])
+        notices = attachments = 0
+        start = time.perf_counter()
+        for batch_notices, batch_attachments in archive_expired(cutoff, options['batch_size'], options['limit']):
+            notices += batch_notices
+            attachments += batch_attachments
+            if self.stopping:
+                # Finish the current batch only
+                break
+        elapsed = time.perf_counter() - start
+        if notices:
+            self.stdout.write(self.style.SUCCESS(
+                f'Archived {notices} notices and {attachments} attachments in {elapsed:.1f}s '
+                f'({notices / elapsed:.0f} notices/s)'
+            ))
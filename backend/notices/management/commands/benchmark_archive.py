@@ -0,0 +1,66 @@
+import time
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from api.benchmarking import chunked, make_rng, make_text
+from notices.archive import archive_expired
+from notices.models import Notice, NoticeAttachment
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure archiving throughput on synthetic expired notices. '
+        'Runs in a transaction that is rolled back, so the database is left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Expired notices to archive')
+        parser.add_argument('--live', type=int, default=20000, help='Notices that stay live')
+        parser.add_argument('--attachment-every', type=int, default=10, help='One attachment per N notices')
+        parser.add_argument('--archive-batch-size', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Insert batch size')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options)
+            notices = attachments = 0
+            start = time.perf_counter()
+            for batch_notices, batch_attachments in archive_expired(batch_size=options['archive_batch_size']):
+                notices += batch_notices
+                attachments += batch_attachments
+            elapsed = time.perf_counter() - start
+
+            self.stdout.write(
+                f'Archived {notices} notices and {attachments} attachments in {elapsed:.1f}s: '
+                f'{notices / elapsed:.0f} notices/s '
+                f"(batches of {options['archive_batch_size']})"
+            )
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        rng = make_rng(options['seed'])
+        user = User.objects.create_user('benchmark-archive')
+        now = timezone.now()
+        total = options['rows'] + options['live']
+
+        def notices():
+            for i in range(total):
+                expired = i < options['rows']
+                yield Notice(
+                    title=make_text(rng, 6),
+                    content=make_text(rng, 40),
+                    author=user,
+                    category=rng.choice(['General', 'HR', 'IT', 'Facilities']),
+                    expires_at=now - timedelta(days=rng.randint(1, 900)) if expired else None,
+                )
+
+        self.stdout.write(f'Inserting {total} notices...')
+        for batch in chunked(notices(), options['batch_size']):
+            created = Notice.objects.bulk_create(batch)
+            NoticeAttachment.objects.bulk_create([
+                NoticeAttachment(notice=notice, file='blobs/00/00/0.pdf', filename='policy.pdf')
+                for notice in created[::options['attachment_every']]
+            ])
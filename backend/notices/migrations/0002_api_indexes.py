@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-18 13:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notices', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notice',
+            index=models.Index(fields=['-pinned', '-created_at', '-id'], name='notice_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notice',
+            index=models.Index(fields=['category', '-pinned', '-created_at', '-id'], name='notice_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notice',
+            index=models.Index(fields=['priority', '-pinned', '-created_at', '-id'], name='notice_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notice',
+            index=models.Index(fields=['expires_at'], name='notice_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notice',
+            index=models.Index(condition=models.Q(('expires_at__isnull', True)), fields=['-pinned', '-created_at', '-id'], name='notice_no_expiry_idx'),
+        ),
+    ]
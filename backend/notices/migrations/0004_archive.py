@@ -0,0 +1,54 @@
+# Generated by Django 5.0.14 on 2026-10-18 13:24
+
+import api.storage
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notices', '0003_attachment_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedNotice',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('content', models.TextField()),
+                ('category', models.CharField(max_length=100)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], default='medium', max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('pinned', models.BooleanField(default=False)),
+                ('archived_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_notices', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-expires_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedNoticeAttachment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('file', models.FileField(storage=api.storage.attachment_storage, upload_to='notice_attachments/')),
+                ('filename', models.CharField(max_length=255)),
+                ('upload_date', models.DateTimeField()),
+                ('notice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='notices.archivednotice')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivednotice',
+            index=models.Index(fields=['-expires_at', '-id'], name='archived_notice_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivednotice',
+            index=models.Index(fields=['category', '-expires_at', '-id'], name='archived_notice_category_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.14 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+def count_reads(apps, schema_editor):
+    StatCounter = apps.get_model('api', 'StatCounter')
+    Notice = apps.get_model('notices', 'Notice')
+    NoticeReadState = apps.get_model('notices', 'NoticeReadState')
+    StatCounter.objects.get_or_create(name='notice_deletions', defaults={'value': 0})
+    for state in NoticeReadState.objects.all():
+        state.read_count = Notice.objects.filter(pk__lte=state.last_read_id).count()
+        for start in range(0, len(state.read_ids), 1000):
+            state.read_count += Notice.objects.filter(pk__in=state.read_ids[start:start + 1000]).count()
+        state.save(update_fields=['read_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        ('notices', '0006_notice_read_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noticereadstate',
+            name='read_count',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='noticereadstate',
+            name='counted_deletions',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(count_reads, migrations.RunPython.noop),
+    ]
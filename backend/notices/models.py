@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from api.storage import attachment_storage
 
 class Notice(models.Model):
     PRIORITY_CHOICES = [
@@ -20,16 +21,97 @@ class Notice(models.Model):
     
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Values as loaded, so the live feed can tell pinning and moves
+        # between categories apart from other changes
+        instance._loaded = {
+            name: instance.__dict__.get(name) for name in ('pinned', 'category')
+        }
+        return instance
     
     class Meta:
         ordering = ['-pinned', '-created_at']
+        indexes = [
+            # Default list order, and with each of the equality filters in front
+            models.Index(fields=['-pinned', '-created_at', '-id'], name='notice_list_idx'),
+            models.Index(fields=['category', '-pinned', '-created_at', '-id'], name='notice_category_idx'),
+            models.Index(fields=['priority', '-pinned', '-created_at', '-id'], name='notice_priority_idx'),
+            # The two arms of the active_only filter: expiring later, or never.
+            # Only backends with partial index support create the second one.
+            models.Index(fields=['expires_at'], name='notice_expires_idx'),
+            models.Index(
+                fields=['-pinned', '-created_at', '-id'],
+                condition=models.Q(expires_at__isnull=True),
+                name='notice_no_expiry_idx',
+            ),
+            # Covers the category x priority counts of /api/facets/
+            models.Index(fields=['category', 'priority'], name='notice_facet_idx'),
+        ]
 
 
 class NoticeAttachment(models.Model):
     notice = models.ForeignKey(Notice, on_delete=models.CASCADE, related_name='attachments')
-    file = models.FileField(upload_to='notice_attachments/')
+    file = models.FileField(upload_to='notice_attachments/', storage=attachment_storage)
     filename = models.CharField(max_length=255)
     upload_date = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return self.filename
\ No newline at end of file
+        return self.filename
+
+class ArchivedNotice(models.Model):
+    """
+    An expired notice moved out of the notice table by `manage.py
+    archive_notices`. Keeps the notice's id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    content = models.TextField()
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notices')
+    category = models.CharField(max_length=100)
+    priority = models.CharField(max_length=20, choices=Notice.PRIORITY_CHOICES, default='medium')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    expires_at = models.DateTimeField(null=True, blank=True)
+    pinned = models.BooleanField(default=False)
+    archived_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        ordering = ['-expires_at']
+        indexes = [
+            models.Index(fields=['-expires_at', '-id'], name='archived_notice_list_idx'),
+            models.Index(fields=['category', '-expires_at', '-id'], name='archived_notice_category_idx'),
+        ]
+
+
+class ArchivedNoticeAttachment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    notice = models.ForeignKey(ArchivedNotice, on_delete=models.CASCADE, related_name='attachments')
+    file = models.FileField(upload_to='notice_attachments/', storage=attachment_storage)
+    filename = models.CharField(max_length=255)
+    upload_date = models.DateTimeField()
+
+    def __str__(self):
+        return self.filename
+
+
+class NoticeReadState(models.Model):
+    """
+    The notices a user has read: every notice up to `last_read_id`, and the
+    ones in `read_ids` above it. See notices.reads.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notice_read_state')
+    last_read_id = models.BigIntegerField(default=0)
+    read_ids = models.JSONField(default=list, blank=True)
+    # Existing notices read, as of the `notice_deletions` counter value
+    read_count = models.BigIntegerField(default=0)
+    counted_deletions = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.user}: up to {self.last_read_id} and {len(self.read_ids)} more'
@@ -0,0 +1,188 @@
+"""
+Per-user notice read state.
+
+Notice ids only grow, so what a user has read is kept as a high-water mark
+(every notice up to `last_read_id` is read) plus the sparse ids of notices
+read above it, in a single NoticeReadState row per user. Marking notices
+read moves the mark over every leading run of read notices, so the
+exceptions only ever hold notices read ahead of an unread one.
+
+`is_read` is answered from that one row, cached until it changes. The row
+also keeps how many existing notices the user has read, updated as notices
+are marked, so the unread count is the maintained notice total minus it,
+whatever the number of users and notices. Deleting notices may remove read
+ones, so it bumps the `notice_deletions` counter, and a read count taken
+before the last deletion is recounted on next use.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils.functional import cached_property
+from api import stats
+from .models import Notice, NoticeReadState
+
+
+EMPTY_STATE = {'last_read_id': 0, 'read_ids': [], 'updated_at': None, 'read_count': 0, 'counted_deletions': 0}
+
+# Notices deleted so far, to tell when read counts need a recount
+DELETIONS_COUNTER = 'notice_deletions'
+
+
+def cache_key(user_id):
+    return f'notices:read-state:{user_id}'
+
+
+def invalidate(user_id):
+    """
+    Drop the user's cached state now, and again on commit in case a
+    concurrent request cached the old one meanwhile.
+    """
+    key = cache_key(user_id)
+    cache.delete(key)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+class ReadState:
+    """
+    A user's read state, loaded on first use and shared by everything that
+    serializes notices for the request.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def row(self):
+        """
+        The user's NoticeReadState values, EMPTY_STATE for a user who never
+        read anything.
+        """
+        if not self.user.is_authenticated:
+            return EMPTY_STATE
+        key = cache_key(self.user.pk)
+        row = cache.get(key)
+        if row is None:
+            row = NoticeReadState.objects.filter(user=self.user).values(*EMPTY_STATE).first() or EMPTY_STATE
+            cache.set(key, row, getattr(settings, 'NOTICE_READ_STATE_CACHE_TIMEOUT', 300))
+        return row
+
+    @cached_property
+    def state(self):
+        return self.row['last_read_id'], frozenset(self.row['read_ids'])
+
+    @property
+    def updated_at(self):
+        return self.row['updated_at']
+
+    def is_read(self, notice_id):
+        last_read_id, read_ids = self.state
+        return notice_id <= last_read_id or notice_id in read_ids
+
+    @property
+    def token(self):
+        """
+        A string that changes whenever the state does, for validators.
+        """
+        last_read_id, read_ids = self.state
+        return f'{last_read_id}+{",".join(map(str, sorted(read_ids)))}'
+
+
+def unread_count(user):
+    """
+    The number of notices the user hasn't read: the notice total minus the
+    user's read count, both maintained, so no notices are counted. After
+    notices were deleted, the read count is recounted once.
+    """
+    row = ReadState(user).row
+    read_count = row['read_count']
+    deletions = stats.get_counter(DELETIONS_COUNTER)
+    if row['updated_at'] is not None and row['counted_deletions'] != deletions:
+        with transaction.atomic():
+            state = lock_state(user)
+            recount(state)
+            state.save(update_fields=['read_count', 'counted_deletions'])
+            invalidate(user.pk)
+        read_count = state.read_count
+    return max(0, stats.get_counter('total_notices') - read_count)
+
+
+def mark_read(user, notice_ids):
+    """
+    Mark the notices with the given ids read. Ids of notices that don't
+    exist are ignored.
+    """
+    with transaction.atomic():
+        state = lock_state(user)
+        new = {pk for pk in notice_ids if pk > state.last_read_id} - set(state.read_ids)
+        if new:
+            new = set(Notice.objects.filter(pk__in=new).values_list('pk', flat=True))
+        if new:
+            advance(state, state.last_read_id, set(state.read_ids) | new, len(new))
+    return state
+
+
+def mark_all_read(user, up_to=None):
+    """
+    Mark every notice read, or with `up_to` every notice up to that id (the
+    newest one the client has shown), so notices published since stay
+    unread.
+    """
+    if up_to is None:
+        up_to = Notice.objects.aggregate(last=Max('pk'))['last'] or 0
+    with transaction.atomic():
+        state = lock_state(user)
+        if up_to > state.last_read_id:
+            # Only the newly covered range is counted; read_ids in it were
+            # counted when they were marked
+            newly_read = Notice.objects.filter(pk__gt=state.last_read_id, pk__lte=up_to).count() - sum(
+                1 for pk in state.read_ids if pk <= up_to
+            )
+            advance(state, up_to, set(state.read_ids), newly_read)
+    return state
+
+
+def lock_state(user):
+    state, created = NoticeReadState.objects.select_for_update().get_or_create(
+        user=user, defaults={'counted_deletions': stats.get_counter(DELETIONS_COUNTER, cached=False)}
+    )
+    return state
+
+
+def recount(state):
+    """
+    Count the existing notices the state covers.
+    """
+    state.counted_deletions = stats.get_counter(DELETIONS_COUNTER, cached=False)
+    state.read_count = Notice.objects.filter(pk__lte=state.last_read_id).count()
+    # In chunks: SQL Server takes at most 2100 parameters
+    for start in range(0, len(state.read_ids), 1000):
+        state.read_count += Notice.objects.filter(pk__in=state.read_ids[start:start + 1000]).count()
+
+
+def advance(state, last_read_id, read_ids, newly_read):
+    """
+    Save the state read up to `last_read_id` plus `read_ids`, moving the
+    mark up to the first unread notice. `newly_read` existing notices were
+    added to it.
+    """
+    read_ids = {pk for pk in read_ids if pk > last_read_id}
+    if read_ids:
+        first_unread = (
+            Notice.objects.filter(pk__gt=last_read_id)
+            .exclude(pk__in=read_ids)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        last_read_id = max(read_ids) if first_unread is None else first_unread - 1
+    state.last_read_id = last_read_id
+    state.read_ids = sorted(pk for pk in read_ids if pk > last_read_id)
+    if state.counted_deletions == stats.get_counter(DELETIONS_COUNTER, cached=False):
+        state.read_count += newly_read
+    else:
+        # Notices were deleted since the count, some of them maybe read
+        recount(state)
+    state.save(update_fields=['last_read_id', 'read_ids', 'read_count', 'counted_deletions', 'updated_at'])
+    invalidate(state.user_id)
@@ -1,27 +1,37 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Notice, NoticeAttachment
+from api.fieldsets import SparseFieldsMixin
+from api.instrumentation import TimedSerializerMixin
+from .models import Notice, NoticeAttachment, ArchivedNotice, ArchivedNoticeAttachment
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'email']
 
 
-class NoticeAttachmentSerializer(serializers.ModelSerializer):
+class NoticeAttachmentSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = NoticeAttachment
         fields = ['id', 'file', 'filename', 'upload_date']
 
 
-class NoticeSerializer(serializers.ModelSerializer):
+class NoticeSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     attachments = NoticeAttachmentSerializer(many=True, read_only=True)
     author_id = serializers.IntegerField(write_only=True)
+    is_read = serializers.SerializerMethodField()
+    # Method fields only reading obj.pk (api.fastpath)
+    pk_only_methods = ('is_read',)
     
     class Meta:
         model = Notice
         fields = '__all__'
+
+    def get_is_read(self, obj):
+        # notices.reads.ReadState of the requesting user
+        read_state = self.context.get('read_state')
+        return read_state.is_read(obj.pk) if read_state is not None else None
         
     def create(self, validated_data):
         attachments_data = self.context.get('request').FILES
@@ -35,4 +45,19 @@ class NoticeSerializer(serializers.ModelSerializer):
                 filename=attachment.name
             )
         
-        return notice
\ No newline at end of file
+        return notice
+
+
+class ArchivedNoticeAttachmentSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedNoticeAttachment
+        fields = ['id', 'file', 'filename', 'upload_date']
+
+
+class ArchivedNoticeSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    author = UserSerializer(read_only=True)
+    attachments = ArchivedNoticeAttachmentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ArchivedNotice
+        fields = '__all__'
@@ -1,3 +1,185 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.models import Blob, StatCounter
+from api.events import get_broker
+from .archive import archive_expired
+from .models import Notice, NoticeAttachment, NoticeReadState, ArchivedNotice, ArchivedNoticeAttachment
 
-# Create your tests here.
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('archive')
+        now = timezone.now()
+        cls.expired = [
+            Notice.objects.create(
+                title=f'Expired {i}', content='...', author=cls.user, category='HR',
+                expires_at=now - timedelta(days=i + 1),
+            )
+            for i in range(5)
+        ]
+        cls.live = Notice.objects.create(
+            title='Live', content='...', author=cls.user, category='HR', expires_at=now + timedelta(days=1)
+        )
+        cls.forever = Notice.objects.create(title='Forever', content='...', author=cls.user, category='HR')
+        NoticeAttachment.objects.create(
+            notice=cls.expired[0], file='blobs/aa/bb/aabb.pdf', filename='policy.pdf'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_moves_expired_notices_in_batches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            batches = list(archive_expired(batch_size=2))
+        self.assertEqual(batches, [(2, 0), (2, 0), (1, 1)])
+
+        self.assertEqual(set(Notice.objects.values_list('title', flat=True)), {'Live', 'Forever'})
+        self.assertEqual(
+            set(ArchivedNotice.objects.values_list('id', flat=True)), {notice.pk for notice in self.expired}
+        )
+        attachment = ArchivedNoticeAttachment.objects.get()
+        self.assertEqual(attachment.notice_id, self.expired[0].pk)
+        self.assertEqual(attachment.file.name, 'blobs/aa/bb/aabb.pdf')
+        self.assertEqual(StatCounter.objects.get(name='total_notices').value, 2)
+        self.assertEqual(list(get_broker().buffer)[-1].type, 'archived')
+
+    def test_archived_notices_leave_lists_and_search(self):
+        call_command('archive_notices', stdout=StringIO())
+        titles = [n['title'] for n in self.client.get(reverse('notice-list')).data['results']]
+        self.assertEqual(sorted(titles), ['Forever', 'Live'])
+        results = self.client.get(reverse('search'), {'q': 'Expired'}).data['results']
+        self.assertEqual(results, [])
+
+    def test_archive_endpoint(self):
+        call_command('archive_notices', stdout=StringIO())
+        response = self.client.get(reverse('archived-notice-list'))
+        # Most recently expired first
+        self.assertEqual([n['title'] for n in response.data['results']], [f'Expired {i}' for i in range(5)])
+        response = self.client.get(reverse('archived-notice-detail', args=[self.expired[0].pk]))
+        self.assertEqual(response.data['attachments'][0]['filename'], 'policy.pdf')
+        self.assertEqual(self.client.post(reverse('archived-notice-list'), {}).status_code, 405)
+
+    def test_grace_period_and_limit(self):
+        call_command('archive_notices', grace_days=2.5, stdout=StringIO())
+        self.assertEqual(ArchivedNotice.objects.count(), 3)
+        call_command('archive_notices', limit=1, stdout=StringIO())
+        self.assertEqual(ArchivedNotice.objects.count(), 4)
+
+    def test_batch_size_is_clamped(self):
+        with mock.patch('notices.archive.MAX_BATCH_SIZE', 2):
+            batches = list(archive_expired(batch_size=5000))
+        self.assertEqual([notices for notices, attachments in batches], [2, 2, 1])
+
+    def test_blob_released_with_archived_attachment(self):
+        self.assertEqual(Blob.objects.get().references, 1)
+        call_command('archive_notices', stdout=StringIO())
+        self.assertEqual(Blob.objects.get().references, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            ArchivedNotice.objects.filter(pk=self.expired[0].pk).delete()
+        self.assertFalse(Blob.objects.exists())
+
+
+class ReadTrackingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author')
+        cls.reader = User.objects.create_user('reader')
+        cls.notices = [
+            Notice.objects.create(title=f'Notice {i}', content='...', author=cls.author, category='HR')
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def unread(self):
+        return self.client.get(reverse('notice-unread-count')).data['unread']
+
+    def read_flags(self):
+        results = self.client.get(reverse('notice-list')).data['results']
+        return {item['id']: item['is_read'] for item in results}
+
+    def state(self):
+        state = NoticeReadState.objects.get(user=self.reader)
+        return state.last_read_id, state.read_ids
+
+    def test_everything_starts_unread(self):
+        self.assertEqual(self.unread(), 5)
+        self.assertEqual(set(self.read_flags().values()), {False})
+
+    def test_mark_read_keeps_sparse_exceptions(self):
+        first, second, third, fourth, fifth = [notice.pk for notice in self.notices]
+        response = self.client.post(reverse('notice-mark-read', args=[third]))
+        self.assertEqual(response.data, {'unread': 4})
+        self.assertEqual(self.state(), (0, [third]))
+        self.assertTrue(self.read_flags()[third])
+
+        # Reading the notices before it moves the mark past all three
+        response = self.client.post(reverse('notice-mark-many-read'), {'ids': [first, second]}, format='json')
+        self.assertEqual(response.data, {'unread': 2})
+        self.assertEqual(self.state(), (third, []))
+
+        self.client.post(reverse('notice-mark-many-read'), {'ids': [fifth, 10 ** 9]}, format='json')
+        self.assertEqual(self.state(), (third, [fifth]))
+        self.assertEqual(self.read_flags(), {pk: pk != fourth for pk in [first, second, third, fourth, fifth]})
+
+    def test_mark_all_read(self):
+        response = self.client.post(reverse('notice-mark-all-read'), {'up_to': self.notices[1].pk}, format='json')
+        self.assertEqual(response.data, {'unread': 3})
+
+        self.client.post(reverse('notice-mark-all-read'))
+        self.assertEqual(self.unread(), 0)
+        newer = Notice.objects.create(title='Newer', content='...', author=self.author, category='HR')
+        self.assertEqual(self.unread(), 1)
+        self.assertFalse(self.read_flags()[newer.pk])
+
+        # Read state is per user
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.unread(), 6)
+
+    def test_unread_count_counts_no_notices(self):
+        self.client.post(reverse('notice-mark-read', args=[self.notices[2].pk]))
+        self.unread()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread(), 4)
+
+    def test_unread_count_after_deleting_read_notices(self):
+        first, second, third = self.notices[:3]
+        self.client.post(reverse('notice-mark-many-read'), {'ids': [first.pk, third.pk]}, format='json')
+        self.assertEqual(self.unread(), 3)
+        first.delete()
+        self.assertEqual(self.unread(), 3)
+        Notice.objects.filter(pk=second.pk).update(expires_at=timezone.now() - timedelta(days=1))
+        list(archive_expired())
+        self.assertEqual(self.unread(), 2)
+        third.delete()
+        self.client.post(reverse('notice-mark-read', args=[self.notices[3].pk]))
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(NoticeReadState.objects.get(user=self.reader).read_count, 1)
+
+    def test_list_etag_changes_when_read(self):
+        etag = self.client.get(reverse('notice-list'))['ETag']
+        self.client.post(reverse('notice-mark-read', args=[self.notices[0].pk]))
+        response = self.client.get(reverse('notice-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.post(reverse('notice-mark-read', args=[10 ** 9])).status_code, 404)
+        response = self.client.post(reverse('notice-mark-many-read'), {'ids': 'all'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('notice-mark-all-read'), {'up_to': 'x'}, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -1,48 +1,96 @@
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
-from django.utils import timezone
-from .models import Notice, NoticeAttachment
-from .serializers import NoticeSerializer, NoticeAttachmentSerializer
+from rest_framework.generics import get_object_or_404
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.functional import cached_property
+from .models import Notice, NoticeAttachment, ArchivedNotice, ArchivedNoticeAttachment
+from .serializers import NoticeSerializer, NoticeAttachmentSerializer, ArchivedNoticeSerializer
+from .filters import filter_notices, is_active_only, last_expiry
+from . import reads
+from api.bulk import BulkMixin
+from api.conditional import ConditionalGetMixin
+from api.downloads import PassthroughRenderer, send_attachment
+from api.events import get_broker, stream
+from api.fastpath import FastListMixin
+from api.fieldsets import SparseQuerysetMixin
+from api.pagination import KeysetPagination
 from api.permissions import IsAuthorOrReadOnly, IsAdminOrReadOnly
 
-class NoticeViewSet(viewsets.ModelViewSet):
+class NoticeViewSet(ConditionalGetMixin, SparseQuerysetMixin, FastListMixin, BulkMixin, viewsets.ModelViewSet):
     queryset = Notice.objects.all()
     serializer_class = NoticeSerializer
     permission_classes = [permissions.IsAuthenticated, IsAuthorOrReadOnly]
+    pagination_class = KeysetPagination
+    bulk_select_related = ['author']
+    conditional_models = ['notices.Notice', 'notices.NoticeAttachment', 'auth.User']
     
     def get_queryset(self):
-        queryset = Notice.objects.all()
-        
-        # Filter by category
-        category = self.request.query_params.get('category')
-        if category:
-            queryset = queryset.filter(category=category)
-            
-        # Filter by search term
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | 
-                Q(content__icontains=search)
-            )
-            
-        # Filter by priority
-        priority = self.request.query_params.get('priority')
-        if priority:
-            queryset = queryset.filter(priority=priority)
-            
-        # Filter by active notices (not expired)
-        active_only = self.request.query_params.get('active_only')
-        if active_only and active_only.lower() == 'true':
-            now = timezone.now()
-            queryset = queryset.filter(
-                Q(expires_at__gt=now) | Q(expires_at__isnull=True)
-            )
-            
-        return queryset
+        queryset = self.select_requested(Notice.objects.all(), 'author')
+        queryset = self.prefetch_requested(queryset, 'attachments')
+        return self.only_requested(filter_notices(queryset, self.request.query_params))
+
+    @cached_property
+    def read_state(self):
+        return reads.ReadState(self.request.user)
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'read_state': self.read_state}
+
+    @cached_property
+    def expired_until(self):
+        # active_only results change whenever a notice expires, without any
+        # write: validators include the last expiry so far
+        if not is_active_only(self.request.query_params):
+            return None
+        return last_expiry()
+
+    def get_etag_parts(self, request, versions):
+        # is_read differs per user, and changes without any notice changing
+        parts = [*super().get_etag_parts(request, versions), self.read_state.token]
+        if self.expired_until is not None:
+            parts.append(f'expired={self.expired_until.isoformat()}')
+        return parts
+
+    def get_change_times(self, request, versions):
+        return [*super().get_change_times(request, versions), self.read_state.updated_at, self.expired_until]
+
+    @action(detail=True, methods=['post'], url_path='read')
+    def mark_read(self, request, pk=None):
+        # Any reader, not only the author
+        notice = get_object_or_404(Notice.objects.only('pk'), pk=pk)
+        reads.mark_read(request.user, [notice.pk])
+        return Response({'unread': reads.unread_count(request.user)})
+
+    @action(detail=False, methods=['post'], url_path='read')
+    def mark_many_read(self, request):
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response({'error': 'ids must be a list of notice ids'}, status=400)
+        reads.mark_read(request.user, ids)
+        return Response({'unread': reads.unread_count(request.user)})
+
+    @action(detail=False, methods=['post'], url_path='read-all')
+    def mark_all_read(self, request):
+        up_to = request.data.get('up_to')
+        if up_to is not None and not isinstance(up_to, int):
+            return Response({'error': 'up_to must be a notice id'}, status=400)
+        reads.mark_all_read(request.user, up_to)
+        return Response({'unread': reads.unread_count(request.user)})
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        return Response({'unread': reads.unread_count(request.user)})
     
+    @action(detail=True, methods=['get'], url_path=r'attachments/(?P<attachment_id>\d+)/download',
+            renderer_classes=[PassthroughRenderer])
+    def download_attachment(self, request, pk=None, attachment_id=None):
+        attachment = get_object_or_404(
+            NoticeAttachment.objects.select_related('notice'), pk=attachment_id, notice_id=pk
+        )
+        self.check_object_permissions(request, attachment.notice)
+        return send_attachment(request, attachment)
+
     @action(detail=True, methods=['post'])
     def add_attachment(self, request, pk=None):
         notice = self.get_object()
@@ -69,4 +117,72 @@ class NoticeViewSet(viewsets.ModelViewSet):
             except NoticeAttachment.DoesNotExist:
                 return Response({'error': 'Attachment not found'}, status=404)
                 
-        return Response({'error': 'attachment_id not provided'}, status=400)
\ No newline at end of file
+        return Response({'error': 'attachment_id not provided'}, status=400)
+
+
+class ArchivedNoticeViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Expired notices moved to the archive by `manage.py archive_notices`,
+    newest expiry first.
+    """
+    queryset = ArchivedNotice.objects.all()
+    serializer_class = ArchivedNoticeSerializer
+    pagination_class = KeysetPagination
+    conditional_models = ['notices.ArchivedNotice', 'notices.ArchivedNoticeAttachment', 'auth.User']
+
+    def get_queryset(self):
+        queryset = self.select_requested(ArchivedNotice.objects.all(), 'author')
+        queryset = self.prefetch_requested(queryset, 'attachments')
+
+        # Filter by category
+        category = self.request.query_params.get('category')
+        if category:
+            queryset = queryset.filter(category=category)
+
+        # Filter by priority
+        priority = self.request.query_params.get('priority')
+        if priority:
+            queryset = queryset.filter(priority=priority)
+
+        # Filter by title (the archive isn't in the search index)
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = queryset.filter(title__icontains=search)
+
+        return self.only_requested(queryset)
+
+    @action(detail=True, methods=['get'], url_path=r'attachments/(?P<attachment_id>\d+)/download',
+            renderer_classes=[PassthroughRenderer])
+    def download_attachment(self, request, pk=None, attachment_id=None):
+        attachment = get_object_or_404(ArchivedNoticeAttachment, pk=attachment_id, notice_id=pk)
+        return send_attachment(request, attachment)
+
+
+async def notice_events(request):
+    """
+    Live feed of notice changes as Server-Sent Events. `category` (repeated
+    or comma-separated) limits it to some categories; the Last-Event-ID
+    header, or `last_event_id` for the first connection, resumes it.
+
+    A plain async view rather than a DRF one, so that idle connections hold
+    no thread. Serve the ASGI application to use it.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+
+    categories = {
+        category.strip()
+        for value in request.GET.getlist('category')
+        for category in value.split(',')
+        if category.strip()
+    }
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+
+    response = StreamingHttpResponse(
+        stream(get_broker(), categories, last_id), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.utils.module_loading import import_string
+
+# Backend used for each database vendor when SEARCH_BACKEND isn't set
+VENDOR_BACKENDS = {
+    'sqlite': 'search.backends.sqlite.SQLiteSearchBackend',
+    'microsoft': 'search.backends.mssql.SQLServerSearchBackend',
+}
+DEFAULT_BACKEND = 'search.backends.database.DatabaseSearchBackend'
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'SEARCH_BACKEND', None)
+        if not path:
+            path = VENDOR_BACKENDS.get(connections['default'].vendor, DEFAULT_BACKEND)
+        _backend = import_string(path)()
+    return _backend
+
+
+def reset_backend(setting, **kwargs):
+    global _backend
+    if setting in ('SEARCH_BACKEND', 'DATABASES'):
+        _backend = None
+
+
+setting_changed.connect(reset_backend)
@@ -0,0 +1,158 @@
+import re
+from dataclasses import dataclass
+from django.conf import settings
+from django.utils.html import escape
+from ..registry import SEARCHABLE, get_entry_by_type
+
+# Markers wrapped around matched terms before the snippet is HTML-escaped
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+SNIPPET_LENGTH = 200
+
+QUERY_TOKEN_RE = re.compile(r'"([^"]*)"?|(\S+)')
+
+
+@dataclass
+class Term:
+    text: str
+    phrase: bool = False
+    prefix: bool = False
+
+
+@dataclass
+class SearchHit:
+    type: str
+    id: int
+    rank: float
+    title: str
+    snippet: str
+
+
+def parse_query(query):
+    """
+    Split a search box query into terms.
+
+    Quoted text is matched as a phrase. A word ending with `*` is a prefix,
+    and so is the last word while it is still being typed (no trailing
+    whitespace), so results show up on every keystroke.
+    """
+    terms = []
+    for match in QUERY_TOKEN_RE.finditer(query):
+        phrase, word = match.groups()
+        if phrase is not None:
+            words = phrase.split()
+            if words:
+                terms.append(Term(' '.join(words), phrase=len(words) > 1))
+            continue
+        prefix = word.endswith('*')
+        word = word.strip('*"')
+        if word:
+            terms.append(Term(word, prefix=prefix))
+
+    if terms and not terms[-1].phrase and query == query.rstrip() and not query.endswith('"'):
+        terms[-1].prefix = True
+    return terms
+
+
+def highlight(text, terms, length=SNIPPET_LENGTH):
+    """
+    HTML snippet of `text` around the first matched term, with every match
+    wrapped in <mark>. Used by backends without a native snippet function.
+    """
+    text = ' '.join((text or '').split())
+    patterns = []
+    for term in terms:
+        pattern = r'\s+'.join(re.escape(word) for word in term.text.split())
+        patterns.append(r'\b' + pattern + (r'\w*' if term.prefix else r'\b'))
+    if not patterns:
+        return escape(text[:length])
+
+    regex = re.compile('|'.join(patterns), re.IGNORECASE)
+    first = regex.search(text)
+    start = max(0, first.start() - length // 4) if first else 0
+    window = text[start:start + length]
+    marked = regex.sub(lambda m: f'{MATCH_START}{m.group(0)}{MATCH_END}', window)
+    if start > 0:
+        marked = '…' + marked
+    if start + length < len(text):
+        marked += '…'
+    return render_snippet(marked)
+
+
+def render_snippet(marked):
+    """
+    Escape a snippet and turn the match markers into <mark> tags.
+    """
+    return escape(marked).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+
+class BaseSearchBackend:
+    """
+    Interface of the search backends.
+
+    Ranks returned by the backends are "higher is better" and only comparable
+    within the results of a single call.
+    """
+
+    def __init__(self, using='default'):
+        self.using = using
+
+    @property
+    def max_results(self):
+        return getattr(settings, 'SEARCH_MAX_RESULTS', 200)
+
+    def index(self, instance):
+        """
+        Add or replace the index entry of a saved object.
+        """
+
+    def index_many(self, instances):
+        """
+        Add or replace the index entries of several saved objects.
+        """
+        for instance in instances:
+            self.index(instance)
+
+    def remove(self, instance):
+        """
+        Drop the index entry of a deleted object.
+        """
+
+    def remove_many(self, entries):
+        """
+        Drop the index entries of deleted objects, given as (model, pk) pairs.
+        """
+        for model, pk in entries:
+            self.remove(model(pk=pk))
+
+    def rebuild(self):
+        """
+        Re-index every searchable object.
+        """
+
+    def ranked_ids(self, model, query, limit=None):
+        """
+        [(pk, rank), ...] of the objects of `model` matching `query`,
+        most relevant first.
+        """
+        raise NotImplementedError
+
+    def match_filter(self, model, query):
+        """
+        Q matching every object of `model` that matches `query`, without
+        the SEARCH_MAX_RESULTS cap, or None if the query has no terms.
+        """
+        raise NotImplementedError
+
+    def search(self, query, types=None, limit=None):
+        """
+        SearchHit list across the searchable models (or only `types`),
+        most relevant first, with highlighted snippets.
+        """
+        raise NotImplementedError
+
+    def get_labels(self, types=None):
+        if not types:
+            return list(SEARCHABLE)
+        return [label for label, entry in map(get_entry_by_type, types) if label]
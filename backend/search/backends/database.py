@@ -0,0 +1,69 @@
+from functools import reduce
+from operator import and_, or_
+from django.db.models import Q
+from ..registry import SEARCHABLE, get_model
+from .base import BaseSearchBackend, SearchHit, parse_query, highlight
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Portable fallback for databases without a full-text backend. Matches
+    with icontains, so it scans the tables, and ranks by where the terms
+    occur in Python.
+    """
+
+    def _condition(self, label, terms):
+        fields = SEARCHABLE[label]['fields']
+        return reduce(and_, [
+            reduce(or_, [Q(**{f'{field}__icontains': term.text}) for field in fields])
+            for term in terms
+        ])
+
+    def _matches(self, label, terms, limit):
+        fields = SEARCHABLE[label]['fields']
+        rows = get_model(label).objects.filter(self._condition(label, terms)).values_list('pk', *fields)[:limit]
+
+        ranked = []
+        for pk, title, body, tags in rows:
+            rank = 0.0
+            for term in terms:
+                needle = term.text.lower()
+                rank += 10 * (title or '').lower().count(needle)
+                rank += 5 * (tags or '').lower().count(needle)
+                rank += (body or '').lower().count(needle)
+            ranked.append((pk, rank, title, body))
+        ranked.sort(key=lambda row: row[1], reverse=True)
+        return ranked
+
+    def ranked_ids(self, model, query, limit=None):
+        terms = parse_query(query)
+        if not terms:
+            return []
+        limit = min(limit or self.max_results, self.max_results)
+        return [(pk, rank) for pk, rank, title, body in self._matches(model._meta.label, terms, limit)]
+
+    def match_filter(self, model, query):
+        terms = parse_query(query)
+        if not terms:
+            return None
+        return self._condition(model._meta.label, terms)
+
+    def search(self, query, types=None, limit=None):
+        terms = parse_query(query)
+        if not terms:
+            return []
+        limit = min(limit or self.max_results, self.max_results)
+
+        hits = []
+        for label in self.get_labels(types):
+            for pk, rank, title, body in self._matches(label, terms, limit):
+                hits.append(SearchHit(
+                    type=SEARCHABLE[label]['type'],
+                    id=pk,
+                    rank=rank,
+                    title=title,
+                    snippet=highlight(body, terms),
+                ))
+
+        hits.sort(key=lambda hit: hit.rank, reverse=True)
+        return hits[:limit]
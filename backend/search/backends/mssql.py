@@ -0,0 +1,86 @@
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from ..registry import SEARCHABLE, get_model
+from .base import BaseSearchBackend, SearchHit, parse_query, highlight
+
+
+def build_contains(terms):
+    """
+    CONTAINSTABLE search condition for the parsed terms.
+    """
+    parts = []
+    for term in terms:
+        text = term.text.replace('"', '')
+        parts.append(f'"{text}*"' if term.prefix else f'"{text}"')
+    return ' AND '.join(parts)
+
+
+class SQLServerSearchBackend(BaseSearchBackend):
+    """
+    SQL Server full-text search over the notice and article tables.
+
+    The full-text indexes are created by the search app's migration with
+    automatic change tracking, so SQL Server keeps them current by itself
+    and index()/remove() have nothing to do.
+    """
+
+    def rebuild(self):
+        with connections[self.using].cursor() as cursor:
+            for label in SEARCHABLE:
+                table = get_model(label)._meta.db_table
+                cursor.execute(f'ALTER FULLTEXT INDEX ON [{table}] START FULL POPULATION')
+
+    def _ranked(self, label, condition, limit):
+        model = get_model(label)
+        opts = model._meta
+        columns = ', '.join(f'[{opts.get_field(field).column}]' for field in SEARCHABLE[label]['fields'])
+        sql = (
+            f'SELECT ft.[KEY], ft.[RANK] FROM CONTAINSTABLE([{opts.db_table}], ({columns}), %s, %s) AS ft '
+            f'ORDER BY ft.[RANK] DESC'
+        )
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, [condition, limit])
+            return [(pk, float(rank)) for pk, rank in cursor.fetchall()]
+
+    def ranked_ids(self, model, query, limit=None):
+        terms = parse_query(query)
+        if not terms:
+            return []
+        limit = min(limit or self.max_results, self.max_results)
+        return self._ranked(model._meta.label, build_contains(terms), limit)
+
+    def match_filter(self, model, query):
+        terms = parse_query(query)
+        if not terms:
+            return None
+        opts = model._meta
+        columns = ', '.join(f'[{opts.get_field(field).column}]' for field in SEARCHABLE[opts.label]['fields'])
+        return Q(pk__in=RawSQL(
+            f'SELECT ft.[KEY] FROM CONTAINSTABLE([{opts.db_table}], ({columns}), %s) AS ft',
+            [build_contains(terms)],
+        ))
+
+    def search(self, query, types=None, limit=None):
+        terms = parse_query(query)
+        if not terms:
+            return []
+        limit = min(limit or self.max_results, self.max_results)
+        condition = build_contains(terms)
+
+        hits = []
+        for label in self.get_labels(types):
+            ranked = dict(self._ranked(label, condition, limit))
+            title_field, body_field = SEARCHABLE[label]['fields'][:2]
+            rows = get_model(label).objects.filter(pk__in=ranked).values_list('pk', title_field, body_field)
+            for pk, title, body in rows:
+                hits.append(SearchHit(
+                    type=SEARCHABLE[label]['type'],
+                    id=pk,
+                    rank=ranked[pk],
+                    title=title,
+                    snippet=highlight(body, terms),
+                ))
+
+        hits.sort(key=lambda hit: hit.rank, reverse=True)
+        return hits[:limit]
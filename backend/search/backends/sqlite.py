@@ -0,0 +1,113 @@
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from ..registry import SEARCHABLE, CODE_BITS, get_entry, get_document, get_model, make_rowid, split_rowid
+from .base import BaseSearchBackend, SearchHit, MATCH_START, MATCH_END, parse_query, render_snippet
+
+TABLE = 'search_index'
+
+
+def build_match(terms):
+    """
+    FTS5 MATCH expression for the parsed terms. Every term is quoted so that
+    user input can't inject FTS5 query syntax.
+    """
+    parts = []
+    for term in terms:
+        quoted = '"' + term.text.replace('"', '""') + '"'
+        parts.append(quoted + '*' if term.prefix else quoted)
+    return ' '.join(parts)
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 index. The virtual table is created by the search app's
+    migration and updated in the same transaction as the indexed rows.
+    """
+
+    def index(self, instance):
+        entry = get_entry(type(instance))
+        rowid = make_rowid(entry, instance.pk)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid])
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, title, body, tags, type) VALUES (%s, %s, %s, %s, %s)',
+                [rowid, *get_document(instance), entry['type']],
+            )
+
+    def index_many(self, instances):
+        rows = []
+        for instance in instances:
+            entry = get_entry(type(instance))
+            rows.append([make_rowid(entry, instance.pk), *get_document(instance), entry['type']])
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [row[:1] for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, title, body, tags, type) VALUES (%s, %s, %s, %s, %s)', rows
+            )
+
+    def remove(self, instance):
+        entry = get_entry(type(instance))
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [make_rowid(entry, instance.pk)])
+
+    def remove_many(self, entries):
+        rowids = [[make_rowid(get_entry(model), pk)] for model, pk in entries]
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', rowids)
+
+    def rebuild(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+            for label, entry in SEARCHABLE.items():
+                opts = get_model(label)._meta
+                columns = ', '.join(
+                    f"COALESCE({opts.get_field(field).column}, '')" for field in entry['fields']
+                )
+                cursor.execute(
+                    f'INSERT INTO {TABLE} (rowid, title, body, tags, type) '
+                    f'SELECT ({opts.pk.column} << {CODE_BITS}) | %s, {columns}, %s FROM {opts.db_table}',
+                    [entry['code'], entry['type']],
+                )
+
+    def _query(self, query, types, limit, columns):
+        terms = parse_query(query)
+        if not terms:
+            return []
+        sql = f'SELECT rowid, -rank{columns} FROM {TABLE} WHERE {TABLE} MATCH %s'
+        params = [build_match(terms)]
+        if types:
+            sql += ' AND type IN (%s)' % ', '.join(['%s'] * len(types))
+            params.extend(types)
+        sql += ' ORDER BY rank LIMIT %s'
+        params.append(min(limit or self.max_results, self.max_results))
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def ranked_ids(self, model, query, limit=None):
+        rows = self._query(query, [get_entry(model)['type']], limit, '')
+        return [(split_rowid(rowid)[1], rank) for rowid, rank in rows]
+
+    def match_filter(self, model, query):
+        terms = parse_query(query)
+        if not terms:
+            return None
+        return Q(pk__in=RawSQL(
+            f'SELECT rowid >> {CODE_BITS} FROM {TABLE} WHERE {TABLE} MATCH %s AND type = %s',
+            [build_match(terms), get_entry(model)['type']],
+        ))
+
+    def search(self, query, types=None, limit=None):
+        snippet = f", title, snippet({TABLE}, -1, '{MATCH_START}', '{MATCH_END}', '…', 24)"
+        hits = []
+        for rowid, rank, title, marked in self._query(query, types, limit, snippet):
+            label, pk = split_rowid(rowid)
+            hits.append(SearchHit(
+                type=SEARCHABLE[label]['type'],
+                id=pk,
+                rank=rank,
+                title=title,
+                snippet=render_snippet(marked),
+            ))
+        return hits
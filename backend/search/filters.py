@@ -0,0 +1,41 @@
+from django.db.models import Case, When, Value, FloatField
+from .backends import get_backend
+
+
+def search_queryset(queryset, query):
+    """
+    Restrict `queryset` to the objects matching `query` in the search index,
+    most relevant first. The rank is available as the `search_rank`
+    annotation.
+
+    Every match is kept, but only the SEARCH_MAX_RESULTS most relevant ones
+    are ranked; the others follow them, newest first, with a rank below
+    theirs.
+    """
+    condition = get_backend().match_filter(queryset.model, query)
+    ranked = get_backend().ranked_ids(queryset.model, query)
+    if condition is None or not ranked:
+        return queryset.none()
+
+    # Never NULL, so that keyset pagination can compare it
+    rank = Case(
+        *[When(pk=pk, then=Value(score)) for pk, score in ranked],
+        default=Value(min(score for pk, score in ranked) - 1),
+        output_field=FloatField(),
+    )
+    return (
+        queryset.filter(condition)
+        .annotate(search_rank=rank)
+        .order_by('-search_rank', '-pk')
+    )
+
+
+def match_queryset(queryset, query):
+    """
+    Restrict `queryset` to every object matching `query`, unranked and
+    without the SEARCH_MAX_RESULTS cap, e.g. to count the matches.
+    """
+    condition = get_backend().match_filter(queryset.model, query)
+    if condition is None:
+        return queryset.none()
+    return queryset.filter(condition)
@@ -0,0 +1,72 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from api.benchmarking import make_rng, make_text, make_vocabulary, timed, percentile, chunked
+from notices.models import Notice
+from search.backends import get_backend
+from search.filters import search_queryset
+
+QUERIES = ['security', 'holiday schedule', '"fire evacuation"', 'onboard', 'pay']
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare icontains search with the full-text index on a synthetic notice table. '
+        'Runs in a transaction that is rolled back, so the database is left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Synthetic notices to insert')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        with transaction.atomic():
+            self.seed(options)
+
+            start = time.perf_counter()
+            backend.rebuild()
+            self.stdout.write(f'Indexed in {time.perf_counter() - start:.1f}s with {type(backend).__name__}')
+
+            self.stdout.write(f"{'query':<22}{'icontains p50':>16}{'index p50':>14}{'hits':>8}")
+            for query in QUERIES:
+                scan = timed(lambda: self.substring_page(query), options['repeat'])
+                indexed = timed(lambda: self.search_page(query), options['repeat'])
+                hits = len(backend.ranked_ids(Notice, query))
+                self.stdout.write(
+                    f'{query:<22}{percentile(scan, 50):>13.1f} ms{percentile(indexed, 50):>11.1f} ms{hits:>8}'
+                )
+
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        rng = make_rng(options['seed'])
+        vocabulary = make_vocabulary(rng)
+        author, _ = User.objects.get_or_create(username='benchmark')
+        start = time.perf_counter()
+        rows = (
+            Notice(
+                title=make_text(rng, 6, vocabulary),
+                content=make_text(rng, 80, vocabulary),
+                category=rng.choice(['General', 'IT', 'HR', 'Facilities']),
+                author=author,
+            )
+            for _ in range(options['rows'])
+        )
+        for batch in chunked(rows, options['batch_size']):
+            Notice.objects.bulk_create(batch)
+        self.stdout.write(f"Inserted {options['rows']} notices in {time.perf_counter() - start:.1f}s")
+
+    def substring_page(self, query):
+        queryset = Notice.objects.filter(Q(title__icontains=query) | Q(content__icontains=query))
+        queryset.count()
+        list(queryset[:10])
+
+    def search_page(self, query):
+        queryset = search_queryset(Notice.objects.all(), query)
+        queryset.count()
+        list(queryset[:10])
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from search.backends import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from the notice and article tables'
+
+    def handle(self, *args, **kwargs):
+        backend = get_backend()
+        self.stdout.write(f'Rebuilding search index with {type(backend).__name__}...')
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+# Tables and columns indexed for search, see search.registry
+INDEXED_TABLES = [
+    ('notices_notice', 1, 'notice', ['title', 'content', 'category']),
+    ('knowledge_article', 2, 'article', ['title', 'content', 'tags']),
+]
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE search_index USING fts5("
+            "title, body, tags, type UNINDEXED, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        # Persistent ranking function, weighting title and tag matches over body
+        # matches; ORDER BY rank is cheaper than calling bm25() in the query
+        schema_editor.execute(
+            "INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(10.0, 1.0, 5.0)')"
+        )
+        for table, code, doc_type, columns in INDEXED_TABLES:
+            values = ', '.join(f"COALESCE({column}, '')" for column in columns)
+            schema_editor.execute(
+                f"INSERT INTO search_index (rowid, title, body, tags, type) "
+                f"SELECT (id << 4) | {code}, {values}, '{doc_type}' FROM {table}"
+            )
+    elif vendor == 'microsoft':
+        schema_editor.execute(
+            "IF NOT EXISTS (SELECT 1 FROM sys.fulltext_catalogs WHERE name = 'search_catalog') "
+            "CREATE FULLTEXT CATALOG search_catalog"
+        )
+        with schema_editor.connection.cursor() as cursor:
+            for table, code, doc_type, columns in INDEXED_TABLES:
+                cursor.execute(
+                    "SELECT name FROM sys.indexes WHERE object_id = OBJECT_ID(%s) AND is_primary_key = 1",
+                    [table],
+                )
+                key_index = cursor.fetchone()[0]
+                schema_editor.execute(
+                    f"CREATE FULLTEXT INDEX ON [{table}] ({', '.join(f'[{c}]' for c in columns)}) "
+                    f"KEY INDEX [{key_index}] ON search_catalog WITH CHANGE_TRACKING AUTO"
+                )
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS search_index")
+    elif vendor == 'microsoft':
+        for table, code, doc_type, columns in INDEXED_TABLES:
+            schema_editor.execute(f"DROP FULLTEXT INDEX ON [{table}]")
+        schema_editor.execute("DROP FULLTEXT CATALOG search_catalog")
+
+
+class Migration(migrations.Migration):
+
+    # Full-text DDL can't run inside a transaction on SQL Server
+    atomic = False
+
+    dependencies = [
+        ('notices', '0001_initial'),
+        ('knowledge', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,64 @@
+"""
+Models kept in the full-text index.
+
+Each entry maps a model to the fields feeding the three indexed columns
+(title, body, tags) and a small numeric code. The code is combined with the
+object's primary key into the index row id, so an object's row can be
+replaced or removed without scanning the index.
+"""
+from django.apps import apps
+
+SEARCHABLE = {
+    'notices.Notice': {
+        'code': 1,
+        'type': 'notice',
+        'fields': ('title', 'content', 'category'),
+    },
+    'knowledge.Article': {
+        'code': 2,
+        'type': 'article',
+        'fields': ('title', 'content', 'tags'),
+    },
+}
+
+# Room left in the row id for model codes
+CODE_BITS = 4
+
+
+def get_entry(model):
+    return SEARCHABLE.get(model._meta.label)
+
+
+def get_model(label):
+    return apps.get_model(label)
+
+
+def get_models():
+    return [apps.get_model(label) for label in SEARCHABLE]
+
+
+def get_entry_by_type(doc_type):
+    for label, entry in SEARCHABLE.items():
+        if entry['type'] == doc_type:
+            return label, entry
+    return None, None
+
+
+def get_document(instance):
+    """
+    The (title, body, tags) strings indexed for an instance.
+    """
+    fields = get_entry(type(instance))['fields']
+    return tuple(getattr(instance, field) or '' for field in fields)
+
+
+def make_rowid(entry, pk):
+    return (pk << CODE_BITS) | entry['code']
+
+
+def split_rowid(rowid):
+    code = rowid & ((1 << CODE_BITS) - 1)
+    for label, entry in SEARCHABLE.items():
+        if entry['code'] == code:
+            return label, rowid >> CODE_BITS
+    return None, None
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_save, post_delete
+from api import batching
+from .backends import get_backend
+from .registry import get_models
+
+
+def update_index(sender, instance, **kwargs):
+    # Batch writes index all their rows at once
+    batching.defer(index_instances, instance)
+
+
+def index_instances(instances):
+    get_backend().index_many(instances)
+
+
+def remove_from_index(sender, instance, **kwargs):
+    batching.defer(remove_instances, (type(instance), instance.pk))
+
+
+def remove_instances(entries):
+    get_backend().remove_many(entries)
+
+
+for model in get_models():
+    post_save.connect(update_index, sender=model, dispatch_uid=f'search_index_{model._meta.label}')
+    post_delete.connect(remove_from_index, sender=model, dispatch_uid=f'search_remove_{model._meta.label}')
@@ -0,0 +1,106 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from notices.models import Notice
+from knowledge.models import Category, Article
+from .backends import get_backend
+from .backends.base import parse_query, highlight
+from .filters import match_queryset
+
+
+class ParseQueryTests(TestCase):
+    def test_terms(self):
+        terms = parse_query('fire "evacuation drill" sched')
+        self.assertEqual([t.text for t in terms], ['fire', 'evacuation drill', 'sched'])
+        self.assertEqual([t.phrase for t in terms], [False, True, False])
+        self.assertEqual([t.prefix for t in terms], [False, False, True])
+
+    def test_finished_word_is_not_a_prefix(self):
+        self.assertFalse(parse_query('fire ')[0].prefix)
+        self.assertTrue(parse_query('fi* drill ')[0].prefix)
+
+    def test_highlight_escapes_html(self):
+        snippet = highlight('<b>Fire</b> drill on Friday', parse_query('fire '))
+        self.assertEqual(snippet, '&lt;b&gt;<mark>Fire</mark>&lt;/b&gt; drill on Friday')
+
+
+class SearchTestsMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('searcher')
+        category = Category.objects.create(name='Safety')
+        cls.drill = Notice.objects.create(
+            title='Fire drill', content='The fire evacuation drill is on Friday.',
+            author=cls.user, category='Facilities',
+        )
+        cls.parking = Notice.objects.create(
+            title='Parking', content='Visitor parking moves. Fire lanes stay clear.',
+            author=cls.user, category='Facilities',
+        )
+        cls.article = Article.objects.create(
+            title='Evacuation guide', content='How to leave the <building> during a fire.',
+            author=cls.user, category=category, tags='safety,fire',
+        )
+
+    def setUp(self):
+        # Responses cached by the tests of the other backend would be served
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('search'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_ranked_results_across_models(self):
+        results = self.search('fire ')
+        self.assertEqual(len(results), 3)
+        self.assertEqual((results[0]['type'], results[0]['id']), ('notice', self.drill.pk))
+
+    def test_phrase_prefix_and_type(self):
+        self.assertEqual([r['id'] for r in self.search('"evacuation drill"')], [self.drill.pk])
+        self.assertEqual({r['type'] for r in self.search('evac', type='article')}, {'article'})
+        self.assertEqual(self.search('"drill evacuation"'), [])
+
+    def test_snippets_are_highlighted(self):
+        snippet = self.search('building ')[0]['snippet']
+        self.assertIn('<mark>building</mark>', snippet)
+        self.assertNotIn('<building>', snippet)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.parking.title = 'Parking garage closure'
+        self.parking.save()
+        self.assertEqual([r['id'] for r in self.search('garage ')], [self.parking.pk])
+        self.parking.delete()
+        self.assertEqual(self.search('garage '), [])
+
+    def test_viewset_search_is_ranked(self):
+        response = self.client.get(reverse('notice-list'), {'search': 'fire'})
+        self.assertEqual([n['id'] for n in response.data['results']], [self.drill.pk, self.parking.pk])
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_viewset_search_keeps_unranked_matches(self):
+        response = self.client.get(reverse('notice-list'), {'search': 'fire', 'page_size': 1})
+        ids = [n['id'] for n in response.data['results']]
+        response = self.client.get(response.data['next'])
+        ids += [n['id'] for n in response.data['results']]
+        self.assertEqual(sorted(ids), [self.drill.pk, self.parking.pk])
+        self.assertIsNone(response.data['next'])
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_match_queryset_is_not_capped(self):
+        matches = match_queryset(Notice.objects.all(), 'fire ')
+        self.assertEqual(set(matches.values_list('pk', flat=True)), {self.drill.pk, self.parking.pk})
+        self.assertEqual(match_queryset(Notice.objects.all(), '  ').count(), 0)
+
+
+class SQLiteSearchTests(SearchTestsMixin, TestCase):
+    pass
+
+
+@override_settings(SEARCH_BACKEND='search.backends.database.DatabaseSearchBackend')
+class DatabaseSearchTests(SearchTestsMixin, TestCase):
+    pass
@@ -0,0 +1,29 @@
+from dataclasses import asdict
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from .backends import get_backend
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def search(request):
+    """
+    Relevance-ranked search across notices and articles.
+
+    `q` is the query: quoted text is a phrase, `word*` a prefix, and the last
+    word is prefix-matched while it is being typed. `type` (repeatable)
+    restricts results to `notice` or `article`.
+    """
+    query = request.query_params.get('q', '')
+    types = request.query_params.getlist('type')
+    try:
+        limit = int(request.query_params.get('limit', 20))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=400)
+
+    hits = get_backend().search(query, types=types, limit=max(1, limit))
+    return Response({
+        'query': query,
+        'results': [asdict(hit) for hit in hits],
+    })